@@ -0,0 +1,174 @@
+import hashlib, json, os, shutil, time
+import numpy as np
+import FrameBatch
+
+# Bump when the extracted values change, entries of other versions are invalid
+EXTRACTOR_VERSION = 2
+DEFAULT_CACHE_DIR = '.doctor_cache' # Created next to the capture file
+DEFAULT_MAX_BYTES = 1024 * 1024 * 1024 # 1 GiB
+HASH_BLOCK = 1024 * 1024
+META_FILE = 'meta.json' # Written last, an entry without it is incomplete
+HASHES_FILE = 'hashes.json' # Content hash of known files by path, size and modification time
+
+
+class CaptureCache:
+    """
+    CaptureCache.py
+    On-disk cache of the extracted frame columns of capture files.
+    Entries are keyed by the content hash and size of the capture, the extractor version and
+    the backend, and hold one .npy file per column that is memory mapped on load.
+    The cache directory is bounded in size, least recently used entries are evicted first.
+    """
+    def __init__(self, cache_dir, max_bytes=DEFAULT_MAX_BYTES):
+        """
+        :param cache_dir: Directory of the cache entries.
+        :param max_bytes: Maximum total size of the entries.
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+
+    @classmethod
+    def for_capture(cls, file_path, max_bytes=DEFAULT_MAX_BYTES):
+        """
+        Cache in the default directory next to a capture file.
+        """
+        return cls(os.path.join(os.path.dirname(os.path.abspath(file_path)), DEFAULT_CACHE_DIR), max_bytes)
+
+    def content_hash(self, file_path):
+        """
+        SHA-256 of a capture file, remembered while its size and modification time do not change.
+        """
+        stat = os.stat(file_path)
+        path = os.path.abspath(file_path)
+        hashes = self._read_json(os.path.join(self.cache_dir, HASHES_FILE)) or {}
+        known = hashes.get(path)
+        if known and known['size'] == stat.st_size and known['mtime_ns'] == stat.st_mtime_ns:
+            return known['sha256']
+
+        digest = hashlib.sha256()
+        with open(file_path, 'rb') as capture:
+            for block in iter(lambda: capture.read(HASH_BLOCK), b''):
+                digest.update(block)
+        hashes[path] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': digest.hexdigest()}
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._write_json(os.path.join(self.cache_dir, HASHES_FILE), hashes)
+        return hashes[path]['sha256']
+
+    def key(self, file_path, backend):
+        """
+        Key of the cache entry of a capture file.
+        """
+        size = os.path.getsize(file_path)
+        return hashlib.sha256(f"{self.content_hash(file_path)}:{size}:{EXTRACTOR_VERSION}:{backend}".encode()).hexdigest()[:32]
+
+    def load(self, file_path, backend):
+        """
+        Load the cached columns of a capture file.
+        :return: FrameBatch of all the frames (columns memory mapped) or None on a miss.
+        """
+        entry = os.path.join(self.cache_dir, self.key(file_path, backend))
+        meta = self._read_json(os.path.join(entry, META_FILE))
+        if meta is None or meta['version'] != EXTRACTOR_VERSION:
+            return None
+        try:
+            columns = {name: np.load(os.path.join(entry, f"{name}.npy"), mmap_mode='r') for name in meta['columns']}
+            valid = {name: np.load(os.path.join(entry, f"{name}.valid.npy"), mmap_mode='r') for name in meta['columns']}
+        except (OSError, ValueError):
+            shutil.rmtree(entry, ignore_errors=True) # Damaged entry
+            return None
+        os.utime(os.path.join(entry, META_FILE)) # Most recently used
+        return FrameBatch.FrameBatch(columns, valid)
+
+    def store(self, file_path, backend, batch):
+        """
+        Store the columns of all the frames of a capture file, then evict entries over the size limit.
+        Older entries of the same capture path are removed.
+        """
+        key = self.key(file_path, backend)
+        entry = os.path.join(self.cache_dir, key)
+        partial = f"{entry}.{os.getpid()}.tmp"
+        shutil.rmtree(partial, ignore_errors=True)
+        os.makedirs(partial)
+        for name in batch.columns:
+            np.save(os.path.join(partial, f"{name}.npy"), np.ascontiguousarray(batch[name]))
+            np.save(os.path.join(partial, f"{name}.valid.npy"), np.ascontiguousarray(batch.valid[name]))
+        self._write_json(os.path.join(partial, META_FILE), {
+            'version': EXTRACTOR_VERSION, 'backend': backend, 'source': os.path.abspath(file_path),
+            'size': os.path.getsize(file_path), 'sha256': self.content_hash(file_path),
+            'frames': len(batch), 'columns': list(batch.columns), 'created': time.time(),
+        })
+        shutil.rmtree(entry, ignore_errors=True)
+        os.rename(partial, entry)
+
+        # The capture changed: entries of its previous contents are stale
+        for name, meta in self._entries():
+            if name != key and meta and meta['source'] == os.path.abspath(file_path) and meta['backend'] == backend:
+                shutil.rmtree(os.path.join(self.cache_dir, name), ignore_errors=True)
+        self.evict()
+
+    def evict(self):
+        """
+        Remove invalid entries, then least recently used entries until the cache fits in max_bytes,
+        and forget the content hashes of deleted captures and of captures without an entry.
+        :return: Number of removed entries.
+        """
+        removed = 0
+        entries = []
+        cached = set() # Content hashes of the remaining entries
+        for name, meta in self._entries():
+            path = os.path.join(self.cache_dir, name)
+            if meta is None or meta['version'] != EXTRACTOR_VERSION:
+                shutil.rmtree(path, ignore_errors=True) # Incomplete or from another extractor
+                removed += 1
+                continue
+            size = sum(entry.stat().st_size for entry in os.scandir(path))
+            entries.append((os.path.getmtime(os.path.join(path, META_FILE)), size, path, meta['sha256']))
+
+        total = sum(size for _, size, _, _ in entries)
+        for _, size, path, sha256 in sorted(entries):
+            if total <= self.max_bytes:
+                cached.add(sha256)
+                continue
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+            removed += 1
+        self._prune_hashes(cached)
+        return removed
+
+    def _prune_hashes(self, cached):
+        """
+        Keep the remembered content hashes of existing captures with cached columns only.
+        :param cached: Content hashes of the cache entries.
+        """
+        hashes_path = os.path.join(self.cache_dir, HASHES_FILE)
+        hashes = self._read_json(hashes_path)
+        if not hashes:
+            return
+        kept = {path: known for path, known in hashes.items() if known['sha256'] in cached and os.path.exists(path)}
+        if len(kept) != len(hashes):
+            self._write_json(hashes_path, kept)
+
+    def _entries(self):
+        """
+        Yields (entry name, metadata or None) of the entries of the cache directory.
+        """
+        if not os.path.isdir(self.cache_dir):
+            return
+        for entry in os.scandir(self.cache_dir):
+            if entry.is_dir() and not entry.name.endswith('.tmp'):
+                yield entry.name, self._read_json(os.path.join(entry.path, META_FILE))
+
+    @staticmethod
+    def _read_json(path):
+        try:
+            with open(path) as source:
+                return json.load(source)
+        except (OSError, ValueError):
+            return None
+
+    @staticmethod
+    def _write_json(path, value):
+        partial = f"{path}.{os.getpid()}.tmp"
+        with open(partial, 'w') as target:
+            json.dump(value, target)
+        os.replace(partial, path)
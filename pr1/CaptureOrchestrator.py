@@ -0,0 +1,164 @@
+import asyncio, contextlib
+import numpy as np
+import PcapReader, MetricsEngine, DensityTracker
+from doctor import get_text_from_metrics
+
+# Columns read from every source
+COLUMNS = tuple(set(MetricsEngine.COLUMNS) | set(DensityTracker.COLUMNS))
+
+
+class Source:
+    """
+    Capture source of a CaptureOrchestrator (a radio, file or pipe) with its own metric state.
+    """
+    def __init__(self, name, reader, src_address=None, dst_address=None, aggregator=None, breakdown=None, distributions=None):
+        """
+        :param name: Name of the source in the reports.
+        :param reader: PcapReader.PcapReader of the source.
+        :param aggregator: WindowAggregator.WindowAggregator of the windowed metrics of the source (None for none).
+        :param breakdown: StationBreakdown.StationBreakdown of the stations of the source (None for none).
+        :param distributions: QuantileSketch.DistributionTracker of the source (None for none).
+        """
+        self.name = name
+        self.reader = reader
+        self.density = DensityTracker.DensityTracker()
+        self.engine = MetricsEngine.MetricsEngine(src_address, dst_address)
+        self.aggregator = aggregator
+        self.breakdown = breakdown
+        self.distributions = distributions
+        self.frames = 0
+        self.done = False # The source ended (end of file, idle timeout, limit or error)
+        self.error = None # Error message of a source that failed
+
+    def update(self, batch):
+        """
+        Update the metrics with a FrameBatch of the source.
+        """
+        self.frames += len(batch)
+        self.density.update_batch(batch)
+        self.engine.update(batch)
+        if self.aggregator is not None:
+            self.aggregator.update(batch, self.engine.address_mask(batch))
+        if self.breakdown is not None:
+            self.breakdown.update(batch)
+        if self.distributions is not None:
+            self.distributions.update(batch, self.engine.address_mask(batch))
+
+    def get_text(self, start_time):
+        """
+        Report of the source.
+        """
+        status = f"error: {self.error}" if self.error else ("ended" if self.done else "running")
+        text = f"\n{'=' * 80}\nSource {self.name} ({status})"
+        text += get_text_from_metrics(self.density.get_density_metrics(), self.engine.performance_monitor_data,
+                                      self.engine.performance_analysis_data, start_time, self.frames)
+        if self.aggregator is not None:
+            text += self.aggregator.get_text()
+        if self.breakdown is not None:
+            text += self.breakdown.get_text()
+        if self.distributions is not None:
+            text += self.distributions.get_text()
+        return text
+
+
+class CaptureOrchestrator:
+    """
+    CaptureOrchestrator.py
+    Monitors several capture sources in one event loop, e.g. one radio per channel.
+    Every source is read by PcapReader.aiter into its own bounded queue and updated by its own task,
+    so a slow or idle source only holds back its own reader and never stalls the others.
+    Only the readers run in threads: the tasks update the metrics on the event loop thread, one batch at a time,
+    interleaving the sources rather than running in parallel.
+    """
+    def __init__(self, src_address=None, dst_address=None, batch_size=1024, max_latency=1.0, queue_size=PcapReader.DEFAULT_QUEUE_SIZE):
+        """
+        :param batch_size: Frames per batch read from a source.
+        :param max_latency: Seconds a frame may wait in a partial batch of a live source (None to always fill batches).
+        :param queue_size: Batches read ahead per source before its reader waits.
+        """
+        self.src_address = src_address
+        self.dst_address = dst_address
+        self.batch_size = batch_size
+        self.max_latency = max_latency
+        self.queue_size = queue_size
+        self.sources = []
+
+    def add_source(self, name, reader, aggregator=None, breakdown=None, distributions=None):
+        """
+        Add a capture source.
+        :param reader: PcapReader.PcapReader of the source.
+        :param aggregator: WindowAggregator.WindowAggregator of the source (None for none).
+        :param breakdown: StationBreakdown.StationBreakdown of the source (None for none).
+        :param distributions: QuantileSketch.DistributionTracker of the source (None for none).
+        :return: Source object.
+        """
+        source = Source(name, reader, self.src_address, self.dst_address, aggregator, breakdown, distributions)
+        self.sources.append(source)
+        return source
+
+    async def run(self, start_time, limit=-1, report_every=1.0, on_report=None):
+        """
+        Monitor every source until they all end.
+        :param start_time: Start time of the run (time.time()).
+        :param limit: Frames processed per source (-1 for no limit).
+        :param report_every: Seconds between two reports.
+        :param on_report: Callable receiving the report text every report_every seconds and at the end (None for no reports).
+        :return: List of the Source objects.
+        """
+        tasks = [asyncio.create_task(self._consume(source, limit)) for source in self.sources]
+        reporter = asyncio.create_task(self._report(start_time, report_every, on_report)) if on_report else None
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+            if reporter is not None:
+                reporter.cancel()
+            if on_report:
+                on_report(self.get_text(start_time))
+        return self.sources
+
+    async def _consume(self, source, limit):
+        """
+        Task of a source: update its metrics with every batch it reads.
+        """
+        columns = set(COLUMNS) | (set(source.aggregator.columns) if source.aggregator is not None else set())
+        if source.breakdown is not None:
+            columns |= set(source.breakdown.columns)
+        if source.distributions is not None:
+            columns |= set(source.distributions.columns)
+        try:
+            async with contextlib.aclosing(source.reader.aiter(self.batch_size, columns, self.max_latency, self.queue_size)) as batches:
+                async for batch in batches:
+                    if limit > -1 and source.frames + len(batch) > limit:
+                        batch = batch.select(np.arange(len(batch)) < limit - source.frames)
+                    source.update(batch)
+                    if source.frames == limit:
+                        break
+                    await asyncio.sleep(0) # Let the other sources run when this queue is full
+        except ValueError as e:
+            source.error = str(e)
+        finally:
+            source.done = True
+
+    async def _report(self, start_time, report_every, on_report):
+        while True:
+            await asyncio.sleep(report_every)
+            on_report(self.get_text(start_time))
+
+    def get_text(self, start_time):
+        """
+        Report of every source.
+        """
+        return ''.join(source.get_text(start_time) for source in self.sources)
+
+    def monitor(self, start_time, limit=-1, report_every=1.0, on_report=None):
+        """
+        Blocking run of the event loop, stopped by the end of every source or by Ctrl-C.
+        :return: List of the Source objects.
+        """
+        try:
+            asyncio.run(self.run(start_time, limit, report_every, on_report))
+        except KeyboardInterrupt:
+            pass # Stop monitoring, the final report is still produced
+        return self.sources
@@ -0,0 +1,74 @@
+import sys, time
+
+# Path of the standard input
+STDIN = '-'
+# Seconds between two reads of a followed file that did not grow
+DEFAULT_POLL_INTERVAL = 0.2
+
+
+class CaptureStream:
+    """
+    CaptureStream.py
+    Sequential byte source of a live capture: a growing capture file (tail mode), a named pipe or stdin.
+    read() blocks until the requested bytes arrive, so the pcap and pcapng readers of PcapngDecoder
+    never see a block that a writer has only partially appended.
+    """
+    def __init__(self, source, follow=False, poll_interval=DEFAULT_POLL_INTERVAL, idle_timeout=None):
+        """
+        :param source: Path of a capture file or pipe, '-' for stdin, or a binary file object.
+        :param follow: Keep waiting for new data at the end of the file instead of stopping (tail mode).
+        :param poll_interval: Seconds between two reads of a followed file that did not grow.
+        :param idle_timeout: Stop following after this many seconds without new data (None to follow forever).
+        """
+        self.name = source if isinstance(source, str) else getattr(source, 'name', '<stream>')
+        self.follow = follow
+        self.poll_interval = poll_interval
+        self.idle_timeout = idle_timeout
+        self.owned = False # The stream opened the file and closes it
+        if source == STDIN:
+            self.file = sys.stdin.buffer
+        elif isinstance(source, str):
+            try:
+                self.file = open(source, 'rb')
+            except FileNotFoundError:
+                raise ValueError(f"File not found: {source}")
+            self.owned = True
+        else:
+            self.file = source
+        self.position = 0 # Bytes read so far
+
+    def read(self, size):
+        """
+        Read exactly size bytes, waiting for a followed file to grow.
+        :return: Bytes read, shorter than size only at the end of the stream.
+        """
+        chunks = []
+        remaining = size
+        idle_since = None
+        while remaining > 0 and self.file is not None:
+            data = self.file.read(remaining)
+            if data:
+                chunks.append(data)
+                remaining -= len(data)
+                idle_since = None
+                continue
+            # End of the data written so far
+            if not self.follow:
+                break
+            now = time.monotonic()
+            if idle_since is None:
+                idle_since = now
+            elif self.idle_timeout is not None and now - idle_since >= self.idle_timeout:
+                break
+            time.sleep(self.poll_interval)
+        data = b''.join(chunks)
+        self.position += len(data)
+        return data
+
+    def close(self):
+        """
+        Close the stream, stdin and file objects given by the caller are left open.
+        """
+        if self.owned and self.file is not None:
+            self.file.close()
+        self.file = None
@@ -0,0 +1,142 @@
+import numpy as np
+
+# Columns read by update_batch
+COLUMNS = ('bssid', 'signal_dbm', 'channel', 'frequency', 'bandwidth_mhz')
+DEFAULT_BANDWIDTH_MHZ = 22 # Width of a DSSS channel, used when no 802.11n/ac/ax bandwidth is reported
+
+# Upper density limit of each classification
+DENSITY_CLASSES = ((8, "Not dense channel"), (16, "Moderately dense"), (24, "Dense"))
+MAX_DENSITY_CLASS = "Very dense"
+
+
+def classify_density(density):
+    """
+    Classify a channel density.
+    :param density: Density of the channel.
+    :return: Classification string.
+    """
+    for limit, classification in DENSITY_CLASSES:
+        if density < limit:
+            return classification
+    return MAX_DENSITY_CLASS
+
+
+class DensityTracker:
+    """
+    DensityTracker.py
+    Incremental Wi-Fi network density per channel.
+    Keeps the strongest signal of every BSSID in a hash index and the running sum of
+    signal strengths per channel, so each update takes constant time.
+    """
+    def __init__(self):
+        self.bssids = {} # BSSID -> [channel, signal (dBm) of the strongest frame]
+        self.channels = {} # Channel -> {'total_signal_strength', 'bssids', 'bandwidth', 'frequency'}
+
+    def __len__(self):
+        return len(self.bssids)
+
+    def _channel(self, channel, frequency):
+        entry = self.channels.get(channel)
+        if entry is None:
+            entry = self.channels[channel] = {'total_signal_strength': 0, 'bssids': 0, 'bandwidth': None, 'frequency': frequency}
+        elif entry['frequency'] is None:
+            entry['frequency'] = frequency
+        return entry
+
+    def update(self, bssid, signal_dbm, channel, bandwidth_mhz=None, frequency=None):
+        """
+        Account a frame of a BSSID.
+        :param bssid: BSSID of the frame.
+        :param signal_dbm: Signal strength of the frame (dBm).
+        :param channel: Channel the frame was received on.
+        :param bandwidth_mhz: Channel width of the frame (MHz), if reported.
+        :param frequency: Frequency of the channel (MHz).
+        """
+        signal_dbm = int(signal_dbm)
+        channel = int(channel)
+        entry = self._channel(channel, int(frequency) if frequency else None)
+        if bandwidth_mhz is not None:
+            entry['bandwidth'] = max(entry['bandwidth'] or 0, int(bandwidth_mhz))
+
+        self._account(bssid, signal_dbm, channel)
+
+    def _account(self, bssid, signal_dbm, channel):
+        """
+        Keep the strongest frame of a BSSID (the lowest channel on equal signal) in the index and channel sums.
+        """
+        current = self.bssids.get(bssid)
+        if current is None:
+            self.bssids[bssid] = [channel, signal_dbm]
+        elif signal_dbm > current[1] or (signal_dbm == current[1] and channel < current[0]):
+            # Stronger frame, the BSSID is accounted on this channel with the new strength
+            previous = self.channels[current[0]]
+            previous['total_signal_strength'] -= abs(current[1])
+            previous['bssids'] -= 1
+            current[0], current[1] = channel, signal_dbm
+        else:
+            return
+        entry = self.channels[channel]
+        entry['total_signal_strength'] += abs(signal_dbm) # abs ensures positive RSSI
+        entry['bssids'] += 1
+
+    def merge(self, other):
+        """
+        Merge the BSSIDs and channels of another tracker.
+        The result does not depend on the order the trackers are merged in.
+        """
+        for channel, entry in other.channels.items():
+            mine = self._channel(channel, entry['frequency'])
+            if entry['bandwidth']:
+                mine['bandwidth'] = max(mine['bandwidth'] or 0, entry['bandwidth'])
+        for bssid, (channel, signal_dbm) in other.bssids.items():
+            self._account(bssid, signal_dbm, channel)
+        return self
+
+    def update_batch(self, batch):
+        """
+        Account the frames of a FrameBatch that carry a BSSID, signal strength and channel.
+        Frames are reduced to the strongest one per BSSID before updating the index.
+        """
+        valid = batch.valid
+        rows = np.flatnonzero(valid['bssid'] & valid['signal_dbm'] & valid['channel'])
+        if len(rows) == 0:
+            return
+        bssid = batch['bssid'][rows]
+        signal = batch['signal_dbm'][rows].astype(np.int16)
+        # Strongest frame (then lowest channel) first within each BSSID, first occurrence of each BSSID is kept
+        order = np.lexsort((batch['channel'][rows], -signal, bssid))
+        first = np.ones(len(order), dtype=np.bool_)
+        first[1:] = bssid[order][1:] != bssid[order][:-1]
+        strongest = rows[order[first]]
+
+        channel = batch['channel']
+        frequency = np.where(valid['frequency'], batch['frequency'], 0)
+        for index in strongest.tolist():
+            self.update(int(batch['bssid'][index]), int(batch['signal_dbm'][index]), int(channel[index]),
+                        frequency=int(frequency[index]) or None)
+
+        # Widest bandwidth reported on each channel
+        with_bandwidth = rows[valid['bandwidth_mhz'][rows]]
+        for ch, bandwidth_mhz in set(zip(channel[with_bandwidth].tolist(), batch['bandwidth_mhz'][with_bandwidth].tolist())):
+            entry = self._channel(ch, None)
+            entry['bandwidth'] = max(entry['bandwidth'] or 0, bandwidth_mhz)
+
+    def get_density_metrics(self):
+        """
+        Density and classification of each channel, density is the sum of the signal strengths
+        of the unique BSSIDs of the channel divided by the channel width.
+        :return: List of {'channel', 'frequency', 'density', 'classification'} sorted by channel.
+        """
+        density_metrics = []
+        for channel in sorted(self.channels):
+            entry = self.channels[channel]
+            if entry['bssids'] == 0:
+                continue
+            density = entry['total_signal_strength'] / (entry['bandwidth'] or DEFAULT_BANDWIDTH_MHZ)
+            density_metrics.append({
+                'channel': channel,
+                'frequency': entry['frequency'] or 0,
+                'density': density,
+                'classification': classify_density(density),
+            })
+        return density_metrics
@@ -0,0 +1,198 @@
+import numpy as np
+import RateTables
+
+"""
+Columns of a frame batch
+"""
+# Column name and numpy type, in the order of the batch
+COLUMNS = {
+    'timestamp': np.float64, # Capture time (seconds)
+    'length': np.uint32, # Frame length on the wire (bytes)
+    'bssid': np.uint64, # MAC addresses packed in 48 bits
+    'ta': np.uint64,
+    'ra': np.uint64,
+    'type_subtype': np.uint16,
+    'fc_retry': np.bool_,
+    'phy': np.uint8,
+    'data_rate': np.float32, # Mbps
+    'channel': np.uint16,
+    'frequency': np.uint16, # MHz
+    'signal_dbm': np.int8,
+    'bandwidth': np.uint8, # 802.11n bandwidth (0: 20, 1: 40, 2: 20L, 3: 20U)
+    'short_gi': np.bool_,
+    'mcs_index': np.uint8,
+    'mcs': np.uint8, # MCS per spatial stream (802.11n, ac or ax)
+    'nss': np.uint8, # Spatial streams (802.11n, ac or ax)
+    'bandwidth_mhz': np.uint16, # Channel width (802.11n, ac or ax)
+    'duration': np.uint32, # Airtime (microseconds)
+    'preamble': np.uint16, # Microseconds
+    'spatial_streams': np.uint8,
+    'phy_gap': np.int8,
+}
+# Columns that are computed from others once the batch is built
+DERIVED_COLUMNS = ('spatial_streams', 'phy_gap')
+# Columns the derived columns are computed from
+DERIVED_INPUTS = {'spatial_streams': ('nss',), 'phy_gap': ('signal_dbm', 'bandwidth_mhz', 'mcs', 'phy')}
+MAC_COLUMNS = ('bssid', 'ta', 'ra')
+
+
+def mac_to_int(mac):
+    """
+    Pack a colon separated MAC address in an integer.
+    :param mac: MAC address string (an already packed integer is returned as is) or None.
+    :return: 48 bit integer or None.
+    """
+    if isinstance(mac, int):
+        return mac
+    return int(mac.replace(':', ''), 16) if mac else None
+
+def int_to_mac(value):
+    """
+    Format a 48 bit integer as a colon separated MAC address.
+    """
+    return ':'.join('%02x' % b for b in int(value).to_bytes(6, 'big'))
+
+def values_from_info(info, timestamp=None, length=None):
+    """
+    Convert the string dictionary of PcapReader.get_80211_info to typed frame values.
+    :param info: Dictionary returned by get_80211_info.
+    :param timestamp: Capture time of the packet.
+    :param length: Length of the packet.
+    :return: Dictionary of typed values, None for missing values.
+    """
+    def typed(value, cast=int):
+        return cast(value) if value not in (None, '') else None
+
+    if 'bandwidth_mhz' in info:
+        mcs, nss, bandwidth_mhz = info['mcs'], info['nss'], info['bandwidth_mhz']
+    else:
+        # Raw wlan_radio fields (tshark backend)
+        mcs, nss, bandwidth_mhz = RateTables.stream_params(typed(info['mcs_index']), typed(info['bandwidth']),
+                                                           typed(info.get('vht_mcs')), typed(info.get('vht_nss')),
+                                                           typed(info.get('vht_bandwidth')))
+    return {
+        'timestamp': typed(timestamp, float), 'length': typed(length),
+        'bssid': info['bssid'], 'ta': info['ta'], 'ra': info['ra'],
+        'type_subtype': typed(info['type_subtype'], lambda v: int(v, 0)),
+        'fc_retry': typed(info['fc_retry']),
+        'phy': typed(info['phy']), 'data_rate': typed(info['data_rate'], float),
+        'channel': typed(info['channel']), 'frequency': typed(info['frequency']),
+        'signal_dbm': typed(info['signal_dbm']), 'bandwidth': typed(info['bandwidth']),
+        'short_gi': typed(info['short_gi']), 'mcs_index': typed(info['mcs_index']),
+        'mcs': mcs, 'nss': nss, 'bandwidth_mhz': bandwidth_mhz,
+        'duration': typed(info['duration']), 'preamble': typed(info['preamble']),
+    }
+
+def derived_inputs(names):
+    """
+    Columns to extract to build the columns in names: the stored ones, and the inputs of the derived ones.
+    :param names: Names of the columns of the batch.
+    :return: List of column names, in the order of names.
+    """
+    inputs = [name for name in names if name not in DERIVED_COLUMNS]
+    for derived, derived_columns in DERIVED_INPUTS.items():
+        if derived in names:
+            inputs.extend(name for name in derived_columns if name not in inputs)
+    return inputs
+
+def build_derived(names, columns, valid):
+    """
+    Compute the derived columns from their inputs and keep the requested columns.
+    :param names: Names of the columns of the batch.
+    :param columns: Dictionary of the input columns (at least derived_inputs(names)).
+    :param valid: Dictionary of their validity masks.
+    :return: FrameBatch of the columns in names.
+    """
+    if 'spatial_streams' in names:
+        columns['spatial_streams'] = RateTables.spatial_streams_array(columns['nss'], valid['nss'])
+        valid['spatial_streams'] = np.ones(len(columns['nss']), dtype=np.bool_)
+    if 'phy_gap' in names:
+        columns['phy_gap'], valid['phy_gap'] = RateTables.phy_gaps(columns['signal_dbm'], valid['signal_dbm'],
+                                                                   columns['bandwidth_mhz'], valid['bandwidth_mhz'],
+                                                                   columns['mcs'], valid['mcs'],
+                                                                   columns['phy'])
+    return FrameBatch({name: columns[name] for name in names}, {name: valid[name] for name in names})
+
+class FrameBatch:
+    """
+    FrameBatch.py
+    Chunk of frames stored as typed numpy columns with a validity mask per column.
+    """
+    def __init__(self, columns, valid):
+        """
+        :param columns: Dictionary of column name to numpy array.
+        :param valid: Dictionary of column name to boolean array, False where the field is absent.
+        """
+        self.columns = columns
+        self.valid = valid
+
+    def __len__(self):
+        return len(next(iter(self.columns.values()))) if self.columns else 0
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def __contains__(self, name):
+        return name in self.columns
+
+    def select(self, mask):
+        """
+        Rows of the batch selected by a boolean mask, an index array or a slice.
+        :return: New FrameBatch.
+        """
+        return FrameBatch({name: column[mask] for name, column in self.columns.items()},
+                          {name: valid[mask] for name, valid in self.valid.items()})
+
+    @staticmethod
+    def concatenate(batches):
+        """
+        Concatenate batches with the same columns into one.
+        """
+        batches = list(batches)
+        if not batches:
+            return FrameBatch({}, {})
+        names = list(batches[0].columns)
+        return FrameBatch({name: np.concatenate([batch[name] for batch in batches]) for name in names},
+                          {name: np.concatenate([batch.valid[name] for batch in batches]) for name in names})
+
+
+class FrameBatchBuilder:
+    """
+    Accumulates frame values and builds FrameBatch objects.
+    """
+    def __init__(self, columns=None):
+        """
+        :param columns: Names of the columns to build (default: all columns).
+        """
+        self.names = list(columns) if columns else list(COLUMNS)
+        unknown = set(self.names) - set(COLUMNS)
+        if unknown:
+            raise ValueError(f"Unknown columns: {', '.join(sorted(unknown))}")
+        self.inputs = derived_inputs(self.names) # Derived columns need their inputs
+        self.rows = {name: [] for name in self.inputs}
+
+    def __len__(self):
+        return len(self.rows[self.inputs[0]])
+
+    def append(self, values):
+        """
+        Append the typed values of a frame (as returned by PcapngDecoder.decode_frame).
+        """
+        for name in self.inputs:
+            self.rows[name].append(values.get(name))
+
+    def build(self):
+        """
+        Build a FrameBatch from the appended frames and reset the builder.
+        """
+        columns, valid = {}, {}
+        for name in self.inputs:
+            rows = self.rows[name]
+            if name in MAC_COLUMNS:
+                rows = [mac_to_int(mac) for mac in rows]
+            mask = np.fromiter((value is not None for value in rows), dtype=np.bool_, count=len(rows))
+            columns[name] = np.array([0 if value is None else value for value in rows], dtype=COLUMNS[name])
+            valid[name] = mask
+            self.rows[name] = []
+
+        return build_derived(self.names, columns, valid)
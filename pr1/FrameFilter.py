@@ -0,0 +1,154 @@
+import struct
+import numpy as np
+import PcapngDecoder, FrameBatch
+
+# Columns read by batch_mask
+COLUMNS = ('type_subtype', 'ta', 'ra', 'bssid', 'channel', 'mcs_index')
+
+
+class FrameFilter:
+    """
+    FrameFilter.py
+    Declarative predicate on 802.11 frames, pushed down to the packet decoders by PcapReader:
+    a tshark display filter (-Y) on the pyshark and tshark backends, and early checks of the raw
+    802.11 header and radiotap header on the native backend, so rejected frames are never fully decoded.
+    Every condition given must hold, a condition left to None matches every frame.
+    """
+    def __init__(self, types=None, type_subtypes=None, ta=None, ra=None, bssid=None, channels=None, has_mcs=None):
+        """
+        :param types: Frame types to keep (0: management, 1: control, 2: data).
+        :param type_subtypes: Frame type/subtypes to keep, as wlan.fc.type_subtype (type << 4 | subtype).
+        :param ta: Transmitter address.
+        :param ra: Receiver address.
+        :param bssid: BSSID.
+        :param channels: Channel numbers to keep.
+        :param has_mcs: True to keep the frames with an 802.11n MCS index (data packets of doctor), False for the others.
+        """
+        self.types = frozenset(types) if types is not None else None
+        self.type_subtypes = frozenset(type_subtypes) if type_subtypes is not None else None
+        self.addresses = {name: address.lower() for name, address in (('ta', ta), ('ra', ra), ('bssid', bssid)) if address}
+        self.raw_addresses = {name: bytes.fromhex(address.replace(':', '')) for name, address in self.addresses.items()}
+        self.channels = frozenset(channels) if channels is not None else None
+        self.has_mcs = has_mcs
+
+    def __bool__(self):
+        return (self.types is not None or self.type_subtypes is not None or bool(self.addresses)
+                or self.channels is not None or self.has_mcs is not None)
+
+    def display_filter(self):
+        """
+        Equivalent wireshark display filter.
+        :return: Filter string or None if the filter matches every frame.
+        """
+        conditions = []
+        if self.types is not None:
+            conditions.append(f"wlan.fc.type in {{{' '.join(str(t) for t in sorted(self.types))}}}")
+        if self.type_subtypes is not None:
+            conditions.append(f"wlan.fc.type_subtype in {{{' '.join('0x%04x' % t for t in sorted(self.type_subtypes))}}}")
+        for name, address in self.addresses.items():
+            conditions.append(f"wlan.{name} == {address}")
+        if self.channels is not None:
+            conditions.append(f"wlan_radio.channel in {{{' '.join(str(c) for c in sorted(self.channels))}}}")
+        if self.has_mcs is not None:
+            conditions.append("wlan_radio.11n.mcs_index" if self.has_mcs else "!wlan_radio.11n.mcs_index")
+        return ' && '.join(conditions) if conditions else None
+
+    def match_header(self, data, offset, length):
+        """
+        Check the frame type and addresses on the raw 802.11 header, without decoding the frame.
+        :param data: Buffer holding the frame.
+        :param offset: Offset of the 802.11 header in the buffer.
+        :param length: Length of the 802.11 frame (a trailing FCS is harmless, absent addresses never match).
+        :return: False if the frame is rejected.
+        """
+        if length < 10:
+            return not self.addresses and self.types is None and self.type_subtypes is None
+        fc0, fc1 = data[offset], data[offset + 1]
+        frame_type = (fc0 >> 2) & 0x03
+        if self.types is not None and frame_type not in self.types:
+            return False
+        if self.type_subtypes is not None and (frame_type << 4) | ((fc0 >> 4) & 0x0f) not in self.type_subtypes:
+            return False
+        if self.raw_addresses:
+            ta, ra, bssid = PcapngDecoder.address_offsets(fc0, fc1, length)
+            for name, position in (('ta', ta), ('ra', ra), ('bssid', bssid)):
+                expected = self.raw_addresses.get(name)
+                if expected is not None and (position is None or data[offset + position:offset + position + 6] != expected):
+                    return False
+        return True
+
+    def match_frame(self, linktype, data, offset=0, length=None):
+        """
+        Early check of a captured frame, only reading the radiotap header length and the 802.11 header.
+        :return: False if the frame is rejected, True if it may match (check the decoded values with match).
+        """
+        if length is None:
+            length = len(data) - offset
+        if linktype == PcapngDecoder.LINKTYPE_IEEE802_11_RADIOTAP:
+            if length < 4:
+                return False
+            header, = struct.unpack_from('<H', data, offset + 2)
+        elif linktype == PcapngDecoder.LINKTYPE_IEEE802_11:
+            header = 0
+        else:
+            return False # Not an 802.11 packet
+        return self.match_header(data, offset + header, length - header)
+
+    def match_radio(self, info):
+        """
+        Check the radio conditions on the values of PcapngDecoder.decode_radio.
+        """
+        if self.channels is not None and info['channel'] not in self.channels:
+            return False
+        if self.has_mcs is not None and (info['mcs_index'] is not None) != self.has_mcs:
+            return False
+        return True
+
+    def match(self, values):
+        """
+        Check every condition on the typed values of a frame (PcapngDecoder.decode_frame or FrameBatch.values_from_info).
+        """
+        if values['type_subtype'] is None:
+            if self.types is not None or self.type_subtypes is not None:
+                return False
+        else:
+            if self.types is not None and values['type_subtype'] >> 4 not in self.types:
+                return False
+            if self.type_subtypes is not None and values['type_subtype'] not in self.type_subtypes:
+                return False
+        for name, address in self.addresses.items():
+            if values[name] is None or values[name].lower() != address:
+                return False
+        return self.match_radio(values)
+
+    def decode_frame(self, linktype, data, offset=0, length=None, columns=None):
+        """
+        Decode a frame with PcapngDecoder.decode_frame if it matches, checking the cheapest conditions first.
+        :return: Dictionary of the typed values or None if the frame is rejected.
+        """
+        if not self.match_frame(linktype, data, offset, length):
+            return None
+        radio = PcapngDecoder.decode_radio(linktype, data, offset, length)
+        if not self.match_radio(radio[0]):
+            return None
+        values = PcapngDecoder.decode_frame(linktype, data, offset, length, columns, radio)
+        return values if self.match(values) else None
+
+    def batch_mask(self, batch):
+        """
+        Vectorized match of a FrameBatch with the filter COLUMNS.
+        :return: Boolean mask of the matching frames.
+        """
+        mask = np.ones(len(batch), dtype=np.bool_)
+        valid = batch.valid
+        if self.types is not None:
+            mask &= valid['type_subtype'] & np.isin(batch['type_subtype'] >> 4, list(self.types))
+        if self.type_subtypes is not None:
+            mask &= valid['type_subtype'] & np.isin(batch['type_subtype'], list(self.type_subtypes))
+        for name, address in self.addresses.items():
+            mask &= valid[name] & (batch[name] == FrameBatch.mac_to_int(address))
+        if self.channels is not None:
+            mask &= valid['channel'] & np.isin(batch['channel'], list(self.channels))
+        if self.has_mcs is not None:
+            mask &= valid['mcs_index'] == self.has_mcs
+        return mask
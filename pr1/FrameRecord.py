@@ -0,0 +1,254 @@
+import numpy as np
+import FrameBatch
+
+# Fields of a frame record: the FrameBatch columns that are read from the frames (derived columns are computed)
+FIELDS = tuple(name for name in FrameBatch.COLUMNS if name not in FrameBatch.DERIVED_COLUMNS)
+MAC_FIELDS = FrameBatch.MAC_COLUMNS
+# Bit of each field in the validity mask of a stored record
+FIELD_BITS = {name: 1 << index for index, name in enumerate(FIELDS)}
+# Stored record: the FrameBatch types, MAC addresses as dense ids of a MacTable, and a validity bit per field
+RECORD_DTYPE = np.dtype([(name, np.uint32 if name in MAC_FIELDS else FrameBatch.COLUMNS[name]) for name in FIELDS]
+                        + [('valid', np.uint32)])
+DEFAULT_CAPACITY = 65536 # Initial records of a FrameStore, doubled when full
+
+
+class MacTable:
+    """
+    Intern table of MAC addresses: every address gets a dense id (0, 1, 2, ...) the first time it is seen,
+    so frames store 4 byte ids and compare addresses as integers.
+    """
+    def __init__(self):
+        self.ids = {} # Packed address (48 bit integer): id
+        self.macs = [] # Id: packed address
+
+    def __len__(self):
+        return len(self.macs)
+
+    def __contains__(self, mac):
+        return FrameBatch.mac_to_int(mac) in self.ids
+
+    def intern(self, mac):
+        """
+        Id of an address, added to the table if new.
+        :param mac: Colon separated address or packed 48 bit integer.
+        :return: Id or None for a missing address.
+        """
+        mac = FrameBatch.mac_to_int(mac)
+        if mac is None:
+            return None
+        mac_id = self.ids.get(mac)
+        if mac_id is None:
+            mac_id = self.ids[mac] = len(self.macs)
+            self.macs.append(mac)
+        return mac_id
+
+    def lookup(self, mac):
+        """
+        Id of an address without adding it (None if the address was never seen, so it matches no frame).
+        """
+        return self.ids.get(FrameBatch.mac_to_int(mac))
+
+    def intern_array(self, macs, valid=None):
+        """
+        Vectorized intern of a column of packed addresses (a FrameBatch MAC column).
+        Only the distinct addresses go through the table.
+        :param valid: Boolean mask of the present addresses (None if all are present), absent ones get id 0.
+        :return: uint32 array of ids.
+        """
+        present = macs if valid is None else macs[valid]
+        unique, inverse = np.unique(present, return_inverse=True)
+        ids = np.fromiter((self.intern(mac) for mac in unique.tolist()), dtype=np.uint32, count=len(unique))
+        if valid is None:
+            return ids[inverse]
+        result = np.zeros(len(macs), dtype=np.uint32)
+        result[valid] = ids[inverse]
+        return result
+
+    def packed(self, ids):
+        """
+        Packed addresses (uint64) of an array of ids.
+        """
+        return np.asarray(self.macs, dtype=np.uint64)[ids] if self.macs else np.zeros(len(ids), dtype=np.uint64)
+
+    def address(self, mac_id):
+        """
+        Colon separated address of an id.
+        """
+        return FrameBatch.int_to_mac(self.macs[mac_id])
+
+
+class FrameRecord:
+    """
+    FrameRecord.py
+    Compact frame record: one slot per field instead of a dictionary of strings, MAC addresses packed
+    in 48 bit integers and enumerations (PHY, bandwidth, type/subtype) as small integers, None for absent fields.
+    Addresses are compared as integers: pack the address once with FrameBatch.mac_to_int.
+    """
+    __slots__ = FIELDS
+
+    def __init__(self, *values):
+        """
+        :param values: Values of FIELDS in order (missing trailing values are None).
+        """
+        for name, value in zip(FIELDS, values):
+            setattr(self, name, value)
+        for name in FIELDS[len(values):]:
+            setattr(self, name, None)
+
+    @classmethod
+    def from_values(cls, values):
+        """
+        Record of the typed values of a frame (PcapngDecoder.decode_frame or FrameBatch.values_from_info).
+        """
+        record = cls.__new__(cls)
+        for name in FIELDS:
+            setattr(record, name, values.get(name))
+        for name in MAC_FIELDS:
+            setattr(record, name, FrameBatch.mac_to_int(values.get(name)))
+        return record
+
+    def values(self):
+        """
+        Typed values of the frame, with colon separated addresses.
+        """
+        values = {name: getattr(self, name) for name in FIELDS}
+        for name in MAC_FIELDS:
+            if values[name] is not None:
+                values[name] = FrameBatch.int_to_mac(values[name])
+        return values
+
+    def address(self, name):
+        """
+        Colon separated address of a MAC field (None if absent).
+        """
+        mac = getattr(self, name)
+        return FrameBatch.int_to_mac(mac) if mac is not None else None
+
+    def __eq__(self, other):
+        return isinstance(other, FrameRecord) and all(getattr(self, name) == getattr(other, name) for name in FIELDS)
+
+    def __repr__(self):
+        return f"FrameRecord({', '.join(f'{name}={value!r}' for name, value in self.values().items() if value is not None)})"
+
+
+class FrameStore:
+    """
+    Frames kept for later analysis in one structured numpy array of RECORD_DTYPE records
+    (RECORD_DTYPE.itemsize, 54 bytes per frame), with the addresses interned in a MacTable.
+    """
+    def __init__(self, capacity=DEFAULT_CAPACITY, macs=None):
+        """
+        :param capacity: Initial number of records, doubled when full.
+        :param macs: MacTable shared with other stores (None for a new table).
+        """
+        self.macs = macs if macs is not None else MacTable()
+        self.frames = np.zeros(capacity, dtype=RECORD_DTYPE)
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def nbytes(self):
+        """
+        Bytes of the stored records.
+        """
+        return self.size * RECORD_DTYPE.itemsize
+
+    def records(self):
+        """
+        Structured array of the stored records (a view, no copy).
+        """
+        return self.frames[:self.size]
+
+    def _reserve(self, count):
+        if self.size + count > len(self.frames):
+            frames = np.zeros(max(2 * len(self.frames), self.size + count), dtype=RECORD_DTYPE)
+            frames[:self.size] = self.frames[:self.size]
+            self.frames = frames
+
+    def append(self, record):
+        """
+        Store a frame.
+        :param record: FrameRecord or dictionary of typed values.
+        """
+        if not isinstance(record, FrameRecord):
+            record = FrameRecord.from_values(record)
+        self._reserve(1)
+        row = self.frames[self.size]
+        valid = 0
+        for name in FIELDS:
+            value = getattr(record, name)
+            if value is None:
+                continue
+            row[name] = self.macs.intern(value) if name in MAC_FIELDS else value
+            valid |= FIELD_BITS[name]
+        row['valid'] = valid
+        self.size += 1
+
+    def extend_batch(self, batch):
+        """
+        Store the frames of a FrameBatch (the fields it lacks are stored as absent).
+        """
+        count = len(batch)
+        self._reserve(count)
+        rows = self.frames[self.size:self.size + count]
+        valid = np.zeros(count, dtype=np.uint32)
+        for name in FIELDS:
+            if name not in batch:
+                continue
+            if name in MAC_FIELDS:
+                rows[name] = self.macs.intern_array(batch[name], batch.valid[name])
+            else:
+                rows[name] = batch[name]
+            valid |= np.where(batch.valid[name], np.uint32(FIELD_BITS[name]), np.uint32(0))
+        rows['valid'] = valid
+        self.size += count
+
+    def valid(self, name):
+        """
+        Boolean mask of the records with the field present.
+        """
+        return (self.records()['valid'] & FIELD_BITS[name]) != 0
+
+    def record(self, index):
+        """
+        FrameRecord of a stored frame.
+        """
+        row = self.frames[:self.size][index]
+        valid = int(row['valid'])
+        values = []
+        for name in FIELDS:
+            if not valid & FIELD_BITS[name]:
+                values.append(None)
+            elif name in MAC_FIELDS:
+                values.append(self.macs.macs[int(row[name])])
+            else:
+                values.append(row[name].item())
+        return FrameRecord(*values)
+
+    def address_mask(self, name, mac):
+        """
+        Boolean mask of the records whose MAC field is an address, compared on the interned ids.
+        """
+        mac_id = self.macs.lookup(mac)
+        if mac_id is None:
+            return np.zeros(self.size, dtype=np.bool_)
+        return self.valid(name) & (self.records()[name] == mac_id)
+
+    def to_batch(self, columns=None, mask=None):
+        """
+        FrameBatch of the stored frames, for MetricsEngine, DensityTracker and WindowAggregator.
+        :param columns: Names of the columns (default: all of FrameBatch.COLUMNS, derived columns are computed).
+        :param mask: Boolean mask, index array or slice of the records (None for all).
+        """
+        names = list(columns) if columns else list(FrameBatch.COLUMNS)
+        records = self.records() if mask is None else self.records()[mask]
+        columns, valid = {}, {}
+        for name in FrameBatch.derived_inputs(names):
+            valid[name] = (records['valid'] & FIELD_BITS[name]) != 0
+            if name in MAC_FIELDS:
+                columns[name] = np.where(valid[name], self.macs.packed(records[name]), 0).astype(np.uint64)
+            else:
+                columns[name] = records[name].copy()
+        return FrameBatch.build_derived(names, columns, valid)
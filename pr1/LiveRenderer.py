@@ -0,0 +1,77 @@
+import time
+
+# Series of the visualization data and their legend
+SERIES = (
+    ('data_rate', "Throughput (Mbps)"),
+    ('phy_gap', "PHY Gap"),
+    ('phy', "PHY"),
+    ('bandwidth', "Bandwidth"),
+    ('sgi', "Short GI (0/1)"),
+    ('ssi', "Signal Strength (dBm)"),
+)
+
+
+class LiveRenderer:
+    """
+    LiveRenderer.py
+    Rate limited matplotlib view of the doctor metrics.
+    The figure and its artists are created once, every redraw only updates their data,
+    and redraws are skipped until 1/max_fps seconds have passed since the previous one.
+    """
+    def __init__(self, max_fps=2.0):
+        """
+        :param max_fps: Maximum number of redraws per second.
+        """
+        import matplotlib.pyplot as plt # Only interactive runs need matplotlib
+        self.plt = plt
+        self.interval = 1.0 / max_fps if max_fps > 0 else 0.0
+        self.last_draw = 0.0 # Time of the last redraw
+
+        plt.ion()
+        self.figure = plt.figure(1, figsize=(18, 9))
+        self.plot_axes = self.figure.add_subplot(1, 2, 1)
+        self.lines = {}
+        for name, label in SERIES:
+            self.lines[name], = self.plot_axes.plot([], [], label=label)
+        self.plot_axes.set_xlabel("Time Steps")
+        self.plot_axes.set_ylabel("Value")
+        self.plot_axes.set_title("Dynamic Network Performance")
+        self.plot_axes.legend()
+        self.plot_axes.grid()
+
+        self.text_axes = self.figure.add_subplot(1, 2, 2)
+        self.text_axes.axis('off')
+        self.text = self.text_axes.text(0.01, 0.5, "", fontsize=10, ha='left', va='center', family=['monospace'],
+                                        transform=self.text_axes.transAxes)
+
+    def update(self, visualization_data, get_text, force=False):
+        """
+        Redraw the figure if the rate limit allows it.
+        :param visualization_data: Dictionary of series name to list of values.
+        :param get_text: Callable returning the metrics text, only called when redrawing.
+        :param force: Redraw regardless of the rate limit.
+        :return: True if the figure was redrawn.
+        """
+        now = time.monotonic()
+        if not force and now - self.last_draw < self.interval:
+            return False
+        self.last_draw = now
+
+        for name, line in self.lines.items():
+            values = visualization_data[name]
+            line.set_data(range(len(values)), values)
+        self.plot_axes.relim()
+        self.plot_axes.autoscale_view()
+        self.text.set_text(get_text())
+
+        self.figure.canvas.draw_idle()
+        self.figure.canvas.flush_events()
+        return True
+
+    def show(self, visualization_data, get_text):
+        """
+        Draw the final state and keep the figure open until the user closes it.
+        """
+        self.update(visualization_data, get_text, force=True)
+        self.plt.ioff()
+        self.plt.show()
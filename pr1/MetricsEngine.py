@@ -0,0 +1,107 @@
+from collections import deque
+import numpy as np
+import FrameBatch
+
+# Found on various forums and websites
+# Max threasholds of bad performance ( > thereshold = good performance)
+BAD_PHY = 5
+BAD_MCS = 6
+BAD_BANDWIDTH = 0
+BAD_SIGNAL = -80
+
+# Columns read by the engine
+COLUMNS = ('ta', 'ra', 'fc_retry', 'phy', 'data_rate', 'bandwidth', 'short_gi', 'mcs_index', 'signal_dbm', 'phy_gap')
+
+
+def new_performance_monitor_data():
+    return {
+        # Total values
+        'total_packets': 0, 'retry_packets': 0, 'sum_data_rate': 0, 'max_data_rate': 0, 'min_data_rate': 1000,
+        # Last entries
+        'data_rate_le': deque(maxlen=30), # Limit the number of entries to 30
+    }
+
+def new_performance_analysis_data():
+    return {
+        # Total values
+        'total': 0, 'discarted': 0, 'phy': 0, 'bandwidth': 0, 'sgi': 0, 'mcs': 0, 'ssi': 0, 'phy_gap': 0
+    }
+
+
+class MetricsEngine:
+    """
+    MetricsEngine.py
+    Computes the performance monitor and analysis metrics of doctor.process_packets
+    on FrameBatch column batches with numpy reductions.
+    """
+    def __init__(self, src_address=None, dst_address=None):
+        """
+        :param src_address: Only count frames transmitted by this address (None for all).
+        :param dst_address: Only count frames received by this address (None for all).
+        """
+        self.src = FrameBatch.mac_to_int(src_address)
+        self.dst = FrameBatch.mac_to_int(dst_address)
+        self.performance_monitor_data = new_performance_monitor_data()
+        self.performance_analysis_data = new_performance_analysis_data()
+
+    def address_mask(self, batch):
+        """
+        Boolean mask of the frames matching the source and destination filter.
+        """
+        mask = np.ones(len(batch), dtype=np.bool_)
+        if self.src is not None:
+            mask &= batch.valid['ta'] & (batch['ta'] == self.src)
+        if self.dst is not None:
+            mask &= batch.valid['ra'] & (batch['ra'] == self.dst)
+        return mask
+
+    def update(self, batch):
+        """
+        Update the metrics with a batch of frames.
+        :param batch: FrameBatch with at least the engine COLUMNS.
+        """
+        monitor = self.performance_monitor_data
+        analysis = self.performance_analysis_data
+        valid = batch.valid
+
+        selected = self.address_mask(batch)
+        data = selected & valid['mcs_index'] # Means it is a data packet (Others have minimal impact)
+        analysis['discarted'] += int(np.count_nonzero(selected & ~valid['mcs_index']))
+        count = int(np.count_nonzero(data))
+        if count == 0:
+            return
+
+        # Monitor
+        data_rate = np.where(valid['data_rate'], batch['data_rate'], 0).astype(np.float64)[data]
+        monitor['retry_packets'] += int(np.count_nonzero(batch['fc_retry'][data]))
+        monitor['total_packets'] += count
+        monitor['sum_data_rate'] += float(data_rate.sum())
+        monitor['max_data_rate'] = max(monitor['max_data_rate'], float(data_rate.max()))
+        monitor['min_data_rate'] = min(monitor['min_data_rate'], float(data_rate.min()))
+        # Add to the list of last entries
+        monitor['data_rate_le'].extend(data_rate[-monitor['data_rate_le'].maxlen:].tolist())
+
+        # Analysis, count the packets over the threshold of "good metric"
+        analysis['total'] += count
+        analysis['phy'] += int(np.count_nonzero(data & valid['phy'] & (batch['phy'] > BAD_PHY)))
+        analysis['bandwidth'] += int(np.count_nonzero(data & valid['bandwidth'] & (batch['bandwidth'] > BAD_BANDWIDTH)))
+        analysis['sgi'] += int(np.count_nonzero(data & valid['short_gi'] & batch['short_gi']))
+        analysis['mcs'] += int(np.count_nonzero(data & (batch['mcs_index'] > BAD_MCS)))
+        analysis['ssi'] += int(np.count_nonzero(data & valid['signal_dbm'] & (batch['signal_dbm'] > BAD_SIGNAL)))
+        analysis['phy_gap'] += int(batch['phy_gap'][data & valid['phy_gap']].sum(dtype=np.int64))
+
+    def merge(self, other):
+        """
+        Merge the metrics of another engine, whose frames follow the frames of this one.
+        Merging is associative, partial results of consecutive chunks can be merged in any grouping.
+        """
+        monitor, other_monitor = self.performance_monitor_data, other.performance_monitor_data
+        for key in ('total_packets', 'retry_packets', 'sum_data_rate'):
+            monitor[key] += other_monitor[key]
+        monitor['max_data_rate'] = max(monitor['max_data_rate'], other_monitor['max_data_rate'])
+        monitor['min_data_rate'] = min(monitor['min_data_rate'], other_monitor['min_data_rate'])
+        monitor['data_rate_le'].extend(other_monitor['data_rate_le'])
+
+        for key, value in other.performance_analysis_data.items():
+            self.performance_analysis_data[key] += value
+        return self
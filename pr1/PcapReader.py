@@ -1,27 +1,86 @@
-import pyshark
+import asyncio, concurrent.futures, itertools, subprocess, threading
+import time
+import PcapngDecoder, FrameBatch, CaptureStream, RateTables
+
+# Available packet decoders
+BACKENDS = ('pyshark', 'native', 'tshark')
+
+# Wireshark field of every FrameBatch column and of the 802.11ac values, extracted by the tshark backend
+TSHARK_FIELDS = {
+    'timestamp': 'frame.time_epoch', 'length': 'frame.len',
+    'bssid': 'wlan.bssid', 'ta': 'wlan.ta', 'ra': 'wlan.ra',
+    'type_subtype': 'wlan.fc.type_subtype', 'fc_retry': 'wlan.fc.retry',
+    'phy': 'wlan_radio.phy', 'data_rate': 'wlan_radio.data_rate', 'channel': 'wlan_radio.channel',
+    'frequency': 'wlan_radio.frequency', 'signal_dbm': 'wlan_radio.signal_dbm',
+    'bandwidth': 'wlan_radio.11n.bandwidth', 'short_gi': 'wlan_radio.11n.short_gi', 'mcs_index': 'wlan_radio.11n.mcs_index',
+    'duration': 'wlan_radio.duration', 'preamble': 'wlan_radio.preamble',
+    'vht_bandwidth': 'wlan_radio.11ac.bandwidth', 'vht_short_gi': 'wlan_radio.11ac.short_gi',
+    'vht_mcs': 'wlan_radio.11ac.mcs', 'vht_nss': 'wlan_radio.11ac.nss',
+}
+# Fields the columns without wireshark field are computed from (RateTables.stream_params)
+TSHARK_SOURCES = {
+    'mcs': ('mcs_index', 'vht_mcs'), 'nss': ('mcs_index', 'vht_nss'), 'bandwidth_mhz': ('bandwidth', 'vht_bandwidth'),
+}
+# Items read ahead of the consumer of PcapReader.aiter
+DEFAULT_QUEUE_SIZE = 8
+# Seconds between two checks of a reader thread waiting on a full aiter queue
+PUT_POLL_INTERVAL = 0.1
+# tshark prints booleans as True/False or 1/0 depending on its version
+BOOLEANS = {'True': '1', 'False': '0'}
+
 class PcapReader:
     """
     PcapReader.py
-    802.11 packet reader using PyShark.
+    802.11 packet reader using PyShark, tshark field extraction or the native pcapng decoder.
     """
-    def __init__(self, file_path):
+    def __init__(self, file_path, backend='pyshark', use_mmap=False, frame_range=None, cache=None, follow=False, idle_timeout=None,
+                 frame_filter=None, profiler=None):
         """
         Initialize the PcapReader with the path to the pcap file.
-        :param file_path: Path to the pcap file.
+        :param file_path: Path to the pcap file or pipe, '-' for stdin.
+        :param backend: 'pyshark' to dissect packets with tshark (reference),
+                        'tshark' to only extract the needed fields with tshark -T fields,
+                        'native' to decode radiotap and 802.11 headers in python.
+        :param use_mmap: Memory map the file and yield lazily decoded PcapngDecoder.FrameView objects (native backend only).
+        :param frame_range: Tuple (start, stop) to only read the frames with index start <= index < stop (None for all).
+        :param cache: CaptureCache.CaptureCache used by read_batches to store and load the extracted columns (None for no cache).
+        :param follow: Follow a capture file that is still being written, waiting for new frames at its end (tail mode).
+        :param idle_timeout: Stop following after this many seconds without new frames (None to follow forever).
+        :param frame_filter: FrameFilter.FrameFilter of the frames to read, applied by the decoder (None for every frame).
+        :param profiler: Profiler.Profiler counting the opened captures, dropped frames and cache hits (None for no profiling).
         """
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown backend: {backend} (expected one of {', '.join(BACKENDS)})")
+        if use_mmap and backend != 'native':
+            raise ValueError("Memory mapped reading requires the native backend")
+        # Live captures are read as a stream of blocks, by the native decoder only
+        self.streaming = follow or file_path == CaptureStream.STDIN
+        if self.streaming and (backend != 'native' or use_mmap or cache is not None):
+            raise ValueError("Live captures require the native backend without memory mapping or cache")
         self.file_path = file_path
+        self.backend = backend
+        self.use_mmap = use_mmap
+        self.frame_range = frame_range
+        self.cache = cache
+        self.follow = follow
+        self.idle_timeout = idle_timeout
+        self.frame_filter = frame_filter if frame_filter else None
+        self.profiler = profiler
         self.capture = None # Capture object of a pcap file
 
     def read_packets(self):
         """
         Generator to read packets from the pcap file.
-        Yields packets as pyshark.packet.packet.Packet objects.
+        Yields packets as pyshark.packet.packet.Packet objects (PcapngDecoder.NativePacket on the native backend).
         """
         try:
             # Initialize capture object and read all packets
-            self.capture = pyshark.FileCapture(self.file_path)
+            self.capture = self._open_capture()
             for packet in self.capture:
                 yield packet
+        except ValueError:
+            self.capture = None
+            raise
         except FileNotFoundError:
             self.capture = None
             raise ValueError(f"File not found: {self.file_path}")
@@ -35,7 +94,7 @@ class PcapReader:
         :return: pyshark.packet.packet.Packet object or None if end of file is reached.
         """
         if self.capture is None: # initialize a new capture object
-            self.capture = pyshark.FileCapture(self.file_path)
+            self.capture = self._open_capture()
 
         try:
             # Returns next packet
@@ -47,6 +106,233 @@ class PcapReader:
             self.close()
             raise ValueError("Error reading next packet. Ensure the capture is valid.")
 
+    def read_batches(self, batch_size=65536, columns=None, max_latency=None):
+        """
+        Generator to read the packets of the pcap file in column batches.
+        Yields FrameBatch.FrameBatch objects of at most batch_size frames.
+        :param batch_size: Number of frames per batch.
+        :param columns: Names of the columns to extract (default: all of FrameBatch.COLUMNS).
+        :param max_latency: Yield a partial batch once its first frame is this many seconds old,
+                            so live captures with little traffic are still reported (None to always fill batches).
+        """
+        if self.cache is not None:
+            yield from self._read_cached_batches(batch_size, columns)
+            return
+        builder = FrameBatch.FrameBatchBuilder(columns)
+        first_frame = None # Arrival time of the first frame of the batch
+        for values in self._read_values(builder.inputs):
+            builder.append(values)
+            if max_latency is not None and first_frame is None:
+                first_frame = time.monotonic()
+            if len(builder) == batch_size or (first_frame is not None and time.monotonic() - first_frame >= max_latency):
+                first_frame = None
+                yield builder.build()
+        if len(builder) > 0:
+            yield builder.build()
+
+    def read_records(self):
+        """
+        Generator of the frames as compact FrameRecord.FrameRecord objects (packed addresses, small integer fields),
+        to keep many frames in memory; FrameRecord.FrameStore keeps them as one structured array.
+        """
+        import FrameRecord
+        for values in self._read_values(FrameRecord.FIELDS):
+            yield FrameRecord.FrameRecord.from_values(values)
+
+    async def aiter(self, batch_size=None, columns=None, max_latency=None, queue_size=DEFAULT_QUEUE_SIZE):
+        """
+        Asynchronous iterator of the packets (read_packets) or batches (read_batches), for async for loops.
+        The capture is read by a thread into a bounded queue, so several readers share one event loop:
+        the thread waits while queue_size items are pending, a slow consumer only holds back its own reader.
+        :param batch_size: Yield FrameBatch.FrameBatch objects of at most batch_size frames (None to yield packets).
+        :param columns: Names of the columns of the batches (default: all of FrameBatch.COLUMNS).
+        :param max_latency: As in read_batches.
+        :param queue_size: Items read ahead of the consumer.
+        """
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(queue_size)
+        stop = threading.Event() # Set when the consumer leaves the loop
+
+        def put(entry):
+            """
+            Queue an entry, waiting while the queue is full.
+            :return: False if the consumer left or the event loop stopped before the entry was queued.
+            """
+            try:
+                future = asyncio.run_coroutine_threadsafe(queue.put(entry), loop)
+            except RuntimeError: # Event loop closed
+                return False
+            try:
+                while True:
+                    try:
+                        future.result(PUT_POLL_INTERVAL)
+                        return True
+                    except concurrent.futures.TimeoutError:
+                        if stop.is_set() or not loop.is_running():
+                            return False
+            finally:
+                if not future.done():
+                    try:
+                        future.cancel()
+                    except RuntimeError: # Event loop closed, the pending put is dropped with it
+                        pass
+
+        def produce():
+            items = self.read_batches(batch_size, columns, max_latency) if batch_size else self.read_packets()
+            end = (None, None)
+            try:
+                for item in items:
+                    if not put((item, None)) or stop.is_set():
+                        return
+            except Exception as e:
+                end = (None, e)
+            finally:
+                items.close()
+            if not stop.is_set():
+                put(end)
+
+        threading.Thread(target=produce, name=f"PcapReader {self.file_path}", daemon=True).start()
+        try:
+            while True:
+                item, error = await queue.get()
+                if item is None:
+                    if error is not None:
+                        raise error
+                    return
+                yield item
+        finally:
+            stop.set()
+            # Unblock a pending put, the thread then sees stop
+            while not queue.empty():
+                queue.get_nowait()
+
+    def _read_cached_batches(self, batch_size, columns):
+        """
+        Serve the batches from the cache, extracting every column of the whole file on a miss.
+        """
+        frames = self.cache.load(self.file_path, self.backend)
+        if self.profiler:
+            self.profiler.count('cache_hits' if frames is not None else 'cache_misses')
+        if frames is None:
+            builder = FrameBatch.FrameBatchBuilder()
+            frame_range, self.frame_range = self.frame_range, None
+            frame_filter, self.frame_filter = self.frame_filter, None
+            try:
+                batches = []
+                for values in self._read_values():
+                    builder.append(values)
+                    if len(builder) == batch_size:
+                        batches.append(builder.build())
+                batches.append(builder.build())
+            finally:
+                self.frame_range = frame_range
+                self.frame_filter = frame_filter
+            frames = FrameBatch.FrameBatch.concatenate(batches)
+            self.cache.store(self.file_path, self.backend, frames)
+
+        names = list(columns) if columns else list(FrameBatch.COLUMNS)
+        start, stop = self.frame_range if self.frame_range is not None else (0, None)
+        stop = len(frames) if stop is None else min(stop, len(frames))
+        for offset in range(start, stop, batch_size):
+            batch = frames.select(slice(offset, min(offset + batch_size, stop)))
+            if self.frame_filter is not None:
+                # The cache holds every frame, the filter applies to the cached columns
+                batch = batch.select(self.frame_filter.batch_mask(batch))
+            yield FrameBatch.FrameBatch({name: batch[name] for name in names}, {name: batch.valid[name] for name in names})
+
+    def _read_values(self, columns=None):
+        """
+        Generator of the typed values of every 802.11 frame of the pcap file that matches the frame filter.
+        :param columns: Names of the FrameBatch columns needed (None for every value), other values may be None.
+        """
+        frame_filter = self.frame_filter
+        if self.backend == 'native':
+            decoder = PcapngDecoder.PcapngDecoder(self._source())
+            try:
+                if self.use_mmap:
+                    for view in self._slice(decoder.read_frame_views()):
+                        if frame_filter is not None and not (frame_filter.match_frame(view.linktype, view.buffer, view.offset, view.length)
+                                                             and frame_filter.match_radio(view.radio)):
+                            continue
+                        values = view.values
+                        if frame_filter is not None and not frame_filter.match(values):
+                            continue
+                        values['timestamp'], values['length'] = view.sniff_timestamp, view.orig_len
+                        yield values
+                else:
+                    for linktype, timestamp, data, length in self._slice(decoder.read_frames()):
+                        if frame_filter is not None:
+                            values = frame_filter.decode_frame(linktype, data, columns=columns)
+                            if values is None:
+                                continue
+                        else:
+                            values = PcapngDecoder.decode_frame(linktype, data, columns=columns)
+                        values['timestamp'], values['length'] = timestamp, length
+                        yield values
+            finally:
+                decoder.close()
+            return
+        if self.backend == 'tshark':
+            capture = TsharkCapture(self.file_path, self._display_filter(), columns)
+            try:
+                yield from capture.read_values()
+            finally:
+                capture.close()
+            return
+        for packet in self.read_packets():
+            try:
+                info = self.get_80211_info(packet)
+            except ValueError: # No wlan or wlan_radio layer
+                if self.profiler:
+                    self.profiler.count('dropped_frames')
+                continue
+            yield FrameBatch.values_from_info(info, packet.sniff_timestamp, packet.length)
+
+    def _slice(self, frames):
+        """
+        Restrict an iterator of frames to the frame range, skipped frames are not decoded.
+        """
+        if self.frame_range is None:
+            return frames
+        return itertools.islice(frames, *self.frame_range)
+
+    def _source(self):
+        """
+        Source of the native decoder: the file path, or a CaptureStream of a live capture.
+        """
+        if self.streaming:
+            return CaptureStream.CaptureStream(self.file_path, self.follow, idle_timeout=self.idle_timeout)
+        return self.file_path
+
+    def _display_filter(self):
+        """
+        tshark display filter of the frame range and frame filter (None for every frame).
+        """
+        conditions = []
+        if self.frame_range is not None:
+            # tshark numbers frames from 1
+            start, stop = self.frame_range
+            conditions.append(f"frame.number > {start}" + (f" && frame.number <= {stop}" if stop is not None else ""))
+        if self.frame_filter is not None:
+            conditions.append(self.frame_filter.display_filter())
+        return ' && '.join(f"({condition})" for condition in conditions) if conditions else None
+
+    def _open_capture(self):
+        """
+        Open a capture object for the selected backend.
+        """
+        if self.profiler:
+            self.profiler.count('captures_opened')
+        if self.backend == 'native':
+            return NativeCapture(self._source(), self.use_mmap, self.frame_range, self.frame_filter)
+        if self.backend == 'tshark':
+            return TsharkCapture(self.file_path, self._display_filter())
+        import pyshark # Only the pyshark backend spawns tshark through it
+        display_filter = self._display_filter()
+        if display_filter:
+            return pyshark.FileCapture(self.file_path, display_filter=display_filter)
+        return pyshark.FileCapture(self.file_path)
+
     def get_80211_info(self, packet):
         """
         Extract 802.11 wireless information from a packet.
@@ -55,8 +341,15 @@ class PcapReader:
         """
         try:
             # Layers
-            wlan_layer = packet.get_multiple_layers('wlan')[0]
-            wlan_radio_layer = packet.get_multiple_layers('wlan_radio')[0]
+            wlan_layers = packet.get_multiple_layers('wlan')
+            wlan_radio_layers = packet.get_multiple_layers('wlan_radio')
+            if not wlan_layers or not wlan_radio_layers:
+                raise ValueError("Not an 802.11 packet.")
+            wlan_layer, wlan_radio_layer = wlan_layers[0], wlan_radio_layers[0]
+
+            # Streams and channel width from the 802.11n or 802.11ac fields
+            mcs, nss, bandwidth_mhz = RateTables.stream_params(*(self.get_int(wlan_radio_layer, name) for name in
+                                                                 ('11n_mcs_index', '11n_bandwidth', '11ac_mcs', '11ac_nss', '11ac_bandwidth')))
 
             info = {
                 # IEEE 802.11 Beacon Frame Information
@@ -77,13 +370,14 @@ class PcapReader:
                 'mcs_index': wlan_radio_layer.get_field('11n_mcs_index'), # MCS Index
                 'duration': wlan_radio_layer.get_field('duration'), # Duration
                 'preamble': wlan_radio_layer.get_field('preamble'), # Preamble
+                'mcs': mcs, # MCS per spatial stream (802.11n or 802.11ac)
+                'nss': nss, # Spatial streams (802.11n or 802.11ac)
+                'bandwidth_mhz': bandwidth_mhz, # Channel width in MHz (802.11n or 802.11ac)
                 
                 # Extra calculations
-                'spatial_streams': self.calculate_spatial_streams(wlan_radio_layer.get_field('11n_mcs_index')), # Number of spatial streams
-                'phy_gap': self.get_phy_gap(wlan_radio_layer.get_field('signal_dbm'), 
-                                             wlan_radio_layer.get_field('11n_bandwidth'), 
-                                             wlan_radio_layer.get_field('11n_mcs_index'),
-                                             self.calculate_spatial_streams(wlan_radio_layer.get_field('11n_mcs_index'))), # PHY Gain
+                'spatial_streams': nss or 0, # Number of spatial streams
+                'phy_gap': self.get_stream_phy_gap(wlan_radio_layer.get_field('signal_dbm'), bandwidth_mhz, mcs,
+                                                   wlan_radio_layer.get_field('phy')), # PHY Gain
                 
                 # Extra info
                 'ssid': self.get_ssid(packet),
@@ -94,43 +388,49 @@ class PcapReader:
         except AttributeError: # Handle case where layers are not present
             raise ValueError("Not an 802.11 packet.")
 
+    @staticmethod
+    def get_int(layer, name):
+        """
+        Integer value of a layer field.
+        :return: Integer or None if the field is absent.
+        """
+        value = layer.get_field(name)
+        return int(value) if value not in (None, '') else None
+
     def calculate_spatial_streams(self, mcs_index):
         """
         Calculate the number of spacial streams based on the MCS index.
-        :param mcs_index: MCS index value.
+        :param mcs_index: 802.11n MCS index value.
         :return: Number of spacial streams.
         """
-        # From table: 0 to 7 has 1 spacial stream, 8 to 15 has 2 spacial streams.
-        return int(mcs_index) // 8 + 1 if mcs_index is not None else 0
+        return RateTables.spatial_streams(int(mcs_index) if mcs_index is not None else None)
 
     def get_phy_gap(self, rssi, bandwidth, mcs_index, spatial_streams):
         """
-        Calculate the PHY gain based on RSSI and bandwidth.
+        Calculate the PHY gain of an 802.11n frame based on RSSI and bandwidth.
         :param rssi: Received Signal Strength Indicator (RSSI).
-        :param bandwidth: Bandwidth in MHz.
+        :param bandwidth: Bandwidth [0: 20, 1: 40, 2: 80, 3: 160].
+        :param mcs_index: 802.11n MCS index value.
+        :param spatial_streams: Number of spacial streams of the MCS index.
         :return: PHY gain.
         """
-        # Convert table for each Bandwidth [0: 20, 1: 40, 2: 80, 3: 160]
-        expected_mcs = { 0: [ -82, -79, -77, -74, -70, -66, -65, -64 ],
-                         1: [ -79, -76, -74, -71, -67, -63, -62, -61 ],
-                         2: [ -76, -73, -71, -68, -64, -60, -59, -58 ],
-                         3: [ -73, -70, -68, -65, -61, -57, -56, -55 ] }
-        
         if bandwidth is None or mcs_index is None:
             return None # No bandwidth or mcs index means no phy gap
-        
-        if rssi is None:
-            return 4 # Arbitrary value, means no signal strength (bad packet)
-        
-        # Get expected mcs
-        for i, m in  enumerate(expected_mcs[int(bandwidth)]):
-            if int(rssi) >= m:
-                expected_mcs = i
-            else:
-                break
-        
-        # Calculate phy gain
-        return expected_mcs + 8 * (spatial_streams-1) - int(mcs_index)
+        bandwidth = int(bandwidth)
+        bandwidth_mhz = RateTables.BANDWIDTHS[bandwidth] if 0 <= bandwidth < len(RateTables.BANDWIDTHS) else None
+        return self.get_stream_phy_gap(rssi, bandwidth_mhz, int(mcs_index) - 8 * (spatial_streams - 1))
+
+    def get_stream_phy_gap(self, rssi, bandwidth_mhz, mcs, phy=None):
+        """
+        Calculate the PHY gain based on RSSI and bandwidth, with the precomputed sensitivity tables of RateTables.
+        :param rssi: Received Signal Strength Indicator (RSSI).
+        :param bandwidth_mhz: Bandwidth in MHz.
+        :param mcs: MCS per spatial stream (802.11n, 802.11ac or 802.11ax).
+        :param phy: PHY type, selects the highest MCS (7 for 802.11n, 9 for 802.11ac).
+        :return: PHY gain.
+        """
+        return RateTables.phy_gap(int(rssi) if rssi is not None else None, bandwidth_mhz, mcs,
+                                  int(phy) if phy is not None else None)
 
     def get_ssid(self, packet):
         """
@@ -138,9 +438,9 @@ class PcapReader:
         :param packet: pyshark packet object.
         """
         # Get mgt layer if it exists
-        wlan_mgt_layer = packet.get_multiple_layers("wlan.mgt")[0] if packet.get_multiple_layers("wlan.mgt") else None
-        if wlan_mgt_layer:
-            ssid = wlan_mgt_layer.get_field("ssid")
+        wlan_mgt_layers = packet.get_multiple_layers("wlan.mgt")
+        if wlan_mgt_layers:
+            ssid = wlan_mgt_layers[0].get_field("ssid")
             if ssid:
                 return ssid
         # If something goes wrong, return None (no ssid)
@@ -152,4 +452,172 @@ class PcapReader:
         """
         if self.capture:
             self.capture.close()
-            self.capture = None
\ No newline at end of file
+            self.capture = None
+
+
+class NativeCapture:
+    """
+    Capture object of the native backend, iterates a pcap file as PcapngDecoder.NativePacket objects
+    (PcapngDecoder.FrameView objects when memory mapped).
+    """
+    def __init__(self, file_path, use_mmap=False, frame_range=None, frame_filter=None):
+        """
+        :param file_path: Path to the pcap file or CaptureStream.CaptureStream of a live capture.
+        :param frame_filter: FrameFilter.FrameFilter of the frames to yield (None for every frame).
+        """
+        self.decoder = PcapngDecoder.PcapngDecoder(file_path)
+        self.use_mmap = use_mmap
+        self.frame_range = frame_range
+        self.frame_filter = frame_filter
+        self.frames = None
+
+    def __iter__(self):
+        if self.use_mmap:
+            frames = self.decoder.read_frame_views()
+        else:
+            frames = self.decoder.read_frames()
+        if self.frame_range is not None:
+            frames = itertools.islice(frames, *self.frame_range)
+        frame_filter = self.frame_filter
+        if self.use_mmap:
+            for view in frames:
+                if frame_filter is None or (frame_filter.match_frame(view.linktype, view.buffer, view.offset, view.length)
+                                            and frame_filter.match(view.values)):
+                    yield view
+            return
+        for linktype, timestamp, data, length in frames:
+            if frame_filter is not None and not frame_filter.match_frame(linktype, data):
+                continue # Rejected on the raw header, never decoded
+            packet = PcapngDecoder.NativePacket(linktype, timestamp, data, length)
+            if frame_filter is None or frame_filter.match(packet.values):
+                yield packet
+
+    def next(self):
+        if self.frames is None:
+            self.frames = iter(self)
+        return next(self.frames)
+
+    def close(self):
+        if self.frames is not None:
+            self.frames.close()
+            self.frames = None
+        self.decoder.close()
+
+
+class TsharkCapture:
+    """
+    Capture object of the tshark backend. Runs tshark -T fields so only the requested fields are
+    dissected and printed, and the display filter is applied by tshark before any output.
+    Iterates the frames as packets exposing the wlan, wlan_radio and wlan.mgt layers like pyshark.
+    """
+    def __init__(self, file_path, display_filter=None, columns=None):
+        """
+        :param file_path: Path to the pcap file.
+        :param display_filter: Wireshark display filter (tshark -Y, None for every frame).
+        :param columns: Names of the FrameBatch columns to extract (None for every column and the SSID).
+        """
+        self.file_path = file_path
+        self.display_filter = display_filter
+        self.columns = [name for name in (columns or TSHARK_FIELDS) if name in TSHARK_FIELDS]
+        sources = [source for column in columns or () for source in TSHARK_SOURCES.get(column, ())]
+        for name in sources + ['timestamp', 'length']:
+            if name not in self.columns:
+                self.columns.append(name)
+        self.fields = [TSHARK_FIELDS[name] for name in self.columns]
+        if columns is None:
+            self.fields.append('wlan.ssid')
+        self.process = None
+        self.frames = None
+
+    def _rows(self):
+        """
+        Generator of the field values of every frame, None for absent fields.
+        """
+        command = ['tshark', '-r', self.file_path, '-n', '-T', 'fields', '-E', 'separator=/t', '-E', 'occurrence=f']
+        if self.display_filter:
+            command += ['-Y', self.display_filter]
+        for field in self.fields:
+            command += ['-e', field]
+        try:
+            self.process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        except FileNotFoundError:
+            raise ValueError("Error reading pcap file: tshark not found")
+        for line in self.process.stdout:
+            yield [value or None for value in line.rstrip('\n').split('\t')]
+        if self.process.wait() != 0:
+            raise ValueError(f"Error reading pcap file: {self.process.stderr.read().strip()}")
+
+    def read_values(self):
+        """
+        Generator of the typed values of the frames, as FrameBatch.values_from_info returns them.
+        """
+        for row in self._rows():
+            info = dict.fromkeys(TSHARK_FIELDS)
+            info.update(zip(self.columns, row))
+            if info['fc_retry'] is not None:
+                info['fc_retry'] = BOOLEANS.get(info['fc_retry'], info['fc_retry'])
+            for name in ('short_gi', 'vht_short_gi'):
+                if info[name] is not None:
+                    info[name] = BOOLEANS.get(info[name], info[name])
+            yield FrameBatch.values_from_info(info, info['timestamp'], info['length'])
+
+    def __iter__(self):
+        names = self.columns + (['ssid'] if len(self.fields) > len(self.columns) else [])
+        for row in self._rows():
+            info = dict.fromkeys(names)
+            info.update(zip(names, row))
+            yield TsharkPacket(info)
+
+    def next(self):
+        if self.frames is None:
+            self.frames = iter(self)
+        return next(self.frames)
+
+    def close(self):
+        if self.frames is not None:
+            self.frames.close()
+            self.frames = None
+        if self.process is not None:
+            if self.process.poll() is None:
+                self.process.kill()
+            self.process.wait()
+            self.process = None
+
+
+class TsharkPacket:
+    """
+    Frame extracted by TsharkCapture, exposes the wlan, wlan_radio and wlan.mgt layers
+    with the same field names and string values as pyshark packets.
+    """
+    def __init__(self, info):
+        self.sniff_timestamp = info['timestamp']
+        self.length = info['length']
+        get = info.get
+        self.layers = {
+            'wlan': PcapngDecoder.NativeLayer({
+                'bssid': get('bssid'), 'ta': get('ta'), 'ra': get('ra'),
+                'fc_type_subtype': get('type_subtype'),
+                'fc_retry': BOOLEANS.get(get('fc_retry'), get('fc_retry')),
+            }),
+            'wlan_radio': PcapngDecoder.NativeLayer({
+                'phy': get('phy'), 'data_rate': get('data_rate'), 'channel': get('channel'),
+                'frequency': get('frequency'), 'signal_dbm': get('signal_dbm'),
+                '11n_bandwidth': get('bandwidth'),
+                '11n_short_gi': BOOLEANS.get(get('short_gi'), get('short_gi')),
+                '11n_mcs_index': get('mcs_index'), 'duration': get('duration'), 'preamble': get('preamble'),
+                '11ac_bandwidth': get('vht_bandwidth'),
+                '11ac_short_gi': BOOLEANS.get(get('vht_short_gi'), get('vht_short_gi')),
+                '11ac_mcs': get('vht_mcs'), '11ac_nss': get('vht_nss'),
+            }),
+        }
+        if get('ssid'):
+            self.layers['wlan.mgt'] = PcapngDecoder.NativeLayer({'ssid': info['ssid']})
+
+    def get_multiple_layers(self, layer_name):
+        """
+        Get the layers with the given name.
+        :param layer_name: Name of the layer (wlan, wlan_radio or wlan.mgt).
+        :return: List of layers.
+        """
+        layer = self.layers.get(layer_name)
+        return [layer] if layer else []
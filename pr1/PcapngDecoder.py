@@ -0,0 +1,877 @@
+import mmap, os, struct
+import RateTables
+
+"""
+Link types and block types
+"""
+LINKTYPE_IEEE802_11 = 105 # Raw 802.11 frames
+LINKTYPE_IEEE802_11_RADIOTAP = 127 # 802.11 frames with a radiotap header
+
+PCAPNG_SHB = 0x0A0D0D0A # Section Header Block
+PCAPNG_IDB = 0x00000001 # Interface Description Block
+PCAPNG_OPB = 0x00000002 # Obsolete Packet Block
+PCAPNG_SPB = 0x00000003 # Simple Packet Block
+PCAPNG_EPB = 0x00000006 # Enhanced Packet Block
+PCAPNG_BYTE_ORDER_MAGIC = 0x1A2B3C4D
+
+# Pages of a memory mapped file already iterated are released every RELEASE_BYTES
+RELEASE_BYTES = 64 * 1024 * 1024
+
+# Classic pcap magic numbers (as read little endian) and their timestamp resolution
+PCAP_MAGICS = {
+    0xA1B2C3D4: ('<', 1e-6), 0xD4C3B2A1: ('>', 1e-6),
+    0xA1B23C4D: ('<', 1e-9), 0x4D3CB2A1: ('>', 1e-9),
+}
+
+"""
+Radiotap
+"""
+# Alignment and size of every radiotap field in the default namespace (index: (align, size))
+RADIOTAP_FIELDS = {
+    0: (8, 8),   # TSFT
+    1: (1, 1),   # Flags
+    2: (1, 1),   # Rate
+    3: (2, 4),   # Channel
+    4: (1, 2),   # FHSS
+    5: (1, 1),   # dBm Antenna Signal
+    6: (1, 1),   # dBm Antenna Noise
+    7: (2, 2),   # Lock Quality
+    8: (2, 2),   # TX Attenuation
+    9: (2, 2),   # dB TX Attenuation
+    10: (1, 1),  # dBm TX Power
+    11: (1, 1),  # Antenna
+    12: (1, 1),  # dB Antenna Signal
+    13: (1, 1),  # dB Antenna Noise
+    14: (2, 2),  # RX Flags
+    15: (2, 2),  # TX Flags
+    16: (1, 1),  # RTS Retries
+    17: (1, 1),  # Data Retries
+    18: (4, 8),  # XChannel
+    19: (1, 3),  # MCS
+    20: (4, 8),  # A-MPDU Status
+    21: (2, 12), # VHT
+    22: (8, 12), # Timestamp
+    23: (2, 12), # HE
+    24: (2, 12), # HE-MU
+    25: (2, 6),  # HE-MU-other-user
+    26: (1, 1),  # 0-length-PSDU
+    27: (2, 4),  # L-SIG
+}
+RADIOTAP_NS_NEXT = 29 # Next bitmap is in the radiotap namespace
+RADIOTAP_VENDOR_NS_NEXT = 30 # Next bitmap is in a vendor namespace
+RADIOTAP_EXT = 31 # Another bitmap follows
+
+RADIOTAP_FLAGS_SHORTPRE = 0x02 # Short preamble
+RADIOTAP_FLAGS_FCS = 0x10 # Frame includes FCS
+RADIOTAP_MCS_HAVE_BW = 0x01
+RADIOTAP_MCS_HAVE_MCS = 0x02
+RADIOTAP_MCS_HAVE_GI = 0x04
+RADIOTAP_VHT_HAVE_GI = 0x0004
+RADIOTAP_VHT_HAVE_BW = 0x0040
+RADIOTAP_HE_STBC_KNOWN = 0x0200 # data1
+RADIOTAP_HE_MCS_KNOWN = 0x0020
+RADIOTAP_HE_BW_KNOWN = 0x4000
+RADIOTAP_HE_GI_KNOWN = 0x0002 # data2
+
+# Channel flags
+CHAN_TURBO = 0x0010
+CHAN_CCK = 0x0020
+CHAN_OFDM = 0x0040
+CHAN_2GHZ = 0x0080
+CHAN_5GHZ = 0x0100
+CHAN_DYN = 0x0400
+CHAN_GFSK = 0x0800
+CHAN_ALL = CHAN_TURBO | CHAN_CCK | CHAN_OFDM | CHAN_2GHZ | CHAN_5GHZ | CHAN_DYN | CHAN_GFSK
+
+# PHY types as reported by wireshark (wlan_radio.phy)
+PHY_UNKNOWN = 0
+PHY_FHSS = 1
+PHY_11B = 4
+PHY_11A = 5
+PHY_11G = 6
+PHY_11N = 7
+PHY_11AC = 8
+PHY_11AX = 11
+
+# Channel flags combinations to PHY type
+CHANNEL_PHY = {
+    CHAN_2GHZ | CHAN_GFSK: PHY_FHSS,
+    CHAN_5GHZ | CHAN_OFDM: PHY_11A,
+    CHAN_5GHZ | CHAN_OFDM | CHAN_TURBO: PHY_11A,
+    CHAN_2GHZ | CHAN_CCK: PHY_11B,
+    CHAN_2GHZ | CHAN_OFDM: PHY_11G,
+    CHAN_2GHZ | CHAN_DYN: PHY_11G,
+    CHAN_2GHZ | CHAN_OFDM | CHAN_TURBO: PHY_11G,
+}
+
+"""
+802.11
+"""
+FC_TO_DS = 0x01
+FC_FROM_DS = 0x02
+FC_RETRY = 0x08
+TYPE_MGT = 0
+TYPE_CTRL = 1
+TYPE_DATA = 2
+
+# Offset of the tagged parameters for management subtypes that carry an SSID
+MGT_TAGGED_OFFSET = { 0: 4, 1: 6, 2: 10, 3: 6, 4: 0, 5: 12, 8: 12 }
+# Management subtypes that are dissected with fixed/tagged parameters (wlan.mgt layer)
+MGT_WITH_BODY = { 0, 1, 2, 3, 4, 5, 8, 9, 10, 11, 12, 13, 14 }
+
+
+def mhz_to_channel(frequency):
+    """
+    Convert a frequency to an 802.11 channel number.
+    :param frequency: Frequency in MHz.
+    :return: Channel number or None if the frequency is not a known channel.
+    """
+    if 2412 <= frequency <= 2472:
+        return (frequency - 2407) // 5
+    if frequency == 2484:
+        return 14
+    if 5000 <= frequency <= 5895:
+        return (frequency - 5000) // 5
+    if 4910 <= frequency <= 4980:
+        return (frequency - 4910) // 5 + 182
+    if 5955 <= frequency <= 7115:
+        return (frequency - 5955) // 5 + 1
+    return None
+
+def format_mac(data, offset):
+    """
+    Format 6 bytes as a colon separated MAC address.
+    """
+    return ':'.join('%02x' % b for b in data[offset:offset + 6])
+
+def decode_radiotap(data, offset=0, length=None):
+    """
+    Decode the radiotap header of a frame.
+    :param data: Buffer holding the frame (bytes, bytearray, memoryview or mmap).
+    :param offset: Offset of the radiotap header in the buffer.
+    :param length: Captured length of the frame (defaults to the rest of the buffer).
+    :return: Dictionary of raw radiotap values, 'length' holds the radiotap header length.
+    """
+    if length is None:
+        length = len(data) - offset
+    if length < 8:
+        raise ValueError("Truncated radiotap header.")
+    version, rt_len, present = struct.unpack_from('<BxHI', data, offset)
+    if version != 0 or rt_len > length:
+        raise ValueError("Invalid radiotap header.")
+    fields = {'length': rt_len}
+
+    # Collect presence bitmaps together with their namespace
+    bitmaps = []
+    namespace = 'radiotap'
+    base = 0
+    pos = 8
+    while True:
+        bitmaps.append((present, namespace, base))
+        if not present & (1 << RADIOTAP_EXT):
+            break
+        if pos + 4 > rt_len:
+            return fields
+        if present & (1 << RADIOTAP_NS_NEXT):
+            namespace, base = 'radiotap', 0
+        elif present & (1 << RADIOTAP_VENDOR_NS_NEXT):
+            namespace, base = 'vendor', 0
+        else:
+            base += 32
+        present, = struct.unpack_from('<I', data, offset + pos)
+        pos += 4
+
+    # Walk the fields of every radiotap namespace bitmap
+    for present, namespace, base in bitmaps:
+        if namespace != 'radiotap':
+            continue # Vendor data is skipped with its namespace header
+        for bit in range(29):
+            if not present & (1 << bit):
+                continue
+            index = base + bit
+            if index not in RADIOTAP_FIELDS:
+                return fields # Unknown field, its size is unknown so stop here
+            align, size = RADIOTAP_FIELDS[index]
+            pos = (pos + align - 1) & ~(align - 1)
+            if pos + size > rt_len:
+                return fields
+            at = offset + pos
+            if index == 0:
+                fields.setdefault('tsft', struct.unpack_from('<Q', data, at)[0])
+            elif index == 1:
+                fields.setdefault('flags', data[at])
+            elif index == 2:
+                fields.setdefault('rate', data[at])
+            elif index == 3:
+                frequency, channel_flags = struct.unpack_from('<HH', data, at)
+                fields.setdefault('frequency', frequency)
+                fields.setdefault('channel_flags', channel_flags)
+            elif index == 5:
+                fields.setdefault('signal_dbm', struct.unpack_from('<b', data, at)[0])
+            elif index == 6:
+                fields.setdefault('noise_dbm', struct.unpack_from('<b', data, at)[0])
+            elif index == 19:
+                fields.setdefault('mcs', (data[at], data[at + 1], data[at + 2]))
+            elif index == 21:
+                fields.setdefault('vht', struct.unpack_from('<HBB4BBBH', data, at))
+            elif index == 23:
+                fields.setdefault('he', struct.unpack_from('<6H', data, at))
+            pos += size
+        if present & (1 << RADIOTAP_VENDOR_NS_NEXT):
+            # Vendor namespace header: OUI, sub namespace and length of the vendor data
+            pos = (pos + 1) & ~1
+            if pos + 6 > rt_len:
+                return fields
+            skip_length, = struct.unpack_from('<H', data, offset + pos + 4)
+            pos += 6 + skip_length
+    return fields
+
+def radio_info(radiotap):
+    """
+    Derive the wlan_radio values (as dissected by wireshark) from decoded radiotap values.
+    :param radiotap: Dictionary returned by decode_radiotap.
+    :return: Dictionary with phy, data_rate, channel, frequency, signal_dbm, 11n, 11ac and 11ax values,
+             and the MCS per stream, spatial streams and channel width (MHz) of any of them.
+    """
+    info = {
+        'phy': None, 'data_rate': None, 'channel': None, 'frequency': None, 'signal_dbm': None,
+        'bandwidth': None, 'short_gi': None, 'mcs_index': None,
+        'vht_bandwidth': None, 'vht_short_gi': None, 'vht_mcs': None, 'vht_nss': None,
+        'he_bandwidth': None, 'he_gi': None, 'he_mcs': None, 'he_nss': None,
+        'mcs': None, 'nss': None, 'bandwidth_mhz': None,
+        'short_preamble': bool(radiotap.get('flags', 0) & RADIOTAP_FLAGS_SHORTPRE),
+    }
+    if 'rate' in radiotap:
+        info['data_rate'] = radiotap['rate'] * 0.5
+    if 'frequency' in radiotap:
+        info['frequency'] = radiotap['frequency']
+        info['channel'] = mhz_to_channel(radiotap['frequency'])
+        info['phy'] = CHANNEL_PHY.get(radiotap['channel_flags'] & CHAN_ALL, PHY_UNKNOWN)
+    info['signal_dbm'] = radiotap.get('signal_dbm')
+
+    if 'mcs' in radiotap:
+        known, flags, mcs_index = radiotap['mcs']
+        info['phy'] = PHY_11N
+        if known & RADIOTAP_MCS_HAVE_BW:
+            info['bandwidth'] = flags & 0x03
+        if known & RADIOTAP_MCS_HAVE_GI:
+            info['short_gi'] = (flags >> 2) & 0x01
+        if known & RADIOTAP_MCS_HAVE_MCS:
+            info['mcs_index'] = mcs_index
+        if None not in (info['bandwidth'], info['short_gi'], info['mcs_index']):
+            rate = RateTables.ht_rate(mcs_index, info['bandwidth'], info['short_gi'])
+            if rate:
+                info['data_rate'] = rate
+        info['mcs'], info['nss'], info['bandwidth_mhz'] = RateTables.stream_params(info['mcs_index'], info['bandwidth'])
+    elif 'vht' in radiotap:
+        known, flags, bandwidth, mcs_nss0, _, _, _, _, _, _ = radiotap['vht']
+        info['phy'] = PHY_11AC
+        if known & RADIOTAP_VHT_HAVE_BW:
+            info['vht_bandwidth'] = RateTables.VHT_BANDWIDTH_MHZ.get(bandwidth & 0x1f)
+        if known & RADIOTAP_VHT_HAVE_GI:
+            info['vht_short_gi'] = (flags >> 2) & 0x01
+        if mcs_nss0 & 0x0f:
+            info['vht_mcs'] = mcs_nss0 >> 4
+            info['vht_nss'] = mcs_nss0 & 0x0f
+            if info['vht_bandwidth'] is not None and info['vht_short_gi'] is not None:
+                rate = RateTables.vht_rate(info['vht_mcs'], info['vht_nss'], info['vht_bandwidth'], info['vht_short_gi'])
+                if rate:
+                    info['data_rate'] = rate
+        info['mcs'], info['nss'], info['bandwidth_mhz'] = info['vht_mcs'], info['vht_nss'], info['vht_bandwidth']
+    elif 'he' in radiotap:
+        data1, data2, data3, _, data5, data6 = radiotap['he']
+        info['phy'] = PHY_11AX
+        if data1 & RADIOTAP_HE_MCS_KNOWN:
+            info['he_mcs'] = (data3 >> 8) & 0x0f
+        if data1 & RADIOTAP_HE_BW_KNOWN:
+            info['he_bandwidth'] = RateTables.HE_BANDWIDTH_MHZ.get(data5 & 0x0f)
+        if data2 & RADIOTAP_HE_GI_KNOWN:
+            info['he_gi'] = (data5 >> 4) & 0x03
+        if data6 & 0x0f:
+            # Space-time streams, two per spatial stream with STBC
+            stbc = data1 & RADIOTAP_HE_STBC_KNOWN and data3 & 0x8000
+            info['he_nss'] = (data6 & 0x0f) // 2 if stbc else data6 & 0x0f
+        if None not in (info['he_mcs'], info['he_nss'], info['he_bandwidth'], info['he_gi']):
+            rate = RateTables.he_rate(info['he_mcs'], info['he_nss'], info['he_bandwidth'], info['he_gi'])
+            if rate:
+                info['data_rate'] = rate
+        info['mcs'], info['nss'], info['bandwidth_mhz'] = info['he_mcs'], info['he_nss'], info['he_bandwidth']
+    return info
+
+def airtime(phy, data_rate, frame_length, short_preamble=False, short_gi=False, spatial_streams=1):
+    """
+    Estimate the airtime of a frame, in the way wireshark's wlan_radio dissector does.
+    :param phy: PHY type.
+    :param data_rate: Data rate in Mbps.
+    :param frame_length: Length of the 802.11 frame including FCS in bytes.
+    :return: Tuple (duration, preamble) in microseconds, (None, None) if unknown.
+    """
+    if not data_rate:
+        return None, None
+    bits = frame_length * 8
+    if phy == PHY_11B:
+        preamble = 96 if short_preamble else 192
+        return preamble + -(-bits // data_rate), preamble
+    if phy in (PHY_11A, PHY_11G):
+        preamble = 20 # Legacy training fields and SIGNAL
+        symbols = -(-(16 + bits + 6) // (4 * data_rate))
+        return preamble + 4 * symbols + (6 if phy == PHY_11G else 0), preamble
+    if phy in (PHY_11N, PHY_11AC):
+        preamble = 32 + 4 * max(spatial_streams, 1) # Legacy fields, HT-SIG, HT-STF and one HT-LTF per stream
+        symbol_time = 3.6 if short_gi else 4.0
+        symbols = -(-(16 + bits + 6) // (data_rate * symbol_time))
+        return preamble + -(-(symbols * symbol_time) // 1), preamble
+    return None, None
+
+def address_offsets(fc0, fc1, length):
+    """
+    Offsets of the addresses of an 802.11 MAC header, following the frame type and DS bits.
+    :param fc0: First byte of the frame control field.
+    :param fc1: Second byte of the frame control field.
+    :param length: Length of the 802.11 frame.
+    :return: Tuple (ta, ra, bssid) offsets from the start of the header, None for absent addresses.
+    """
+    frame_type = (fc0 >> 2) & 0x03
+    subtype = (fc0 >> 4) & 0x0f
+    ta, ra, bssid = None, 4, None
+    has_addr2 = length >= 16
+    has_addr3 = length >= 22
+    if frame_type == TYPE_MGT:
+        if has_addr2:
+            ta = 10
+        if has_addr3:
+            bssid = 16
+    elif frame_type == TYPE_CTRL:
+        if subtype == 10: # PS-Poll, receiver address is the BSSID
+            bssid = ra
+            if has_addr2:
+                ta = 10
+        elif subtype in (14, 15): # CF-End, second address is the BSSID
+            if has_addr2:
+                bssid = 10
+        elif subtype not in (7, 12, 13) and has_addr2: # All but wrapper, CTS and ACK carry a TA
+            ta = 10
+    elif frame_type == TYPE_DATA:
+        if has_addr2:
+            ta = 10
+        ds = fc1 & (FC_TO_DS | FC_FROM_DS)
+        if ds == 0 and has_addr3:
+            bssid = 16
+        elif ds == FC_TO_DS:
+            bssid = ra
+        elif ds == FC_FROM_DS:
+            bssid = ta
+    return ta, ra, bssid
+
+def decode_80211(data, offset, length, ssid=True):
+    """
+    Decode the 802.11 MAC header (and SSID of management frames) of a frame.
+    :param data: Buffer holding the frame.
+    :param offset: Offset of the 802.11 header in the buffer.
+    :param length: Length of the 802.11 frame without FCS.
+    :param ssid: Search the SSID in the body of management frames.
+    :return: Dictionary with type_subtype, fc_retry, bssid, ta, ra and ssid values.
+    """
+    if length < 10:
+        raise ValueError("Truncated 802.11 header.")
+    fc0, fc1 = data[offset], data[offset + 1]
+    frame_type = (fc0 >> 2) & 0x03
+    subtype = (fc0 >> 4) & 0x0f
+    ta, ra, bssid = address_offsets(fc0, fc1, length)
+    info = {
+        'type_subtype': (frame_type << 4) | subtype,
+        'fc_retry': 1 if fc1 & FC_RETRY else 0,
+        'bssid': format_mac(data, offset + bssid) if bssid is not None else None,
+        'ta': format_mac(data, offset + ta) if ta is not None else None,
+        'ra': format_mac(data, offset + ra), 'ssid': None,
+        'has_mgt': False,
+    }
+    if frame_type == TYPE_MGT and subtype in MGT_WITH_BODY and length > 24:
+        info['has_mgt'] = True
+        if ssid and subtype in MGT_TAGGED_OFFSET:
+            info['ssid'] = _get_ssid(data, offset + 24 + MGT_TAGGED_OFFSET[subtype], offset + length)
+    return info
+
+def _get_ssid(data, start, end):
+    """
+    Find the SSID element in the tagged parameters of a management frame.
+    """
+    pos = start
+    while pos + 2 <= end:
+        tag, tag_len = data[pos], data[pos + 1]
+        if pos + 2 + tag_len > end:
+            return None
+        if tag == 0:
+            ssid = bytes(data[pos + 2:pos + 2 + tag_len]).decode('utf-8', errors='backslashreplace')
+            return ssid if ssid else None
+        pos += 2 + tag_len
+    return None
+
+def decode_radio(linktype, data, offset=0, length=None):
+    """
+    Decode the radio part (radiotap header) of a captured frame.
+    :param linktype: Link type of the interface that captured the frame.
+    :param data: Buffer holding the frame.
+    :param offset: Offset of the frame in the buffer.
+    :param length: Captured length of the frame.
+    :return: Tuple (radio values, 802.11 header offset, 802.11 frame length without FCS).
+    """
+    if length is None:
+        length = len(data) - offset
+    if linktype == LINKTYPE_IEEE802_11_RADIOTAP:
+        radiotap = decode_radiotap(data, offset, length)
+        header = radiotap['length']
+    elif linktype == LINKTYPE_IEEE802_11:
+        radiotap = {}
+        header = 0
+    else:
+        raise ValueError("Not an 802.11 packet.")
+    fcs = 4 if radiotap.get('flags', 0) & RADIOTAP_FLAGS_FCS else 0
+    return radio_info(radiotap), offset + header, length - header - fcs
+
+def frame_airtime(info, frame_length):
+    """
+    Airtime of a decoded frame.
+    :param info: Radio values of the frame.
+    :param frame_length: Length of the 802.11 frame without FCS.
+    :return: Tuple (duration, preamble) in microseconds.
+    """
+    # Airtime is computed on the full frame, FCS included
+    return airtime(info['phy'], info['data_rate'], frame_length + 4, info['short_preamble'],
+                   info['short_gi'] or info['vht_short_gi'], info['nss'] or 1)
+
+def decode_frame(linktype, data, offset=0, length=None, columns=None, radio=None):
+    """
+    Decode a captured frame into typed 802.11 values.
+    :param linktype: Link type of the interface that captured the frame.
+    :param data: Buffer holding the frame.
+    :param offset: Offset of the frame in the buffer.
+    :param length: Captured length of the frame.
+    :param columns: Names of the FrameBatch columns needed (None for every value): the SSID is only searched
+                    without columns, and the airtime only computed when duration or preamble is needed.
+    :param radio: Result of decode_radio for the frame, if already decoded.
+    :return: Dictionary with the radio (wlan_radio) and MAC (wlan) values, None for missing values.
+    """
+    info, mac_offset, mac_length = radio or decode_radio(linktype, data, offset, length)
+    info.update(decode_80211(data, mac_offset, mac_length, ssid=columns is None))
+    if columns is None or 'duration' in columns or 'preamble' in columns:
+        info['duration'], info['preamble'] = frame_airtime(info, mac_length)
+    else:
+        info['duration'], info['preamble'] = None, None
+    return info
+
+class PcapngDecoder:
+    """
+    PcapngDecoder.py
+    Pure python reader of pcapng and classic pcap files.
+    """
+    def __init__(self, file_path):
+        """
+        Initialize the decoder with the path to the capture file.
+        :param file_path: Path to the pcapng or pcap file, or a CaptureStream.CaptureStream of a live capture
+                          (read_frames only, the stream is read sequentially and never seeked).
+        """
+        self.file_path = file_path
+        self.file = None # Open capture file
+        self.mapping = None # Memory map of the capture file
+        self.frames = None # Generator over the frames of the file
+
+    def read_frames(self):
+        """
+        Generator to read the frames of the capture file.
+        Yields tuples (linktype, timestamp, data, original length).
+        """
+        if hasattr(self.file_path, 'read'):
+            self.file = self.file_path
+        else:
+            try:
+                self.file = open(self.file_path, 'rb')
+            except FileNotFoundError:
+                raise ValueError(f"File not found: {self.file_path}")
+        head = self.file.read(4)
+        if len(head) < 4:
+            raise ValueError(f"Error reading pcap file: {self.file_path} is empty")
+        magic, = struct.unpack('<I', head)
+        if magic == PCAPNG_SHB:
+            yield from self._read_pcapng(head)
+        elif magic in PCAP_MAGICS:
+            yield from self._read_pcap(head)
+        else:
+            raise ValueError(f"Error reading pcap file: unknown format of {self.file_path}")
+
+    def _read_pcap(self, magic):
+        """
+        Read the records of a classic pcap file.
+        :param magic: First 4 bytes of the file, already read.
+        """
+        endian, resolution = PCAP_MAGICS[struct.unpack('<I', magic)[0]]
+        header = self.file.read(20)
+        if len(header) < 20:
+            raise ValueError("Error reading pcap file: truncated header")
+        linktype = struct.unpack(endian + 'HHiIII', header)[5] & 0x0FFFFFFF
+        record = struct.Struct(endian + 'IIII')
+        while True:
+            header = self.file.read(16)
+            if len(header) < 16:
+                return
+            ts_sec, ts_frac, caplen, orig_len = record.unpack(header)
+            data = self.file.read(caplen)
+            if len(data) < caplen:
+                return # Truncated last record
+            yield linktype, ts_sec + ts_frac * resolution, data, orig_len
+
+    def _read_pcapng(self, head=b''):
+        """
+        Read the blocks of a pcapng file.
+        :param head: First bytes of the file, already read.
+        """
+        endian = '<'
+        interfaces = [] # (linktype, timestamp resolution, timestamp offset) per interface
+        while True:
+            header = head + self.file.read(8 - len(head))
+            head = b''
+            if len(header) < 8:
+                return
+            block_type, = struct.unpack('<I', header[:4])
+            if block_type == PCAPNG_SHB:
+                # New section, byte order and interfaces are reset
+                magic = self.file.read(4)
+                endian = '<' if struct.unpack('<I', magic)[0] == PCAPNG_BYTE_ORDER_MAGIC else '>'
+                block_len, = struct.unpack(endian + 'I', header[4:])
+                self.file.read(block_len - 12) # Skipped by reading, streams cannot seek
+                interfaces = []
+                continue
+            block_type, block_len = struct.unpack(endian + 'II', header)
+            if block_len < 12:
+                raise ValueError("Error reading pcap file: invalid block length")
+            body = self.file.read(block_len - 8)
+            if len(body) < block_len - 8:
+                return # Truncated last block
+            if block_type == PCAPNG_IDB:
+                interfaces.append(self._parse_idb(endian, body))
+            elif block_type == PCAPNG_EPB:
+                iface, ts_high, ts_low, caplen, orig_len = struct.unpack_from(endian + 'IIIII', body)
+                linktype, resolution, ts_offset = self._interface(interfaces, iface)
+                yield linktype, ts_offset + ((ts_high << 32) | ts_low) * resolution, body[20:20 + caplen], orig_len
+            elif block_type == PCAPNG_OPB:
+                iface, _, ts_high, ts_low, caplen, orig_len = struct.unpack_from(endian + 'HHIIII', body)
+                linktype, resolution, ts_offset = self._interface(interfaces, iface)
+                yield linktype, ts_offset + ((ts_high << 32) | ts_low) * resolution, body[20:20 + caplen], orig_len
+            elif block_type == PCAPNG_SPB:
+                orig_len, = struct.unpack_from(endian + 'I', body)
+                linktype = self._interface(interfaces, 0)[0]
+                yield linktype, None, body[4:4 + min(orig_len, block_len - 16)], orig_len
+
+    @staticmethod
+    def _interface(interfaces, iface):
+        """
+        Description of the interface a packet block was captured on.
+        :return: Tuple (linktype, timestamp resolution, timestamp offset).
+        """
+        if iface >= len(interfaces):
+            raise ValueError(f"Error reading pcap file: packet block references unknown interface {iface}")
+        return interfaces[iface]
+
+    @staticmethod
+    def _parse_idb(endian, body):
+        """
+        Parse an Interface Description Block.
+        :return: Tuple (linktype, timestamp resolution, timestamp offset).
+        """
+        linktype, = struct.unpack_from(endian + 'H', body)
+        resolution, ts_offset = 1e-6, 0
+        pos = 8
+        while pos + 4 <= len(body) - 4:
+            code, opt_len = struct.unpack_from(endian + 'HH', body, pos)
+            if code == 0: # End of options
+                break
+            if code == 9 and opt_len == 1: # if_tsresol
+                value = body[pos + 4]
+                resolution = 2.0 ** -(value & 0x7f) if value & 0x80 else 10.0 ** -value
+            elif code == 14 and opt_len == 8: # if_tsoffset
+                ts_offset, = struct.unpack_from(endian + 'q', body, pos + 4)
+            pos += 4 + ((opt_len + 3) & ~3)
+        return linktype, resolution, ts_offset
+
+    def read_frame_views(self):
+        """
+        Generator to read the frames of a memory mapped capture file.
+        Yields FrameView objects pointing into the mapping, frame bytes are never copied.
+        Pages already iterated are released so the resident memory stays constant on large files.
+        """
+        if hasattr(self.file_path, 'read'):
+            raise ValueError("Memory mapped reading requires a capture file, not a stream")
+        try:
+            self.file = open(self.file_path, 'rb')
+        except FileNotFoundError:
+            raise ValueError(f"File not found: {self.file_path}")
+        if os.fstat(self.file.fileno()).st_size < 4:
+            raise ValueError(f"Error reading pcap file: {self.file_path} is empty")
+        self.mapping = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        if hasattr(self.mapping, 'madvise'):
+            self.mapping.madvise(mmap.MADV_SEQUENTIAL)
+
+        magic, = struct.unpack_from('<I', self.mapping)
+        if magic == PCAPNG_SHB:
+            frames = self._walk_pcapng(self.mapping)
+        elif magic in PCAP_MAGICS:
+            frames = self._walk_pcap(self.mapping)
+        else:
+            raise ValueError(f"Error reading pcap file: unknown format of {self.file_path}")
+
+        released = 0
+        for linktype, timestamp, offset, caplen, orig_len in frames:
+            if offset - released >= RELEASE_BYTES and hasattr(self.mapping, 'madvise'):
+                # Drop the pages behind the current frame, they are read again from the file if needed
+                end = offset - offset % mmap.PAGESIZE
+                self.mapping.madvise(mmap.MADV_DONTNEED, released, end - released)
+                released = end
+            yield FrameView(self.mapping, offset, caplen, linktype, timestamp, orig_len)
+
+    def count_frames(self):
+        """
+        Count the frames of the capture file without decoding them.
+        :return: Number of frames.
+        """
+        try:
+            return sum(1 for _ in self.read_frame_views())
+        finally:
+            self.close()
+
+    @staticmethod
+    def _walk_pcap(buffer):
+        """
+        Walk the records of a classic pcap file held in a buffer.
+        Yields tuples (linktype, timestamp, offset, captured length, original length).
+        """
+        endian, resolution = PCAP_MAGICS[struct.unpack_from('<I', buffer)[0]]
+        if len(buffer) < 24:
+            raise ValueError("Error reading pcap file: truncated header")
+        linktype = struct.unpack_from(endian + 'I', buffer, 20)[0] & 0x0FFFFFFF
+        record = struct.Struct(endian + 'IIII')
+        pos, size = 24, len(buffer)
+        while pos + 16 <= size:
+            ts_sec, ts_frac, caplen, orig_len = record.unpack_from(buffer, pos)
+            if pos + 16 + caplen > size:
+                return # Truncated last record
+            yield linktype, ts_sec + ts_frac * resolution, pos + 16, caplen, orig_len
+            pos += 16 + caplen
+
+    @classmethod
+    def _walk_pcapng(cls, buffer):
+        """
+        Walk the blocks of a pcapng file held in a buffer.
+        Yields tuples (linktype, timestamp, offset, captured length, original length).
+        """
+        endian = '<'
+        interfaces = []
+        pos, size = 0, len(buffer)
+        while pos + 12 <= size:
+            block_type, = struct.unpack_from('<I', buffer, pos)
+            if block_type == PCAPNG_SHB:
+                magic, = struct.unpack_from('<I', buffer, pos + 8)
+                endian = '<' if magic == PCAPNG_BYTE_ORDER_MAGIC else '>'
+                interfaces = []
+            block_len, = struct.unpack_from(endian + 'I', buffer, pos + 4)
+            if block_len < 12:
+                raise ValueError("Error reading pcap file: invalid block length")
+            if pos + block_len > size:
+                return # Truncated last block
+            body = pos + 8
+            if block_type == PCAPNG_IDB:
+                interfaces.append(cls._parse_idb(endian, buffer[body:pos + block_len]))
+            elif block_type == PCAPNG_EPB:
+                iface, ts_high, ts_low, caplen, orig_len = struct.unpack_from(endian + 'IIIII', buffer, body)
+                linktype, resolution, ts_offset = cls._interface(interfaces, iface)
+                yield linktype, ts_offset + ((ts_high << 32) | ts_low) * resolution, body + 20, caplen, orig_len
+            elif block_type == PCAPNG_OPB:
+                iface, _, ts_high, ts_low, caplen, orig_len = struct.unpack_from(endian + 'HHIIII', buffer, body)
+                linktype, resolution, ts_offset = cls._interface(interfaces, iface)
+                yield linktype, ts_offset + ((ts_high << 32) | ts_low) * resolution, body + 20, caplen, orig_len
+            elif block_type == PCAPNG_SPB:
+                orig_len, = struct.unpack_from(endian + 'I', buffer, body)
+                yield cls._interface(interfaces, 0)[0], None, body + 4, min(orig_len, block_len - 16), orig_len
+            pos += block_len
+
+    def next(self):
+        """
+        Read the next frame of the capture file.
+        :return: Tuple (linktype, timestamp, data, original length) or None if end of file is reached.
+        """
+        if self.frames is None:
+            self.frames = self.read_frames()
+        return next(self.frames, None)
+
+    def close(self):
+        """
+        Close the capture file.
+        """
+        if self.frames is not None:
+            self.frames.close()
+            self.frames = None
+        if self.mapping is not None:
+            try:
+                self.mapping.close()
+            except BufferError:
+                pass # Frame data still exported by a memoryview, released with it
+            self.mapping = None
+        if self.file:
+            self.file.close()
+            self.file = None
+
+
+class NativeLayer:
+    """
+    Layer of a NativePacket, mirrors the get_field interface of pyshark layers.
+    """
+    def __init__(self, fields):
+        self.fields = fields
+
+    def get_field(self, name):
+        return self.fields.get(name)
+
+
+class NativePacket:
+    """
+    Frame decoded by PcapngDecoder, exposes the wlan, wlan_radio and wlan.mgt layers
+    with the same field names and string values as pyshark packets.
+    """
+    def __init__(self, linktype, timestamp, data, length):
+        self.linktype = linktype
+        self.sniff_timestamp = timestamp
+        self.data = data
+        self.length = length
+        self.values = decode_frame(linktype, data)
+        self.layers = self._build_layers(self.values)
+
+    @staticmethod
+    def _build_layers(values):
+        """
+        Format the decoded values like tshark shows them.
+        """
+        def show(value, fmt='%d'):
+            return None if value is None else fmt % value
+
+        layers = {
+            'wlan': NativeLayer({
+                'bssid': values['bssid'], 'ta': values['ta'], 'ra': values['ra'],
+                'fc_type_subtype': show(values['type_subtype'], '0x%04x'),
+                'fc_retry': show(values['fc_retry']),
+            }),
+            'wlan_radio': NativeLayer({
+                'phy': show(values['phy']),
+                'data_rate': show(values['data_rate'], '%g'),
+                'channel': show(values['channel']),
+                'frequency': show(values['frequency']),
+                'signal_dbm': show(values['signal_dbm']),
+                '11n_bandwidth': show(values['bandwidth']),
+                '11n_short_gi': show(values['short_gi']),
+                '11n_mcs_index': show(values['mcs_index']),
+                '11ac_bandwidth': show(RateTables.VHT_BANDWIDTH_CODE.get(values['vht_bandwidth'])),
+                '11ac_short_gi': show(values['vht_short_gi']),
+                '11ac_mcs': show(values['vht_mcs']),
+                '11ac_nss': show(values['vht_nss']),
+                'duration': show(values['duration']),
+                'preamble': show(values['preamble']),
+            }),
+        }
+        if values['has_mgt']:
+            layers['wlan.mgt'] = NativeLayer({'ssid': values['ssid']})
+        return layers
+
+    def get_multiple_layers(self, layer_name):
+        """
+        Get the layers with the given name.
+        :param layer_name: Name of the layer (wlan, wlan_radio or wlan.mgt).
+        :return: List of layers.
+        """
+        layer = self.layers.get(layer_name)
+        return [layer] if layer else []
+
+
+def _radio_field(name):
+    return property(lambda self: self.radio[name])
+
+def _mac_field(name):
+    return property(lambda self: self.mac[name])
+
+
+class FrameView:
+    """
+    Lightweight view of a frame inside a memory mapped capture file.
+    Only the offset and length of the frame are stored, the radiotap and 802.11 headers
+    are decoded on first access of one of their fields.
+    """
+    __slots__ = ('buffer', 'offset', 'length', 'linktype', 'sniff_timestamp', 'orig_len', '_radio', '_mac')
+
+    def __init__(self, buffer, offset, length, linktype, timestamp, orig_len):
+        self.buffer = buffer
+        self.offset = offset
+        self.length = length
+        self.linktype = linktype
+        self.sniff_timestamp = timestamp
+        self.orig_len = orig_len
+        self._radio = None # (radio values, 802.11 offset, 802.11 length) once decoded
+        self._mac = None # 802.11 values once decoded
+
+    @property
+    def data(self):
+        """
+        Frame bytes as a memoryview of the mapping (no copy).
+        """
+        return memoryview(self.buffer)[self.offset:self.offset + self.length]
+
+    @property
+    def radio(self):
+        if self._radio is None:
+            self._radio = decode_radio(self.linktype, self.buffer, self.offset, self.length)
+        return self._radio[0]
+
+    @property
+    def mac(self):
+        if self._mac is None:
+            self.radio # The 802.11 header starts after the radiotap header
+            self._mac = decode_80211(self.buffer, self._radio[1], self._radio[2])
+        return self._mac
+
+    phy = _radio_field('phy')
+    data_rate = _radio_field('data_rate')
+    channel = _radio_field('channel')
+    frequency = _radio_field('frequency')
+    signal_dbm = _radio_field('signal_dbm')
+    bandwidth = _radio_field('bandwidth')
+    short_gi = _radio_field('short_gi')
+    mcs_index = _radio_field('mcs_index')
+    mcs = _radio_field('mcs')
+    nss = _radio_field('nss')
+    bandwidth_mhz = _radio_field('bandwidth_mhz')
+    bssid = _mac_field('bssid')
+    ta = _mac_field('ta')
+    ra = _mac_field('ra')
+    type_subtype = _mac_field('type_subtype')
+    fc_retry = _mac_field('fc_retry')
+    ssid = _mac_field('ssid')
+
+    @property
+    def airtime(self):
+        """
+        Tuple (duration, preamble) of the frame in microseconds.
+        """
+        return frame_airtime(self.radio, self._radio[2])
+
+    @property
+    def values(self):
+        """
+        All decoded values of the frame, as returned by decode_frame.
+        """
+        values = dict(self.radio)
+        values.update(self.mac)
+        values['duration'], values['preamble'] = self.airtime
+        return values
+
+    def get_multiple_layers(self, layer_name):
+        """
+        Get the layers with the given name, like NativePacket (decodes the whole frame).
+        """
+        layer = NativePacket._build_layers(self.values).get(layer_name)
+        return [layer] if layer else []
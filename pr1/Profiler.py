@@ -0,0 +1,104 @@
+import json, os
+import time
+
+# Stages of the doctor pipelines, in report order (other stages are listed after them)
+STAGES = ('read', 'extraction', 'density', 'metrics', 'windows', 'stations', 'quantiles', 'redraw', 'report')
+
+
+class Profiler:
+    """
+    Profiler.py
+    Opt-in counters and cumulative timers of the doctor pipeline stages.
+    The pipelines take a Profiler or None and only time their stages when one is given,
+    so runs without profiling pay one test per stage.
+    Stages are timed by chaining clock readings: add(stage, start) returns the time it was called,
+    which is the start of the next stage.
+    """
+    def __init__(self, stats_path=None, stats_every=None):
+        """
+        :param stats_path: JSON file the statistics are written to, for collectors (None for none).
+        :param stats_every: Seconds between two writes of the JSON statistics (None to only write them on close).
+        """
+        self.calls = {} # Stage: number of times it ran
+        self.seconds = {} # Stage: cumulative seconds
+        self.counters = {} # Counter: value (e.g. dropped_frames)
+        self.stats_path = stats_path
+        self.stats_every = stats_every
+        self.started = time.perf_counter()
+        self.next_write = self.started + stats_every if stats_path and stats_every else float('inf')
+
+    clock = staticmethod(time.perf_counter)
+
+    def add(self, stage, start):
+        """
+        Add the time elapsed since start to a stage.
+        :param start: Clock reading (Profiler.clock) when the stage started.
+        :return: Current clock reading, the start of the next stage.
+        """
+        now = time.perf_counter()
+        self.calls[stage] = self.calls.get(stage, 0) + 1
+        self.seconds[stage] = self.seconds.get(stage, 0.0) + now - start
+        if now >= self.next_write:
+            self.write_stats()
+            self.next_write = now + self.stats_every
+        return now
+
+    def count(self, name, n=1):
+        """
+        Increment a counter.
+        """
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def stages(self):
+        """
+        Names of the timed stages, STAGES first.
+        """
+        return [stage for stage in STAGES if stage in self.calls] + sorted(set(self.calls) - set(STAGES))
+
+    def stats(self):
+        """
+        Snapshot of the statistics.
+        :return: Dictionary of the elapsed seconds, the stages (calls, seconds, mean microseconds per call) and the counters.
+        """
+        return {
+            'elapsed': time.perf_counter() - self.started,
+            'stages': {stage: {'calls': self.calls[stage], 'seconds': self.seconds[stage],
+                               'mean_us': self.seconds[stage] / self.calls[stage] * 1e6} for stage in self.stages()},
+            'counters': dict(self.counters),
+        }
+
+    def write_stats(self, path=None):
+        """
+        Write the statistics as JSON, replacing the file at once so collectors never read a partial file.
+        :param path: Output file (default: stats_path).
+        """
+        path = path or self.stats_path
+        if not path:
+            return
+        with open(f"{path}.part", 'w') as output:
+            json.dump(self.stats(), output, indent=2)
+        os.replace(f"{path}.part", path)
+
+    def get_text(self):
+        """
+        Stage breakdown of the run.
+        """
+        stats = self.stats()
+        elapsed = stats['elapsed']
+        timed = sum(stage['seconds'] for stage in stats['stages'].values())
+        text = [f"\nProfile ({elapsed:.3f} s)"]
+        text.append(f"\n|{'Stage':<12}{'Calls':>10}{'Seconds':>12}{'Share':>9}{'Mean (us)':>12}")
+        for name, stage in stats['stages'].items():
+            share = stage['seconds'] / elapsed * 100 if elapsed else 0.0
+            text.append(f"\n|{name:<12}{stage['calls']:>10}{stage['seconds']:>12.3f}{share:>8.1f}%{stage['mean_us']:>12.1f}")
+        untimed = max(0.0, elapsed - timed)
+        text.append(f"\n|{'other':<12}{'':>10}{untimed:>12.3f}{(untimed / elapsed * 100 if elapsed else 0.0):>8.1f}%")
+        for name, value in stats['counters'].items():
+            text.append(f"\n|{name}: {value}")
+        return ''.join(text)
+
+    def close(self):
+        """
+        Write the final JSON statistics.
+        """
+        self.write_stats()
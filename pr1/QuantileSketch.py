@@ -0,0 +1,296 @@
+import argparse, json, math
+import numpy as np
+
+DEFAULT_ALPHA = 0.01 # Relative accuracy of the quantiles
+DEFAULT_MAX_BINS = 2048 # Bins per sign before the lowest ones are collapsed
+MIN_VALUE = 1e-9 # Smaller magnitudes are counted as zero
+# Quantiles listed in the report text
+QUANTILES = (0.01, 0.05, 0.5, 0.95, 0.99)
+# Columns whose distribution is tracked, with the unit and the lower edges of the histogram bins
+# (a value below the first edge goes to the underflow bin)
+DISTRIBUTIONS = {
+    'data_rate': ('Mbps', (0, 6, 12, 24, 54, 100, 150, 300, 450, 600, 900, 1200, 2400)),
+    'signal_dbm': ('dBm', tuple(range(-95, -25, 5))),
+    'mcs_index': ('', tuple(range(0, 32))),
+    'phy_gap': ('', tuple(range(-8, 9))),
+}
+# Columns only tracked for the data frames (the frames with an MCS index, as in MetricsEngine)
+DATA_DISTRIBUTIONS = ('mcs_index', 'phy_gap')
+# Columns read by DistributionTracker.update
+COLUMNS = ('ta', 'ra', 'mcs_index') + tuple(name for name in DISTRIBUTIONS if name != 'mcs_index')
+
+
+class QuantileSketch:
+    """
+    QuantileSketch.py
+    Streaming quantiles with a relative accuracy guarantee (DDSketch): values are counted in logarithmic bins,
+    so any quantile is within alpha of the true value (p99 of 300 Mbps within 3 Mbps at alpha 0.01) with a number
+    of bins that only grows with the log of the value range. Sketches are updated with numpy batches,
+    merged by adding their bins (chunks of a capture, captures or sites, in any order) and serialized as JSON.
+    """
+    def __init__(self, alpha=DEFAULT_ALPHA, max_bins=DEFAULT_MAX_BINS):
+        """
+        :param alpha: Relative accuracy of the quantiles, e.g. 0.01 for 1 %.
+        :param max_bins: Bins per sign, the lowest are then collapsed (only the lowest quantiles lose accuracy).
+        """
+        self.alpha = alpha
+        self.max_bins = max_bins
+        self.gamma = (1 + alpha) / (1 - alpha)
+        self.log_gamma = math.log(self.gamma)
+        self.positive = {} # Bin: count, for values above MIN_VALUE
+        self.negative = {} # Bin: count, for values below -MIN_VALUE
+        self.zero_count = 0
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def __len__(self):
+        return self.count
+
+    def update(self, values):
+        """
+        Add a batch of values.
+        :param values: Numpy array (or sequence) of numbers.
+        """
+        values = np.asarray(values, dtype=np.float64)
+        if len(values) == 0:
+            return
+        self.count += len(values)
+        self.sum += float(values.sum())
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        magnitude = np.abs(values)
+        small = magnitude <= MIN_VALUE
+        self.zero_count += int(np.count_nonzero(small))
+        for store, sign in ((self.positive, values > 0), (self.negative, values < 0)):
+            sign &= ~small
+            if not sign.any():
+                continue
+            bins, counts = np.unique(np.ceil(np.log(magnitude[sign]) / self.log_gamma).astype(np.int64), return_counts=True)
+            for key, count in zip(bins.tolist(), counts.tolist()):
+                store[key] = store.get(key, 0) + count
+        self._collapse()
+
+    def _collapse(self):
+        # Lowest values first: smallest positive bins, largest negative bins
+        for store, lowest in ((self.positive, sorted), (self.negative, lambda keys: sorted(keys, reverse=True))):
+            if len(store) > self.max_bins:
+                keys = lowest(store)
+                target = keys[len(store) - self.max_bins]
+                store[target] += sum(store.pop(key) for key in keys[:len(store) - self.max_bins])
+
+    def merge(self, other):
+        """
+        Add the values of another sketch with the same accuracy.
+        """
+        if other.alpha != self.alpha:
+            raise ValueError(f"Cannot merge sketches of accuracy {self.alpha} and {other.alpha}")
+        for store, other_store in ((self.positive, other.positive), (self.negative, other.negative)):
+            for key, count in other_store.items():
+                store[key] = store.get(key, 0) + count
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._collapse()
+        return self
+
+    def _value(self, key):
+        return 2 * self.gamma ** key / (self.gamma + 1)
+
+    def quantile(self, q):
+        """
+        Value of a quantile.
+        :param q: Quantile between 0 and 1, e.g. 0.99.
+        :return: Value, within alpha of the true one and between min and max (None without values).
+        """
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = 0
+        for key in sorted(self.negative, reverse=True):
+            seen += self.negative[key]
+            if seen > rank:
+                return max(self.min, -self._value(key))
+        seen += self.zero_count
+        if seen > rank:
+            return 0.0
+        for key in sorted(self.positive):
+            seen += self.positive[key]
+            if seen > rank:
+                return min(self.max, self._value(key))
+        return self.max
+
+    @property
+    def mean(self):
+        return self.sum / self.count if self.count else None
+
+    def to_dict(self):
+        """
+        JSON serializable state.
+        """
+        return {
+            'alpha': self.alpha, 'max_bins': self.max_bins, 'count': self.count, 'sum': self.sum,
+            'min': self.min if self.count else None, 'max': self.max if self.count else None, 'zero_count': self.zero_count,
+            'positive': {str(key): count for key, count in sorted(self.positive.items())},
+            'negative': {str(key): count for key, count in sorted(self.negative.items())},
+        }
+
+    @classmethod
+    def from_dict(cls, state):
+        """
+        Sketch of a to_dict state.
+        """
+        sketch = cls(state['alpha'], state['max_bins'])
+        sketch.positive = {int(key): count for key, count in state['positive'].items()}
+        sketch.negative = {int(key): count for key, count in state['negative'].items()}
+        sketch.zero_count = state['zero_count']
+        sketch.count = state['count']
+        sketch.sum = state['sum']
+        if sketch.count:
+            sketch.min, sketch.max = state['min'], state['max']
+        return sketch
+
+
+class Histogram:
+    """
+    Counts of values in fixed bins, exact and mergeable.
+    Bin i holds the values from edges[i] up to edges[i + 1], with an underflow bin below the first edge.
+    """
+    def __init__(self, edges):
+        """
+        :param edges: Increasing lower edges of the bins.
+        """
+        self.edges = np.asarray(edges, dtype=np.float64)
+        self.counts = np.zeros(len(edges) + 1, dtype=np.int64) # Underflow bin first
+
+    def update(self, values):
+        bins = np.searchsorted(self.edges, np.asarray(values, dtype=np.float64), side='right')
+        self.counts += np.bincount(bins, minlength=len(self.counts))
+
+    def merge(self, other):
+        if not np.array_equal(self.edges, other.edges):
+            raise ValueError("Cannot merge histograms with different bins")
+        self.counts += other.counts
+        return self
+
+    def labels(self):
+        """
+        Labels of the bins, e.g. '<-95', '-95..-90' and '>=-30' (bins of one integer are labelled by it).
+        """
+        edges = [f"{edge:g}" for edge in self.edges]
+        unit = np.all(np.diff(self.edges) == 1) and np.all(self.edges == np.round(self.edges))
+        bins = edges[:-1] if unit else [f"{low}..{high}" for low, high in zip(edges, edges[1:])]
+        return [f"<{edges[0]}"] + bins + [f">={edges[-1]}"]
+
+    def to_dict(self):
+        return {'edges': self.edges.tolist(), 'counts': self.counts.tolist()}
+
+    @classmethod
+    def from_dict(cls, state):
+        histogram = cls(state['edges'])
+        histogram.counts = np.asarray(state['counts'], dtype=np.int64)
+        return histogram
+
+
+class DistributionTracker:
+    """
+    Quantile sketch and histogram of the data rate and signal strength of every frame, and of the MCS index and
+    PHY gap of the data frames, in constant memory whatever the number of frames.
+    """
+    def __init__(self, alpha=DEFAULT_ALPHA):
+        """
+        :param alpha: Relative accuracy of the quantiles.
+        """
+        self.sketches = {name: QuantileSketch(alpha) for name in DISTRIBUTIONS}
+        self.histograms = {name: Histogram(edges) for name, (_, edges) in DISTRIBUTIONS.items()}
+
+    columns = COLUMNS
+
+    def update(self, batch, selected=None):
+        """
+        Add the frames of a batch.
+        :param batch: FrameBatch with at least the tracker COLUMNS.
+        :param selected: Boolean mask of the frames to add, e.g. MetricsEngine.address_mask (None for all).
+        """
+        if selected is None:
+            selected = np.ones(len(batch), dtype=np.bool_)
+        data = selected & batch.valid['mcs_index']
+        for name in DISTRIBUTIONS:
+            values = batch[name][(data if name in DATA_DISTRIBUTIONS else selected) & batch.valid[name]]
+            self.sketches[name].update(values)
+            self.histograms[name].update(values)
+
+    def merge(self, other):
+        """
+        Add the frames of another tracker (of another chunk, capture or site).
+        """
+        for name in DISTRIBUTIONS:
+            self.sketches[name].merge(other.sketches[name])
+            self.histograms[name].merge(other.histograms[name])
+        return self
+
+    def quantiles(self, name, quantiles=QUANTILES):
+        """
+        Quantiles of a column.
+        :return: Dictionary of quantile to value (None without values).
+        """
+        return {q: self.sketches[name].quantile(q) for q in quantiles}
+
+    def to_dict(self):
+        return {name: {'sketch': self.sketches[name].to_dict(), 'histogram': self.histograms[name].to_dict()} for name in DISTRIBUTIONS}
+
+    @classmethod
+    def from_dict(cls, state):
+        tracker = cls()
+        for name, column in state.items():
+            tracker.sketches[name] = QuantileSketch.from_dict(column['sketch'])
+            tracker.histograms[name] = Histogram.from_dict(column['histogram'])
+        return tracker
+
+    def save(self, path):
+        """
+        Write the state as JSON, to be merged with other runs by load(path).merge(...).
+        """
+        with open(path, 'w') as output:
+            json.dump(self.to_dict(), output)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as state:
+            return cls.from_dict(json.load(state))
+
+    def get_text(self):
+        """
+        Text of the quantiles and histograms, in the layout of doctor.get_text_from_metrics.
+        """
+        text = [f"\n\nDistributions ({' / '.join(f'p{q * 100:g}' for q in QUANTILES)}, {' and '.join(DATA_DISTRIBUTIONS)} of the data frames):"]
+        for name, (unit, _) in DISTRIBUTIONS.items():
+            sketch = self.sketches[name]
+            if not sketch.count:
+                text.append(f"\n|{name}: No data")
+                continue
+            values = ' / '.join(f"{value:.1f}" for value in self.quantiles(name).values())
+            text.append(f"\n|{name}: {values}{f' {unit}' if unit else ''} (mean {sketch.mean:.2f}, {sketch.count} values)")
+            histogram = self.histograms[name]
+            bins = [f"{label}:{count}" for label, count in zip(histogram.labels(), histogram.counts.tolist()) if count]
+            text.append(f"\n|    Histogram: {' '.join(bins)}")
+        text.append(f"\n\n{'-'*80}")
+        return ''.join(text)
+
+
+if __name__ == "__main__":
+    # Merge the distributions of several runs, e.g. of parallel chunks or sites.
+    parser = argparse.ArgumentParser(description="Merge distribution files written by doctor.py or multidoctor.py with --quantiles.")
+    parser.add_argument("paths", nargs='+', help="Distribution JSON files.")
+    parser.add_argument("-o", "--output", type=str, default=None, help="Write the merged distributions to this JSON file.")
+    args = parser.parse_args()
+
+    merged = DistributionTracker.load(args.paths[0])
+    for path in args.paths[1:]:
+        merged.merge(DistributionTracker.load(path))
+    if args.output:
+        merged.save(args.output)
+    print(merged.get_text().lstrip('\n'))
@@ -0,0 +1,271 @@
+import numpy as np
+
+"""
+Bandwidth encodings
+"""
+BANDWIDTHS = (20, 40, 80, 160) # Channel widths in MHz, indexes of the tables
+BANDWIDTH_INDEX = {bandwidth: index for index, bandwidth in enumerate(BANDWIDTHS)}
+# 802.11n bandwidth (radiotap and wlan_radio.11n.bandwidth) to MHz [0: 20, 1: 40, 2: 20L, 3: 20U]
+HT_BANDWIDTH_MHZ = {0: 20, 1: 40, 2: 20, 3: 20}
+# 802.11ac bandwidth (radiotap and wlan_radio.11ac.bandwidth) to MHz
+VHT_BANDWIDTH_MHZ = {0: 20, 1: 40, 2: 40, 3: 40, 4: 80, 5: 80, 6: 80, 7: 80, 8: 80, 9: 80, 10: 80,
+                     11: 160, 12: 160, 13: 160, 14: 160, 15: 160, 16: 160, 17: 160, 18: 160,
+                     19: 160, 20: 160, 21: 160, 22: 160, 23: 160, 24: 160, 25: 160}
+VHT_BANDWIDTH_CODE = {20: 0, 40: 1, 80: 4, 160: 11} # Full channel code of a width
+# 802.11ax bandwidth (radiotap HE data5) to MHz, RU allocations (4 and above) have no channel width
+HE_BANDWIDTH_MHZ = {0: 20, 1: 40, 2: 80, 3: 160}
+
+"""
+PHY rates
+"""
+MAX_NSS = 8
+# Data bits per OFDM symbol for 802.11n MCS 0-31 on 20 MHz (1 to 4 spatial streams)
+HT_DBPS = [ 26, 52, 78, 104, 156, 208, 234, 260,
+            52, 104, 156, 208, 312, 416, 468, 520,
+            78, 156, 234, 312, 468, 624, 702, 780,
+            104, 208, 312, 416, 624, 832, 936, 1040 ]
+# 802.11ac data subcarriers per bandwidth and coded bits per subcarrier per MCS
+VHT_SUBCARRIERS = { 20: 52, 40: 108, 80: 234, 160: 468 }
+VHT_BITS = [ 0.5, 1, 1.5, 2, 3, 4, 4.5, 5, 6, 20 / 3 ]
+# MCS, bandwidth and NSS combinations 802.11ac does not define (non integer bits per symbol)
+VHT_INVALID = { (9, 20, 1), (9, 20, 2), (9, 20, 4), (9, 20, 5), (9, 20, 7), (9, 20, 8),
+                (6, 80, 3), (6, 80, 7), (9, 80, 6), (9, 160, 3) }
+# 802.11ax data subcarriers per bandwidth (full band RU), coded bits per subcarrier per MCS
+# and guard intervals [0: 0.8, 1: 1.6, 2: 3.2] in microseconds
+HE_SUBCARRIERS = { 20: 234, 40: 468, 80: 980, 160: 1960 }
+HE_BITS = VHT_BITS + [ 7.5, 25 / 3 ]
+HE_GI = [ 0.8, 1.6, 3.2 ]
+
+
+def _ht_table():
+    # [mcs, 40 MHz, short gi]
+    table = np.full((len(HT_DBPS), 2, 2), np.nan)
+    for mcs, dbps in enumerate(HT_DBPS):
+        for wide in (0, 1):
+            for sgi in (0, 1):
+                table[mcs, wide, sgi] = dbps * (108 / 52 if wide else 1) / (3.6 if sgi else 4.0)
+    return table
+
+def _vht_table():
+    # [mcs, nss - 1, bandwidth index, short gi]
+    table = np.full((len(VHT_BITS), MAX_NSS, len(BANDWIDTHS), 2), np.nan)
+    for mcs, bits in enumerate(VHT_BITS):
+        for nss in range(1, MAX_NSS + 1):
+            for index, bandwidth in enumerate(BANDWIDTHS):
+                if (mcs, bandwidth, nss) in VHT_INVALID:
+                    continue
+                for sgi in (0, 1):
+                    table[mcs, nss - 1, index, sgi] = VHT_SUBCARRIERS[bandwidth] * bits * nss / (3.6 if sgi else 4.0)
+    return table
+
+def _he_table():
+    # [mcs, nss - 1, bandwidth index, gi]
+    table = np.full((len(HE_BITS), MAX_NSS, len(BANDWIDTHS), len(HE_GI)), np.nan)
+    for mcs, bits in enumerate(HE_BITS):
+        for nss in range(1, MAX_NSS + 1):
+            for index, bandwidth in enumerate(BANDWIDTHS):
+                for gi, guard in enumerate(HE_GI):
+                    table[mcs, nss - 1, index, gi] = HE_SUBCARRIERS[bandwidth] * bits * nss / (12.8 + guard)
+    return table
+
+# Data rates in Mbps, NaN for undefined combinations
+HT_RATES = _ht_table()
+VHT_RATES = _vht_table()
+HE_RATES = _he_table()
+
+"""
+Receiver sensitivity
+"""
+# Minimum RSSI (dBm) of MCS 0-11 on 20 MHz, every doubling of the bandwidth needs 3 dB more
+MIN_RSSI_20MHZ = [ -82, -79, -77, -74, -70, -66, -65, -64, -59, -57, -54, -52 ]
+MIN_RSSI = np.array([[rssi + 3 * index for rssi in MIN_RSSI_20MHZ] for index in range(len(BANDWIDTHS))])
+# Highest MCS per stream of a PHY type (wlan_radio.phy 7: 802.11n, 8: 802.11ac, 11: 802.11ax)
+MAX_MCS = { 7: 7, 8: 9, 11: 11 }
+DEFAULT_MAX_MCS = 7
+MAX_MCS_LEVELS = (7, 9, 11)
+SIGNAL_MIN = -128 # Signal strengths are int8
+NO_SIGNAL_PHY_GAP = 4 # PHY gap of frames without signal strength (bad packet)
+
+
+def _expected_table():
+    # [max mcs level, bandwidth index, rssi - SIGNAL_MIN]: the last MCS the signal reaches (0 below every threshold)
+    rssi = np.arange(SIGNAL_MIN, 128)
+    table = np.zeros((len(MAX_MCS_LEVELS), len(BANDWIDTHS), len(rssi)), dtype=np.int8)
+    for level, max_mcs in enumerate(MAX_MCS_LEVELS):
+        for index in range(len(BANDWIDTHS)):
+            reached = (rssi[:, None] >= MIN_RSSI[index, :max_mcs + 1]).sum(axis=1)
+            table[level, index] = np.maximum(reached - 1, 0)
+    return table
+
+EXPECTED_MCS = _expected_table()
+MAX_MCS_LEVEL = { max_mcs: level for level, max_mcs in enumerate(MAX_MCS_LEVELS) }
+# Lookups indexed by value, -1 for unknown entries
+_BANDWIDTH_LOOKUP = np.full(BANDWIDTHS[-1] + 1, -1, dtype=np.int8)
+_BANDWIDTH_LOOKUP[list(BANDWIDTHS)] = np.arange(len(BANDWIDTHS))
+_LEVEL_LOOKUP = np.full(256, MAX_MCS_LEVEL[DEFAULT_MAX_MCS], dtype=np.int8)
+for _phy, _max_mcs in MAX_MCS.items():
+    _LEVEL_LOOKUP[_phy] = MAX_MCS_LEVEL[_max_mcs]
+
+
+"""
+Scalar lookups
+"""
+def _rate(value):
+    value = float(value)
+    return None if value != value else value # NaN
+
+def ht_rate(mcs_index, bandwidth, short_gi):
+    """
+    Data rate of an 802.11n frame.
+    :param mcs_index: MCS index (0 to 31).
+    :param bandwidth: Radiotap bandwidth (0: 20, 1: 40, 2: 20L, 3: 20U).
+    :param short_gi: True if short guard interval is used.
+    :return: Data rate in Mbps or None for unknown MCS.
+    """
+    if not 0 <= mcs_index < len(HT_DBPS):
+        return None
+    return _rate(HT_RATES[mcs_index, 1 if bandwidth == 1 else 0, 1 if short_gi else 0])
+
+def vht_rate(mcs, nss, bandwidth_mhz, short_gi):
+    """
+    Data rate of an 802.11ac frame.
+    :param mcs: MCS index (0 to 9).
+    :param nss: Number of spatial streams (1 to 8).
+    :param bandwidth_mhz: Bandwidth in MHz.
+    :param short_gi: True if short guard interval is used.
+    :return: Data rate in Mbps or None if the combination is not defined.
+    """
+    if not 0 <= mcs < len(VHT_BITS) or not 1 <= nss <= MAX_NSS or bandwidth_mhz not in BANDWIDTH_INDEX:
+        return None
+    return _rate(VHT_RATES[mcs, nss - 1, BANDWIDTH_INDEX[bandwidth_mhz], 1 if short_gi else 0])
+
+def he_rate(mcs, nss, bandwidth_mhz, gi):
+    """
+    Data rate of an 802.11ax single user frame.
+    :param mcs: MCS index (0 to 11).
+    :param nss: Number of spatial streams (1 to 8).
+    :param bandwidth_mhz: Bandwidth in MHz.
+    :param gi: Guard interval (0: 0.8, 1: 1.6, 2: 3.2 microseconds).
+    :return: Data rate in Mbps or None if the combination is not defined.
+    """
+    if (not 0 <= mcs < len(HE_BITS) or not 1 <= nss <= MAX_NSS or bandwidth_mhz not in BANDWIDTH_INDEX
+            or not 0 <= gi < len(HE_GI)):
+        return None
+    return _rate(HE_RATES[mcs, nss - 1, BANDWIDTH_INDEX[bandwidth_mhz], gi])
+
+def stream_params(mcs_index=None, bandwidth=None, vht_mcs=None, vht_nss=None, vht_bandwidth=None,
+                  he_mcs=None, he_nss=None, he_bandwidth=None):
+    """
+    MCS per stream, spatial streams and channel width of a frame, from its 802.11n, 802.11ac or 802.11ax fields.
+    Bandwidths are given as encoded by radiotap (and wireshark for 802.11n and 802.11ac).
+    :return: Tuple (mcs, nss, bandwidth_mhz), None for unknown values.
+    """
+    if mcs_index is not None or bandwidth is not None:
+        mcs = nss = None
+        if mcs_index is not None:
+            mcs, nss = mcs_index % 8, mcs_index // 8 + 1
+        return mcs, nss, HT_BANDWIDTH_MHZ.get(bandwidth)
+    if vht_mcs is not None or vht_bandwidth is not None:
+        return vht_mcs, vht_nss, VHT_BANDWIDTH_MHZ.get(vht_bandwidth)
+    return he_mcs, he_nss, HE_BANDWIDTH_MHZ.get(he_bandwidth)
+
+def spatial_streams(mcs_index):
+    """
+    Number of spatial streams of an 802.11n MCS index.
+    :return: Spatial streams (0 without MCS index).
+    """
+    return mcs_index // 8 + 1 if mcs_index is not None else 0
+
+def expected_mcs(rssi, bandwidth_mhz, max_mcs=DEFAULT_MAX_MCS):
+    """
+    Highest MCS (per stream) whose minimum sensitivity a signal strength reaches.
+    :param rssi: Signal strength (dBm).
+    :param bandwidth_mhz: Channel width in MHz (20, 40, 80 or 160).
+    :param max_mcs: Highest MCS of the PHY (7, 9 or 11).
+    :return: Expected MCS, 0 below every threshold.
+    """
+    rssi = min(max(rssi, SIGNAL_MIN), 127)
+    return int(EXPECTED_MCS[MAX_MCS_LEVEL[max_mcs], BANDWIDTH_INDEX[bandwidth_mhz], rssi - SIGNAL_MIN])
+
+def phy_gap(rssi, bandwidth_mhz, mcs, phy=None):
+    """
+    Gap between the MCS a signal strength allows and the MCS used.
+    :param rssi: Signal strength (dBm) or None.
+    :param bandwidth_mhz: Channel width in MHz or None.
+    :param mcs: MCS per stream or None.
+    :param phy: PHY type (wlan_radio.phy), selects the highest MCS.
+    :return: PHY gap, None without bandwidth or MCS, NO_SIGNAL_PHY_GAP without signal strength.
+    """
+    if bandwidth_mhz not in BANDWIDTH_INDEX or mcs is None:
+        return None # No bandwidth or mcs index means no phy gap
+    if rssi is None:
+        return NO_SIGNAL_PHY_GAP
+    return expected_mcs(rssi, bandwidth_mhz, MAX_MCS.get(phy, DEFAULT_MAX_MCS)) - mcs
+
+
+"""
+Vectorized lookups (numpy arrays with validity masks, like FrameBatch columns)
+"""
+def bandwidth_indexes(bandwidth_mhz, bandwidth_valid):
+    """
+    Table indexes of channel widths.
+    :return: Tuple (indexes, valid mask), invalid for widths that are not 20, 40, 80 or 160 MHz.
+    """
+    indexes = _BANDWIDTH_LOOKUP[np.minimum(bandwidth_mhz, BANDWIDTHS[-1])].astype(np.intp)
+    valid = bandwidth_valid & (indexes >= 0)
+    return np.where(valid, indexes, 0), valid
+
+def ht_rates(mcs_index, bandwidth, short_gi):
+    """
+    Vectorized ht_rate, NaN for unknown MCS.
+    """
+    known = mcs_index < len(HT_DBPS)
+    rates = HT_RATES[np.where(known, mcs_index, 0), (bandwidth == 1).astype(np.intp), short_gi.astype(np.intp)]
+    return np.where(known, rates, np.nan)
+
+def vht_rates(mcs, nss, bandwidth_mhz, short_gi):
+    """
+    Vectorized vht_rate, NaN for undefined combinations.
+    """
+    indexes, known = bandwidth_indexes(bandwidth_mhz, np.ones(len(mcs), dtype=np.bool_))
+    known &= (mcs < len(VHT_BITS)) & (nss >= 1) & (nss <= MAX_NSS)
+    rates = VHT_RATES[np.where(known, mcs, 0), np.where(known, nss.astype(np.intp) - 1, 0), indexes,
+                      short_gi.astype(np.intp)]
+    return np.where(known, rates, np.nan)
+
+def he_rates(mcs, nss, bandwidth_mhz, gi):
+    """
+    Vectorized he_rate, NaN for undefined combinations.
+    """
+    indexes, known = bandwidth_indexes(bandwidth_mhz, np.ones(len(mcs), dtype=np.bool_))
+    known &= (mcs < len(HE_BITS)) & (nss >= 1) & (nss <= MAX_NSS) & (gi < len(HE_GI))
+    rates = HE_RATES[np.where(known, mcs, 0), np.where(known, nss.astype(np.intp) - 1, 0), indexes,
+                     np.where(known, gi, 0)]
+    return np.where(known, rates, np.nan)
+
+def spatial_streams_array(nss, nss_valid):
+    """
+    Vectorized number of spatial streams (0 when unknown).
+    """
+    return np.where(nss_valid, nss, 0).astype(np.uint8)
+
+def expected_mcs_array(rssi, bandwidth_indexes, phy):
+    """
+    Vectorized expected_mcs.
+    :param rssi: Signal strengths (dBm).
+    :param bandwidth_indexes: Table indexes of the channel widths (see bandwidth_indexes).
+    :param phy: PHY types, select the highest MCS.
+    """
+    signal = rssi.astype(np.intp) - SIGNAL_MIN
+    return EXPECTED_MCS[_LEVEL_LOOKUP[phy], bandwidth_indexes, signal]
+
+def phy_gaps(signal_dbm, signal_valid, bandwidth_mhz, bandwidth_valid, mcs, mcs_valid, phy):
+    """
+    Vectorized phy_gap.
+    :return: Tuple (phy gap, valid mask), the gap is defined for frames with channel width and MCS.
+    """
+    indexes, valid = bandwidth_indexes(bandwidth_mhz, bandwidth_valid)
+    valid &= mcs_valid
+    gap = expected_mcs_array(signal_dbm, indexes, phy).astype(np.int16) - mcs
+    gap = np.where(signal_valid, gap, NO_SIGNAL_PHY_GAP)
+    return np.where(valid, gap, 0).astype(np.int8), valid
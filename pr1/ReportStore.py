@@ -0,0 +1,228 @@
+import argparse, sqlite3
+import time
+import numpy as np
+import FrameBatch, WindowAggregator, StationBreakdown
+
+# Metrics of a pane: the WindowAggregator counters and the signal sum and count (from the signal histogram)
+PANE_METRICS = WindowAggregator.COUNTERS + ('signal_sum', 'signal_frames')
+# Metrics of a station or BSSID, in the order of StationBreakdown.rows()
+STATION_METRICS = StationBreakdown.METRICS + tuple(f"mcs{index}" for index in range(StationBreakdown.MCS_BINS))
+SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS captures (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE, path TEXT, slide REAL, frames INTEGER, updated REAL)",
+    # Panes are the disjoint slide long intervals windows are made of, so sums over any time range count every frame once.
+    # They are stored in key and time order, a time range of a key is one sequential read.
+    "CREATE TABLE IF NOT EXISTS panes (capture INTEGER NOT NULL, kind TEXT NOT NULL, key TEXT NOT NULL, start REAL NOT NULL, end REAL NOT NULL, "
+    + ', '.join(f"{name} INTEGER NOT NULL" for name in PANE_METRICS) + ", PRIMARY KEY (key, start, capture, kind)) WITHOUT ROWID",
+    "CREATE TABLE IF NOT EXISTS density (capture INTEGER NOT NULL, channel INTEGER NOT NULL, frequency INTEGER, density REAL, classification TEXT, "
+    "PRIMARY KEY (capture, channel))",
+    "CREATE TABLE IF NOT EXISTS stations (capture INTEGER NOT NULL, kind TEXT NOT NULL, address TEXT NOT NULL, ra TEXT NOT NULL, "
+    + ', '.join(f"{name} NUMERIC" for name in STATION_METRICS) + ", PRIMARY KEY (capture, kind, address, ra))",
+    "CREATE INDEX IF NOT EXISTS stations_address ON stations (address)",
+)
+
+
+class ReportStore:
+    """
+    ReportStore.py
+    Indexed SQLite store of the pre-aggregated metrics of captures: the panes of a WindowAggregator (in total and
+    per BSSID or TA), the channel densities and the StationBreakdown aggregates, so questions like the retry rate
+    of a BSSID between two times across every capture are answered from the indexes without reading the captures.
+    Every write() is one transaction of bulk inserts, rows of a capture are replaced when written again.
+    """
+    def __init__(self, path):
+        """
+        :param path: SQLite database file, created if needed.
+        """
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("PRAGMA journal_mode=WAL") # Readers do not block the writer of a live capture
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        with self.connection:
+            for statement in SCHEMA:
+                self.connection.execute(statement)
+        self.written = {} # Capture id: newest pane index written, older panes are complete
+
+    def capture(self, name, path=None, slide=None):
+        """
+        Id of a capture, added if new.
+        :param name: Unique name of the capture, e.g. its file name without extension.
+        """
+        with self.connection:
+            self.connection.execute("INSERT OR IGNORE INTO captures (name, path, slide, frames, updated) VALUES (?, ?, ?, 0, ?)",
+                                    (name, path, slide, time.time()))
+            if path is not None or slide is not None:
+                self.connection.execute("UPDATE captures SET path = COALESCE(?, path), slide = COALESCE(?, slide) WHERE name = ?",
+                                        (path, slide, name))
+        return self.connection.execute("SELECT id FROM captures WHERE name = ?", (name,)).fetchone()[0]
+
+    def write(self, capture, frames=None, aggregator=None, density_metrics=None, breakdown=None):
+        """
+        Write the metrics of a capture in one transaction. Live captures call it at every report:
+        only the panes from the newest one already written are written again.
+        :param capture: Capture id from capture().
+        :param frames: Frames processed (None to keep the stored count).
+        :param aggregator: WindowAggregator whose panes are written (None for none).
+        :param density_metrics: Density metrics of DensityTracker.get_density_metrics (None for none).
+        :param breakdown: StationBreakdown whose stations and BSSIDs are written (None for none).
+        """
+        with self.connection:
+            self.connection.execute("UPDATE captures SET frames = COALESCE(?, frames), updated = ? WHERE id = ?", (frames, time.time(), capture))
+            if aggregator is not None:
+                self.connection.executemany(f"INSERT OR REPLACE INTO panes VALUES ({', '.join('?' * (5 + len(PANE_METRICS)))})",
+                                            self._pane_rows(capture, aggregator))
+            if density_metrics is not None:
+                self.connection.executemany("INSERT OR REPLACE INTO density VALUES (?, ?, ?, ?, ?)",
+                                            [(capture, entry['channel'], entry['frequency'], entry['density'], entry['classification'])
+                                             for entry in density_metrics])
+            if breakdown is not None:
+                self.connection.execute("DELETE FROM stations WHERE capture = ?", (capture,)) # Replaced keys are gone
+                self.connection.executemany(f"INSERT INTO stations VALUES ({', '.join('?' * (4 + len(STATION_METRICS)))})",
+                                            ((capture,) + row[:3] + tuple(None if value == '' else value for value in row[3:])
+                                             for row in breakdown.rows()))
+
+    def _pane_rows(self, capture, aggregator):
+        """
+        Yields the rows of the panes not written yet (and of the newest one written, which may have grown).
+        """
+        newest = self.written.get(capture)
+        kind = aggregator.key or ''
+        dbm = np.arange(WindowAggregator.SIGNAL_BINS) + WindowAggregator.SIGNAL_MIN
+        for index, pane, keys in aggregator.buckets:
+            if newest is not None and index < newest:
+                continue
+            start, end = round(index * aggregator.slide, 6), round((index + 1) * aggregator.slide, 6)
+            for key, stats in [(None, pane)] + sorted(keys.items()):
+                names = (kind, FrameBatch.int_to_mac(key)) if key is not None else ('', '') # Totals have no key
+                signal = (int(stats.signal @ dbm), int(stats.signal.sum()))
+                yield (capture,) + names + (start, end) + tuple(stats.counters.tolist()) + signal
+        if aggregator.buckets:
+            self.written[capture] = aggregator.buckets[-1][0]
+
+    def _where(self, key=None, start=None, end=None, captures=None, kind=None):
+        """
+        SQL condition and parameters of a pane query.
+        """
+        conditions = ["panes.key = ?"]
+        parameters = [normalize(key) if key else '']
+        if kind is not None:
+            conditions.append("panes.kind = ?")
+            parameters.append(kind)
+        if start is not None:
+            conditions.append("panes.start >= ?")
+            parameters.append(start)
+        if end is not None:
+            conditions.append("panes.end <= ?")
+            parameters.append(end)
+        if captures:
+            conditions.append(f"captures.name IN ({', '.join('?' * len(captures))})")
+            parameters.extend(captures)
+        return ' AND '.join(conditions), parameters
+
+    def panes(self, key=None, start=None, end=None, captures=None, kind=None):
+        """
+        Panes between two times, oldest first.
+        :param key: BSSID or TA address (None for the totals of the captures).
+        :param start: Earliest pane start (capture timestamp in seconds, None for no bound).
+        :param end: Latest pane end (None for no bound).
+        :param captures: Names of the captures (None for all).
+        :param kind: 'bssid' or 'ta' when captures were aggregated by both (None for any).
+        :return: List of dictionaries of the capture name, start, end and PANE_METRICS.
+        """
+        where, parameters = self._where(key, start, end, captures, kind)
+        cursor = self.connection.execute(f"SELECT captures.name, panes.start, panes.end, {', '.join(f'panes.{name}' for name in PANE_METRICS)} "
+                                         f"FROM panes JOIN captures ON captures.id = panes.capture WHERE {where} ORDER BY panes.start",
+                                         parameters)
+        return [dict(zip(('capture', 'start', 'end') + PANE_METRICS, row)) for row in cursor]
+
+    def totals(self, key=None, start=None, end=None, captures=None, kind=None, per_capture=False):
+        """
+        Metrics of the frames between two times, summed in SQL over the panes.
+        :param per_capture: One result per capture instead of one over every capture.
+        :return: Dictionary (or dictionary of capture name to dictionary) of PANE_METRICS, seconds covered by panes,
+                 retry rate and mean signal (None without data frames or signal), airtime (fraction of the seconds),
+                 goodput and throughput (Mbps).
+        """
+        where, parameters = self._where(key, start, end, captures, kind)
+        group = "GROUP BY captures.name" if per_capture else ""
+        cursor = self.connection.execute(f"SELECT captures.name, SUM(panes.end - panes.start), {', '.join(f'SUM(panes.{name})' for name in PANE_METRICS)} "
+                                         f"FROM panes JOIN captures ON captures.id = panes.capture WHERE {where} {group}", parameters)
+        results = {}
+        for name, seconds, *sums in cursor:
+            values = dict(zip(PANE_METRICS, (value or 0 for value in sums)))
+            values['seconds'] = seconds or 0.0
+            values['retry_rate'] = values['retry_frames'] / values['data_frames'] if values['data_frames'] else None
+            values['signal_dbm'] = values['signal_sum'] / values['signal_frames'] if values['signal_frames'] else None
+            values['airtime'] = values['airtime'] / 1e6 / seconds if seconds else 0.0 # Microseconds
+            values['goodput'] = values['goodput_bytes'] * 8 / seconds / 1e6 if seconds else 0.0
+            values['throughput'] = values['bytes'] * 8 / seconds / 1e6 if seconds else 0.0
+            results[name] = values
+        return results if per_capture else next(iter(results.values()))
+
+    def stations(self, address=None, captures=None, kind=None):
+        """
+        Station and BSSID aggregates.
+        :param address: TA or BSSID address (None for all).
+        :param kind: 'pair' or 'bssid' (None for both).
+        :return: List of dictionaries of the capture name, kind, address, ra and STATION_METRICS, most frames first.
+        """
+        conditions, parameters = ["1"], []
+        for column, value in (('stations.address', normalize(address) if address else None), ('stations.kind', kind)):
+            if value is not None:
+                conditions.append(f"{column} = ?")
+                parameters.append(value)
+        if captures:
+            conditions.append(f"captures.name IN ({', '.join('?' * len(captures))})")
+            parameters.extend(captures)
+        cursor = self.connection.execute(f"SELECT captures.name, stations.kind, stations.address, stations.ra, "
+                                         f"{', '.join(f'stations.{name}' for name in STATION_METRICS)} FROM stations "
+                                         f"JOIN captures ON captures.id = stations.capture WHERE {' AND '.join(conditions)} "
+                                         f"ORDER BY stations.frames DESC", parameters)
+        return [dict(zip(('capture', 'kind', 'address', 'ra') + STATION_METRICS, row)) for row in cursor]
+
+    def density(self, captures=None):
+        """
+        Channel densities of the captures.
+        :return: List of dictionaries of the capture name, channel, frequency, density and classification.
+        """
+        condition = f"WHERE captures.name IN ({', '.join('?' * len(captures))})" if captures else ""
+        cursor = self.connection.execute(f"SELECT captures.name, density.channel, density.frequency, density.density, density.classification "
+                                         f"FROM density JOIN captures ON captures.id = density.capture {condition} "
+                                         f"ORDER BY captures.name, density.channel", list(captures or ()))
+        return [dict(zip(('capture', 'channel', 'frequency', 'density', 'classification'), row)) for row in cursor]
+
+    def close(self):
+        self.connection.close()
+
+
+def normalize(address):
+    """
+    Lower case colon separated form of an address, as stored.
+    """
+    return FrameBatch.int_to_mac(FrameBatch.mac_to_int(address))
+
+
+if __name__ == "__main__":
+    # Query a store written by doctor.py --store.
+    parser = argparse.ArgumentParser(description="Query the metrics of a report store without reading the captures.")
+    parser.add_argument("path", help="SQLite report store.")
+    parser.add_argument("-k", "--key", type=str, default=None, help="BSSID or TA address (default: totals of the captures).")
+    parser.add_argument("--start", type=float, default=None, help="Start time (capture timestamp in seconds, default: no bound).")
+    parser.add_argument("--end", type=float, default=None, help="End time (default: no bound).")
+    parser.add_argument("-c", "--capture", type=str, nargs='+', default=None, help="Names of the captures (default: all).")
+    parser.add_argument("--stations", action="store_true", help="List the station and BSSID aggregates of the key instead.")
+    args = parser.parse_args()
+
+    store = ReportStore(args.path)
+    started = time.perf_counter()
+    if args.stations:
+        results = store.stations(args.key, args.capture)
+        for row in results:
+            print(', '.join(f"{name}={value}" for name, value in row.items() if value is not None))
+    else:
+        results = store.totals(args.key, args.start, args.end, args.capture, per_capture=True)
+        for name, values in results.items():
+            retry = f"{values['retry_rate'] * 100:.2f} %" if values['retry_rate'] is not None else "-- %"
+            print(f"{name}: {values['frames']} frames ({values['data_frames']} data) over {values['seconds']:g} s, retry rate {retry}, "
+                  f"airtime {values['airtime'] * 100:.2f} %, goodput {values['goodput']:.2f} Mbps")
+    print(f"{len(results)} results in {(time.perf_counter() - started) * 1000:.1f} ms")
+    store.close()
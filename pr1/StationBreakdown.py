@@ -0,0 +1,369 @@
+import heapq
+import numpy as np
+import FrameBatch
+
+# Columns read by the breakdown
+COLUMNS = ('ta', 'ra', 'bssid', 'length', 'fc_retry', 'data_rate', 'mcs_index', 'mcs', 'phy_gap', 'duration', 'signal_dbm')
+# Counters of a key, summed over its frames (data frames are the frames with an 802.11n MCS index, as in MetricsEngine)
+COUNTERS = ('frames', 'data_frames', 'retry_frames', 'bytes', 'airtime', 'rate_sum', 'phy_gap_sum', 'phy_gap_frames',
+            'signal_sum', 'signal_frames')
+# Metrics of a key in the CSV rows (followed by the MCS histogram)
+METRICS = ('frames', 'data_frames', 'retry_frames', 'bytes', 'airtime', 'avg_rate', 'min_rate', 'max_rate', 'retry_rate', 'phy_gap', 'signal_dbm')
+MCS_BINS = 12 # MCS 0 to 11 per spatial stream (802.11n, ac or ax)
+DEFAULT_CAPACITY = 4096 # Keys tracked exactly per table, the others are counted in the sketch and the other row
+DEFAULT_TOP = 5 # Keys listed in the report text
+MIN_DATA_FRAMES = 20 # Data frames of a station before it can be listed as a worst station
+SKETCH_WIDTH = 4096
+SKETCH_DEPTH = 4
+
+
+class CountMinSketch:
+    """
+    Count-min sketch of the frames of every key: estimates never undercount, and overcount by at most
+    total / width with probability 1 - 2^-depth, in a fixed depth x width table whatever the number of keys.
+    """
+    def __init__(self, width=SKETCH_WIDTH, depth=SKETCH_DEPTH, seed=0):
+        rnd = np.random.default_rng(seed)
+        self.width = width
+        self.counts = np.zeros((depth, width), dtype=np.int64)
+        # Multiply-shift hashing, one odd multiplier per row
+        self.multipliers = rnd.integers(1, 2 ** 63, size=(depth, 1), dtype=np.uint64) | np.uint64(1)
+        self.total = 0
+
+    def _columns(self, keys):
+        hashed = self.multipliers * np.asarray(keys, dtype=np.uint64)[np.newaxis, :] # Wraps modulo 2^64
+        return ((hashed >> np.uint64(32)) % np.uint64(self.width)).astype(np.int64)
+
+    def add(self, keys, counts):
+        """
+        Count frames of keys.
+        :param keys: uint64 array of hashed keys.
+        :param counts: Frames of every key.
+        """
+        counts = np.asarray(counts, dtype=np.int64)
+        columns = self._columns(keys)
+        for row in range(len(self.counts)):
+            np.add.at(self.counts[row], columns[row], counts)
+        self.total += int(counts.sum())
+
+    def estimate(self, keys):
+        """
+        Estimated frames of keys.
+        """
+        columns = self._columns(keys)
+        return np.min(self.counts[np.arange(len(self.counts))[:, np.newaxis], columns], axis=0)
+
+    def merge(self, other):
+        """
+        Add the counts of a sketch with the same width, depth and seed (e.g. of another capture).
+        """
+        self.counts += other.counts
+        self.total += other.total
+        return self
+
+
+class BreakdownTable:
+    """
+    Aggregates of the frames per key (a TA/RA pair or a BSSID) for at most capacity keys, in numpy rows
+    found through a hash index. Once full, a new key replaces the tracked key with the fewest frames when
+    the sketch estimates more frames for it (heavy hitters stay tracked), and the frames of the keys that
+    are not tracked are added to the other row, so totals stay exact with bounded memory.
+    """
+    def __init__(self, names, capacity=DEFAULT_CAPACITY):
+        """
+        :param names: Key columns, ('ta', 'ra') or ('bssid',).
+        """
+        self.names = names
+        self.capacity = capacity
+        self.index = {} # Key: row
+        self.keys = [None] * capacity # Row: key
+        self.counters = np.zeros((capacity + 1, len(COUNTERS)), dtype=np.float64) # Last row: other keys
+        self.mcs = np.zeros((capacity + 1, MCS_BINS), dtype=np.int64)
+        self.rate_min = np.full(capacity + 1, np.inf)
+        self.rate_max = np.zeros(capacity + 1)
+        self.sketch = CountMinSketch()
+        self.evicted = 0 # Keys replaced by heavier ones
+
+    def __len__(self):
+        return len(self.index)
+
+    @property
+    def other(self):
+        return self.capacity
+
+    def _key(self, values):
+        return values[0] if len(values) == 1 else tuple(values)
+
+    def _hashes(self, keys):
+        keys = np.asarray(keys, dtype=np.uint64).reshape(len(keys), -1)
+        hashed = keys[:, 0].copy()
+        for column in range(1, keys.shape[1]):
+            hashed = hashed * np.uint64(0x100000001b3) ^ keys[:, column] # Wraps modulo 2^64
+        return hashed
+
+    def update(self, batch, present):
+        """
+        Aggregate the frames of a batch that have every key column.
+        :param present: Boolean mask of the frames to aggregate.
+        """
+        for name in self.names:
+            present = present & batch.valid[name]
+        if not present.any():
+            return
+        batch = batch.select(present)
+        values, groups = unique_rows([batch[name] for name in self.names])
+        counters, mcs, rate_min, rate_max = group_aggregates(groups, len(values), batch)
+        self.sketch.add(self._hashes(values), counters[:, 0])
+
+        keys = [self._key(value) for value in values.tolist()]
+        rows = np.array([self.index.get(key, -1) for key in keys], dtype=np.int64)
+        known = np.flatnonzero(rows >= 0)
+        self._add(rows[known], counters[known], mcs[known], rate_min[known], rate_max[known])
+        new = np.flatnonzero(rows < 0)
+        if len(new):
+            rows = self._admit([keys[position] for position in new.tolist()], values[new])
+            self._add(rows, counters[new], mcs[new], rate_min[new], rate_max[new])
+
+    def _add(self, rows, counters, mcs, rate_min, rate_max):
+        # Rows of tracked keys are distinct, the other row gets the sum of the untracked keys
+        np.add.at(self.counters, rows, counters)
+        np.add.at(self.mcs, rows, mcs)
+        np.minimum.at(self.rate_min, rows, rate_min)
+        np.maximum.at(self.rate_max, rows, rate_max)
+
+    def _admit(self, keys, values):
+        """
+        Rows of new keys: free rows while there are some, then the rows of the lightest tracked keys.
+        :return: Array of rows, the other row for the keys that are not tracked.
+        """
+        rows = np.full(len(keys), self.other, dtype=np.int64)
+        order = np.arange(len(keys))
+        free = self.capacity - len(self.index)
+        if len(keys) > free:
+            # Heaviest new keys first, by their sketch estimate (this batch included)
+            estimates = self.sketch.estimate(self._hashes(values))
+            order = np.argsort(-estimates, kind='stable')
+        frames = self.counters[:self.capacity, 0].copy()
+        for position, key_position in enumerate(order.tolist()):
+            if position < free:
+                row = len(self.index)
+            else:
+                row = self._replace(int(estimates[key_position]), frames)
+                if row is None:
+                    break
+            frames[row] = np.inf # Admitted in this batch, not replaced again
+            self.index[keys[key_position]] = row
+            self.keys[row] = keys[key_position]
+            rows[key_position] = row
+        return rows
+
+    def _replace(self, estimate, frames):
+        """
+        Free the row of the tracked key with the fewest frames if a new key is estimated to have more.
+        Its aggregates move to the other row.
+        :param frames: Frames of every row, inf for the rows that cannot be replaced.
+        :return: Freed row or None.
+        """
+        row = int(np.argmin(frames))
+        if estimate <= frames[row]:
+            return None
+        other = self.other
+        self.counters[other] += self.counters[row]
+        self.mcs[other] += self.mcs[row]
+        self.rate_min[other] = min(self.rate_min[other], self.rate_min[row])
+        self.rate_max[other] = max(self.rate_max[other], self.rate_max[row])
+        self.counters[row] = 0
+        self.mcs[row] = 0
+        self.rate_min[row] = np.inf
+        self.rate_max[row] = 0
+        del self.index[self.keys[row]]
+        self.evicted += 1
+        return row
+
+    def stats(self, row):
+        """
+        Metrics of a row.
+        :return: Dictionary of the counters, data rate (average, min, max in Mbps, None without data frames),
+                 retry rate, average PHY gap and signal (None without values), airtime (seconds) and MCS histogram.
+        """
+        values = dict(zip(COUNTERS, self.counters[row].tolist()))
+        data = values['data_frames']
+        return {
+            'frames': int(values['frames']), 'data_frames': int(data), 'retry_frames': int(values['retry_frames']),
+            'bytes': int(values['bytes']), 'airtime': values['airtime'] / 1e6,
+            'avg_rate': values['rate_sum'] / data if data else None,
+            'min_rate': float(self.rate_min[row]) if data else None,
+            'max_rate': float(self.rate_max[row]) if data else None,
+            'retry_rate': values['retry_frames'] / data if data else None,
+            'phy_gap': values['phy_gap_sum'] / values['phy_gap_frames'] if values['phy_gap_frames'] else None,
+            'signal_dbm': values['signal_sum'] / values['signal_frames'] if values['signal_frames'] else None,
+            'mcs': self.mcs[row].tolist(),
+        }
+
+    def top(self, k, score):
+        """
+        The k tracked keys with the highest score, with a bounded heap.
+        :param score: Callable of the metrics of a key returning a sortable score, None to skip the key.
+        :return: List of (key, metrics) tuples, highest score first.
+        """
+        scored = ((score(metrics), key, metrics) for key, metrics in self.items())
+        best = heapq.nlargest(k, (item for item in scored if item[0] is not None), key=lambda item: item[0])
+        return [(key, metrics) for _, key, metrics in best]
+
+    def items(self):
+        """
+        Yields (key, metrics) of every tracked key.
+        """
+        for key, row in self.index.items():
+            yield key, self.stats(row)
+
+    def format_key(self, key):
+        parts = key if isinstance(key, tuple) else (key,)
+        return ' > '.join(FrameBatch.int_to_mac(part) for part in parts)
+
+
+def unique_rows(columns):
+    """
+    Distinct rows of integer columns, faster than np.unique(axis=0): the columns are replaced by the index
+    of their distinct values and combined into one int64 code.
+    :return: Tuple (distinct rows as an array (count, len(columns)), row of every frame).
+    """
+    code = np.zeros(len(columns[0]), dtype=np.int64)
+    distinct = []
+    for column in columns:
+        values, inverse = np.unique(column, return_inverse=True)
+        code = code * len(values) + inverse.reshape(-1)
+        distinct.append(values)
+    codes, groups = np.unique(code, return_inverse=True)
+    rows = np.empty((len(codes), len(columns)), dtype=columns[0].dtype)
+    for position in reversed(range(len(columns))):
+        codes, index = np.divmod(codes, len(distinct[position]))
+        rows[:, position] = distinct[position][index]
+    return rows, groups.reshape(-1)
+
+
+def group_aggregates(groups, count, batch):
+    """
+    Vectorized aggregates of groups of frames.
+    :param groups: Group of every frame of the batch, from 0 to count - 1.
+    :return: Tuple (counters array (count, len(COUNTERS)), MCS histograms (count, MCS_BINS),
+             minimum and maximum data rate of the data frames (inf and 0 without data frames)).
+    """
+    valid = batch.valid
+    data = valid['mcs_index']
+    rate = np.where(valid['data_rate'], batch['data_rate'], 0).astype(np.float64)
+    phy_gap = data & valid['phy_gap']
+    signal = valid['signal_dbm']
+    counters = np.stack([
+        np.bincount(groups, minlength=count),
+        np.bincount(groups, weights=data, minlength=count),
+        np.bincount(groups, weights=data & batch['fc_retry'], minlength=count),
+        np.bincount(groups, weights=np.where(valid['length'], batch['length'], 0), minlength=count),
+        np.bincount(groups, weights=np.where(valid['duration'], batch['duration'], 0), minlength=count),
+        np.bincount(groups, weights=np.where(data, rate, 0), minlength=count),
+        np.bincount(groups, weights=np.where(phy_gap, batch['phy_gap'], 0), minlength=count),
+        np.bincount(groups, weights=phy_gap, minlength=count),
+        np.bincount(groups, weights=np.where(signal, batch['signal_dbm'], 0), minlength=count),
+        np.bincount(groups, weights=signal, minlength=count),
+    ], axis=1).astype(np.float64)
+    with_mcs = data & valid['mcs'] & (batch['mcs'] < MCS_BINS)
+    mcs = np.bincount(groups[with_mcs] * MCS_BINS + batch['mcs'][with_mcs], minlength=count * MCS_BINS).reshape(count, MCS_BINS)
+    rate_min = np.full(count, np.inf)
+    rate_max = np.zeros(count)
+    np.minimum.at(rate_min, groups[data], rate[data])
+    np.maximum.at(rate_max, groups[data], rate[data])
+    return counters, mcs, rate_min, rate_max
+
+
+class StationBreakdown:
+    """
+    StationBreakdown.py
+    Single pass per station (TA/RA pair) and per BSSID breakdown of a capture: frames, retries, data rate,
+    MCS histogram, PHY gap and airtime of every key, with top talkers and worst stations.
+    Memory is bounded by the capacity of the tables whatever the number of stations.
+    """
+    def __init__(self, capacity=DEFAULT_CAPACITY, top=DEFAULT_TOP):
+        """
+        :param capacity: Keys tracked exactly per table (pairs and BSSIDs).
+        :param top: Keys listed in the report text.
+        """
+        self.pairs = BreakdownTable(('ta', 'ra'), capacity)
+        self.bssids = BreakdownTable(('bssid',), capacity)
+        self.k = top
+
+    columns = COLUMNS
+
+    def update(self, batch, selected=None):
+        """
+        Aggregate a batch of frames.
+        :param batch: FrameBatch with at least the breakdown COLUMNS.
+        :param selected: Boolean mask of the frames to aggregate (None for all).
+        """
+        present = np.ones(len(batch), dtype=np.bool_) if selected is None else selected
+        self.pairs.update(batch, present)
+        self.bssids.update(batch, present)
+
+    def top_talkers(self, table, k=None):
+        """
+        Keys with the most airtime (then frames).
+        """
+        return table.top(k or self.k, lambda metrics: (metrics['airtime'], metrics['frames']))
+
+    def worst_stations(self, k=None):
+        """
+        TA/RA pairs with the highest retry rate (then lowest average data rate), among those with MIN_DATA_FRAMES data frames.
+        """
+        return self.pairs.top(k or self.k, lambda metrics: (metrics['retry_rate'], -metrics['avg_rate'])
+                              if metrics['data_frames'] >= MIN_DATA_FRAMES else None)
+
+    def rows(self):
+        """
+        Yields the metrics of every tracked key (most frames first), then of the other keys, as flat tuples
+        in the order of row_names().
+        """
+        for kind, table in (('pair', self.pairs), ('bssid', self.bssids)):
+            entries = sorted(table.items(), key=lambda item: -item[1]['frames'])
+            entries.append(('other', table.stats(table.other)))
+            for key, metrics in entries:
+                if key == 'other' and not metrics['frames']:
+                    continue
+                parts = table.format_key(key).split(' > ') if key != 'other' else [key]
+                values = tuple('' if value is None else round(value, 6) if isinstance(value, float) else value
+                               for value in (metrics[name] for name in METRICS))
+                yield (kind, parts[0], parts[1] if len(parts) > 1 else '') + values + tuple(metrics['mcs'])
+
+    def row_names(self):
+        return ('kind', 'ta_or_bssid', 'ra') + METRICS + tuple(f"mcs{index}" for index in range(MCS_BINS))
+
+    def get_text(self):
+        """
+        Text of the top talkers and worst stations, in the layout of doctor.get_text_from_metrics.
+        """
+        text = [f"\n\nStations: {len(self.pairs)} TA/RA pairs, {len(self.bssids)} BSSIDs tracked"]
+        if self.pairs.evicted or self.bssids.evicted:
+            text.append(f" ({self.pairs.evicted + self.bssids.evicted} light keys replaced, counted as other)")
+        sections = ((f"Top {self.k} talkers by airtime (TA > RA)", self.pairs, self.top_talkers(self.pairs)),
+                    (f"Top {self.k} BSSIDs by airtime", self.bssids, self.top_talkers(self.bssids)),
+                    (f"Worst {self.k} stations by retry rate (TA > RA, {MIN_DATA_FRAMES}+ data frames)", self.pairs, self.worst_stations()))
+        for title, table, entries in sections:
+            text.append(f"\n|{title}:")
+            if not entries:
+                text.append("\n|    No data")
+            for key, metrics in entries:
+                text.append(f"\n|  {table.format_key(key)}")
+                text.append(self._text(metrics, "|      "))
+        text.append(f"\n\n{'-'*80}")
+        return ''.join(text)
+
+    @staticmethod
+    def _text(metrics, indent):
+        text = f"\n{indent}Frames: {metrics['frames']} ({metrics['data_frames']} data), airtime {metrics['airtime']:.3f} s"
+        if metrics['data_frames']:
+            text += (f"\n{indent}Data rate: {metrics['avg_rate']:.2f} Mbps ({metrics['min_rate']:.1f} - {metrics['max_rate']:.1f}),"
+                     f" retry rate {(metrics['retry_rate'] * 100):.2f} %")
+            used = [f"{mcs}:{count}" for mcs, count in enumerate(metrics['mcs']) if count]
+            if used:
+                text += f"\n{indent}MCS: {' '.join(used)}"
+        if metrics['phy_gap'] is not None:
+            text += f"\n{indent}PHY gap: {metrics['phy_gap']:.2f}"
+        return text
@@ -0,0 +1,278 @@
+from collections import deque
+import numpy as np
+import FrameBatch
+
+# Columns read by the aggregator (plus the key column)
+COLUMNS = ('timestamp', 'length', 'type_subtype', 'fc_retry', 'duration', 'signal_dbm')
+# Columns frames can be grouped by
+KEYS = ('bssid', 'ta')
+# 802.11 frame type of data frames (fc_type_subtype is type << 4 | subtype)
+DATA_FRAME_TYPE = 2
+# Counters of a window
+COUNTERS = ('frames', 'data_frames', 'retry_frames', 'bytes', 'goodput_bytes', 'airtime')
+# Signal strength histogram, one bin per dBm from SIGNAL_MIN to 0
+SIGNAL_MIN = -128
+SIGNAL_BINS = 1 - SIGNAL_MIN
+PERCENTILES = (10, 50, 90)
+TOP_KEYS = 5 # Keys listed in the report text
+
+
+class WindowStats:
+    """
+    Counters and signal histogram of the frames of a window, added together with add().
+    """
+    __slots__ = ('counters', 'signal')
+
+    def __init__(self):
+        self.counters = np.zeros(len(COUNTERS), dtype=np.int64)
+        self.signal = np.zeros(SIGNAL_BINS, dtype=np.int64)
+
+    def add(self, other):
+        self.counters += other.counters
+        self.signal += other.signal
+        return self
+
+    def percentile(self, q):
+        """
+        Signal strength percentile (dBm) or None without signal.
+        """
+        total = int(self.signal.sum())
+        if total == 0:
+            return None
+        cumulative = np.cumsum(self.signal)
+        return int(np.searchsorted(cumulative, q / 100 * total)) + SIGNAL_MIN
+
+    def summary(self, seconds):
+        """
+        Metrics of the window.
+        :param seconds: Length of the window.
+        :return: Dictionary of the counters, airtime (fraction of the window), goodput and throughput (Mbps),
+                 retry rate (None without data frames) and signal percentiles (dBm, None without signal).
+        """
+        values = dict(zip(COUNTERS, self.counters.tolist()))
+        values['airtime'] = values['airtime'] / 1e6 / seconds # Microseconds
+        values['goodput'] = values['goodput_bytes'] * 8 / seconds / 1e6
+        values['throughput'] = values['bytes'] * 8 / seconds / 1e6
+        values['retry_rate'] = values['retry_frames'] / values['data_frames'] if values['data_frames'] else None
+        for q in PERCENTILES:
+            values[f"signal_p{q}"] = self.percentile(q)
+        return values
+
+
+def group_stats(groups, count, batch):
+    """
+    Vectorized WindowStats of groups of frames.
+    :param groups: Group of every frame of the batch, from 0 to count - 1.
+    :param batch: FrameBatch with the aggregator COLUMNS.
+    :return: Tuple (counters array (count, len(COUNTERS)), signal histograms array (count, SIGNAL_BINS)).
+    """
+    valid = batch.valid
+    data = valid['type_subtype'] & ((batch['type_subtype'] >> 4) == DATA_FRAME_TYPE)
+    retry = data & batch['fc_retry']
+    length = batch['length'].astype(np.int64)
+    counters = np.stack([
+        np.bincount(groups, minlength=count),
+        np.bincount(groups, weights=data, minlength=count),
+        np.bincount(groups, weights=retry, minlength=count),
+        np.bincount(groups, weights=length, minlength=count),
+        np.bincount(groups, weights=np.where(data & ~retry, length, 0), minlength=count), # Delivered the first time
+        np.bincount(groups, weights=np.where(valid['duration'], batch['duration'], 0), minlength=count),
+    ], axis=1).astype(np.int64)
+    signal = valid['signal_dbm']
+    bins = np.clip(batch['signal_dbm'][signal].astype(np.int64), SIGNAL_MIN, 0) - SIGNAL_MIN
+    histograms = np.bincount(groups[signal] * SIGNAL_BINS + bins, minlength=count * SIGNAL_BINS).reshape(count, SIGNAL_BINS)
+    return counters, histograms
+
+
+class WindowAggregator:
+    """
+    WindowAggregator.py
+    Time-windowed metrics keyed on the capture timestamps of the frames.
+    Frames are counted in panes of `slide` seconds kept for `history` seconds, a window is the sum of the last
+    width / slide panes: tumbling windows when slide equals width, sliding windows when it is smaller.
+    Every pane holds airtime, goodput, retry and signal histogram counters, in total and per BSSID or TA.
+    """
+    def __init__(self, width=1.0, slide=None, key=None, history=None):
+        """
+        :param width: Length of a window (seconds), e.g. 0.1, 1 or 10.
+        :param slide: Seconds between the start of two windows (default: width, tumbling windows).
+        :param key: Also aggregate per value of this column, 'bssid' or 'ta' (None for totals only).
+        :param history: Seconds of panes kept before the newest one, whether or not they hold frames (None to keep every pane).
+        """
+        if key is not None and key not in KEYS:
+            raise ValueError(f"Unknown key: {key} (expected one of {', '.join(KEYS)})")
+        self.width = width
+        self.slide = slide or width
+        self.panes = max(1, int(round(width / self.slide))) # Panes per window
+        self.key = key
+        # Panes kept, counted from the newest pane index
+        self.history = None if history is None else max(int(round(history / self.slide)), self.panes)
+        self.buckets = deque() # [pane index, WindowStats, {key: WindowStats}], panes without frames are not stored
+        self.late_frames = 0 # Frames older than the history, not counted
+        self.untimed_frames = 0 # Frames without timestamp before any timestamped frame, not counted
+
+    @property
+    def columns(self):
+        """
+        Columns read by update().
+        """
+        return COLUMNS + ((self.key,) if self.key else ())
+
+    def update(self, batch, selected=None):
+        """
+        Count a batch of frames in the panes they were captured in.
+        :param batch: FrameBatch with at least the aggregator columns.
+        :param selected: Boolean mask of the frames to count (None for all), e.g. MetricsEngine.address_mask.
+        """
+        if selected is not None:
+            batch = batch.select(selected)
+        if len(batch) == 0:
+            return
+        # Frames without timestamp (simple packet blocks) belong to the latest pane,
+        # or to the pane of the first timestamped frame of the batch when there is no pane yet
+        timed = batch.valid['timestamp']
+        if not self.buckets:
+            if not timed.any():
+                self.untimed_frames += len(batch)
+                return
+            latest = np.floor(batch['timestamp'][np.argmax(timed)] / self.slide)
+        else:
+            latest = self.buckets[-1][0]
+        panes = np.where(timed, np.floor(batch['timestamp'] / self.slide), latest).astype(np.int64)
+        indexes, groups = np.unique(panes, return_inverse=True)
+        counters, histograms = group_stats(groups, len(indexes), batch)
+        buckets = [self._bucket(index) for index in indexes.tolist()]
+        for position, bucket in enumerate(buckets):
+            if bucket is None:
+                self.late_frames += int(counters[position, 0])
+                continue
+            bucket[1].counters += counters[position]
+            bucket[1].signal += histograms[position]
+
+        if self.key is None:
+            return
+        keyed = batch.valid[self.key]
+        if not keyed.any():
+            return
+        pairs, groups = np.unique(np.stack([groups[keyed], batch[self.key][keyed].astype(np.int64)], axis=1),
+                                  axis=0, return_inverse=True)
+        groups = groups.reshape(-1) # Flat on every numpy version
+        counters, histograms = group_stats(groups, len(pairs), batch.select(keyed))
+        for (position, key), pair_counters, histogram in zip(pairs.tolist(), counters, histograms):
+            bucket = buckets[position]
+            if bucket is None:
+                continue
+            stats = bucket[2].get(key)
+            if stats is None:
+                stats = bucket[2][key] = WindowStats()
+            stats.counters += pair_counters
+            stats.signal += histogram
+
+    def _bucket(self, index):
+        """
+        Pane of an index, created if needed.
+        :return: Bucket list or None if the pane is older than the history.
+        """
+        if not self.buckets or index > self.buckets[-1][0]:
+            self.buckets.append([index, WindowStats(), {}])
+            # Panes of more than history seconds before the new one are dropped, however many hold frames
+            if self.history is not None:
+                while self.buckets[0][0] <= index - self.history:
+                    self.buckets.popleft()
+            return self.buckets[-1]
+        if self.history is not None and index <= self.buckets[-1][0] - self.history:
+            return None
+        # Frames slightly out of order, search from the newest pane
+        position = len(self.buckets)
+        while position > 0 and self.buckets[position - 1][0] >= index:
+            position -= 1
+            if self.buckets[position][0] == index:
+                return self.buckets[position]
+        self.buckets.insert(position, [index, WindowStats(), {}])
+        return self.buckets[position]
+
+    def current(self):
+        """
+        Window ending with the newest pane.
+        :return: Tuple (WindowStats, dictionary of key to WindowStats).
+        """
+        stats, keys = WindowStats(), {}
+        if self.buckets:
+            start = self.buckets[-1][0] - self.panes
+            for index, pane, pane_keys in reversed(self.buckets):
+                if index <= start:
+                    break
+                self._add(stats, keys, pane, pane_keys)
+        return stats, keys
+
+    def windows(self):
+        """
+        Yields the windows ending with every kept pane, oldest first, as tuples
+        (start time, end time, WindowStats, dictionary of key to WindowStats). Panes without frames are skipped.
+        """
+        window = deque()
+        for bucket in self.buckets:
+            window.append(bucket)
+            while window[0][0] <= bucket[0] - self.panes:
+                window.popleft()
+            stats, keys = WindowStats(), {}
+            for _, pane, pane_keys in window:
+                self._add(stats, keys, pane, pane_keys)
+            end = (bucket[0] + 1) * self.slide
+            yield end - self.width, end, stats, keys
+
+    @staticmethod
+    def _add(stats, keys, pane, pane_keys):
+        stats.add(pane)
+        for key, key_stats in pane_keys.items():
+            if key not in keys:
+                keys[key] = WindowStats()
+            keys[key].add(key_stats)
+
+    def rows(self):
+        """
+        Yields the metrics of windows() as flat tuples, in the order of row_names().
+        """
+        for start, end, stats, keys in self.windows():
+            yield (round(start, 6), round(end, 6), '') + tuple(stats.summary(self.width).values())
+            for key in sorted(keys):
+                yield (round(start, 6), round(end, 6), FrameBatch.int_to_mac(key)) + tuple(keys[key].summary(self.width).values())
+
+    def row_names(self):
+        return ('start', 'end', self.key or 'key') + tuple(WindowStats().summary(self.width))
+
+    def get_text(self):
+        """
+        Text of the current window, in the layout of doctor.get_text_from_metrics.
+        """
+        stats, keys = self.current()
+        kind = f"sliding every {self.slide:g} s" if self.panes > 1 else "tumbling"
+        text = [f"\n\nLast {self.width:g} s window ({kind}):"]
+        text.append(self._text(stats.summary(self.width), "|    "))
+        if keys:
+            text.append(f"\n|By {self.key.upper()} (top {TOP_KEYS} by airtime):")
+            top = sorted(keys.items(), key=lambda item: (-item[1].counters[5], -item[1].counters[0], item[0]))[:TOP_KEYS]
+            for key, key_stats in top:
+                text.append(f"\n|  {FrameBatch.int_to_mac(key)}")
+                text.append(self._text(key_stats.summary(self.width), "|      "))
+        if self.late_frames:
+            text.append(f"\n|    Late frames: {self.late_frames}")
+        if self.untimed_frames:
+            text.append(f"\n|    Frames without timestamp: {self.untimed_frames}")
+        text.append(f"\n\n{'-'*80}")
+        return ''.join(text)
+
+    @staticmethod
+    def _text(summary, indent):
+        text = [f"\n{indent}Frames: {summary['frames']} ({summary['data_frames']} data)"]
+        text.append(f"\n{indent}Airtime: {(summary['airtime'] * 100):.2f} %")
+        text.append(f"\n{indent}Goodput: {summary['goodput']:.2f} Mbps")
+        if summary['retry_rate'] is not None:
+            text.append(f"\n{indent}Retry rate: {(summary['retry_rate'] * 100):.2f} %")
+        else:
+            text.append(f"\n{indent}Retry rate: -- %")
+        if summary['signal_p50'] is not None:
+            text.append(f"\n{indent}Signal p10/p50/p90: " + ' / '.join(str(summary[f"signal_p{q}"]) for q in PERCENTILES) + " dBm")
+        else:
+            text.append(f"\n{indent}Signal p10/p50/p90: -- dBm")
+        return ''.join(text)
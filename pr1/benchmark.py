@@ -0,0 +1,363 @@
+import PcapReader, MetricsEngine, DensityTracker, synthetic
+from doctor import get_text_from_metrics, write_report, update_performance, new_visualization_data, sample_visualization
+from concurrent.futures import ProcessPoolExecutor
+import argparse, json, multiprocessing, os, platform, statistics, subprocess, tempfile
+import time, sys
+
+# Stages timed by every run
+STAGES = ('read', 'extraction', 'density', 'monitor_analysis', 'rendering')
+PIPELINES = ('packets', 'batches')
+BUNDLED_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'pcap')
+DEFAULT_SYNTHETIC = (10000, 100000) # Frames of the default synthetic captures
+DEFAULT_WORKDIR = os.path.join(tempfile.gettempdir(), 'doctor_benchmark')
+CHUNK_PACKETS = 4096 # Packets read before the next stage runs on them
+ENTRIES_PER_STEP = 5 # Visualization sampling of doctor.process_packets
+DOCTOR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'doctor.py')
+# Modules each startup command must not import (the native run needs numpy)
+HEAVY_MODULES = ('numpy', 'pyshark', 'matplotlib', 'pandas')
+STARTUP_HEAVY = {'import': HEAVY_MODULES, 'help': HEAVY_MODULES, 'native_run': ('pyshark', 'matplotlib', 'pandas')}
+
+"""
+Benchmark runs (executed in a fresh process each)
+"""
+def peak_rss_mb():
+    """
+    Peak resident set size of the process in MB, None where the resource module is not available.
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024 # Bytes on macOS, KB elsewhere
+
+def render(name, output_dir, text, visualization_data, plot):
+    """
+    Rendering stage: the report and time series files of a headless run, and one figure drawn off screen.
+    """
+    write_report(os.path.join(output_dir, name), text, visualization_data, ENTRIES_PER_STEP)
+    if plot and visualization_data is not None:
+        import matplotlib
+        matplotlib.use('Agg')
+        import LiveRenderer
+        renderer = LiveRenderer.LiveRenderer()
+        renderer.update(visualization_data, lambda: text, force=True)
+        renderer.plt.close(renderer.figure)
+
+def run_packets(file_path, backend, limit, output_dir, plot):
+    """
+    Per packet pipeline of doctor.process_packets, packets are processed in chunks so every stage is timed on its own.
+    :return: Tuple (frames, dropped frames, stage seconds).
+    """
+    clock = time.perf_counter
+    seconds = dict.fromkeys(STAGES, 0.0)
+    reader = PcapReader.PcapReader(file_path, backend)
+    density = DensityTracker.DensityTracker()
+    performance_monitor_data = MetricsEngine.new_performance_monitor_data()
+    performance_analysis_data = MetricsEngine.new_performance_analysis_data()
+    visualization_data = new_visualization_data()
+    frames = dropped = 0
+    get_ts = ENTRIES_PER_STEP
+    end = False # The reader reopens the capture when read again after its end
+    try:
+        while frames != limit and not end:
+            start = clock()
+            packets = []
+            while len(packets) < CHUNK_PACKETS and frames + len(packets) != limit:
+                packet = reader.read_next_packet()
+                if packet is None:
+                    end = True
+                    break
+                packets.append(packet)
+            if not packets:
+                break
+            frames += len(packets)
+            read = clock()
+
+            infos = []
+            for packet in packets:
+                try:
+                    infos.append(reader.get_80211_info(packet))
+                except ValueError:
+                    dropped += 1 # Not an 802.11 packet
+            extracted = clock()
+
+            for info in infos:
+                if info.get('bssid') and info.get('signal_dbm') and info.get('channel'):
+                    density.update(info['bssid'], info['signal_dbm'], info['channel'], info.get('bandwidth_mhz'), info.get('frequency'))
+            accounted = clock()
+
+            for info in infos:
+                sample = update_performance(info, performance_monitor_data, performance_analysis_data)
+                get_ts -= 1
+                if get_ts == 0 or len(visualization_data['phy']) == 0:
+                    sample_visualization(visualization_data, performance_monitor_data, *sample)
+                    get_ts = ENTRIES_PER_STEP
+            measured = clock()
+
+            seconds['read'] += read - start
+            seconds['extraction'] += extracted - read
+            seconds['density'] += accounted - extracted
+            seconds['monitor_analysis'] += measured - accounted
+    finally:
+        reader.close()
+
+    start = clock()
+    text = get_text_from_metrics(density.get_density_metrics(), performance_monitor_data, performance_analysis_data, time.time(), frames)
+    render(f"{os.path.basename(file_path)}_{backend}_packets", output_dir, text, visualization_data, plot)
+    seconds['rendering'] = clock() - start
+    return frames, dropped, seconds
+
+def run_batches(file_path, backend, limit, output_dir, batch_size):
+    """
+    Column batch pipeline of doctor.process_batches. The decoders read and extract in one pass,
+    so the read time is part of the extraction stage.
+    :return: Tuple (frames, dropped frames, stage seconds).
+    """
+    clock = time.perf_counter
+    seconds = dict.fromkeys(STAGES, 0.0)
+    seconds['read'] = None
+    reader = PcapReader.PcapReader(file_path, backend, use_mmap=backend == 'native')
+    density = DensityTracker.DensityTracker()
+    engine = MetricsEngine.MetricsEngine()
+    frames = 0
+    batches = reader.read_batches(batch_size, set(MetricsEngine.COLUMNS) | set(DensityTracker.COLUMNS))
+    try:
+        while frames != limit:
+            start = clock()
+            batch = next(batches, None)
+            if batch is None:
+                break
+            if limit > -1 and frames + len(batch) > limit:
+                batch = batch.select(slice(0, limit - frames))
+            frames += len(batch)
+            extracted = clock()
+            density.update_batch(batch)
+            accounted = clock()
+            engine.update(batch)
+            measured = clock()
+
+            seconds['extraction'] += extracted - start
+            seconds['density'] += accounted - extracted
+            seconds['monitor_analysis'] += measured - accounted
+    finally:
+        batches.close()
+        reader.close()
+
+    start = clock()
+    text = get_text_from_metrics(density.get_density_metrics(), engine.performance_monitor_data, engine.performance_analysis_data, time.time(), frames)
+    render(f"{os.path.basename(file_path)}_{backend}_batches", output_dir, text, None, False)
+    seconds['rendering'] = clock() - start
+    return frames, 0, seconds
+
+def run_case(case):
+    """
+    Worker: time one pipeline on one capture.
+    :param case: Dictionary with capture, backend, pipeline, limit, output_dir, batch_size and plot.
+    :return: Result dictionary of the run.
+    """
+    start = time.perf_counter()
+    if case['pipeline'] == 'packets':
+        frames, dropped, seconds = run_packets(case['capture'], case['backend'], case['limit'], case['output_dir'], case['plot'])
+    else:
+        frames, dropped, seconds = run_batches(case['capture'], case['backend'], case['limit'], case['output_dir'], case['batch_size'])
+    total = time.perf_counter() - start
+    peak = peak_rss_mb()
+
+    stages = {}
+    for stage in STAGES:
+        if seconds[stage] is None:
+            stages[stage] = None
+            continue
+        stages[stage] = {
+            'seconds': round(seconds[stage], 6),
+            'frames_per_second': round(frames / seconds[stage], 1) if seconds[stage] > 0 and stage != 'rendering' else None,
+        }
+    return {
+        'capture': case['capture'], 'bytes': os.path.getsize(case['capture']),
+        'backend': case['backend'], 'pipeline': case['pipeline'],
+        'frames': frames, 'dropped_frames': dropped,
+        'seconds': round(total, 6), 'frames_per_second': round(frames / total, 1) if total > 0 else None,
+        'peak_rss_mb': round(peak, 1) if peak is not None else None, 'stages': stages,
+    }
+
+"""
+Startup benchmark
+"""
+def startup_commands(capture, output_dir):
+    """
+    Interpreter arguments of the timed startup commands: a bare interpreter (reference), importing doctor,
+    doctor.py --help and a headless native run of one frame.
+    """
+    return {
+        'interpreter': ['-c', 'pass'],
+        'import': ['-c', 'import doctor'],
+        'help': [DOCTOR, '--help'],
+        'native_run': [DOCTOR, '-f', capture, '-b', 'native', '-l', '1', '--headless', '-o', os.path.join(output_dir, 'startup')],
+    }
+
+def imported_modules(args):
+    """
+    Top level modules imported by a python command, from the -X importtime trace.
+    """
+    trace = subprocess.run([sys.executable, '-X', 'importtime'] + args, cwd=os.path.dirname(DOCTOR),
+                           stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True).stderr
+    return {line.rsplit('|', 1)[1].strip().split('.')[0] for line in trace.splitlines() if line.startswith('import time:') and '|' in line}
+
+def run_startup(capture, output_dir, repeat=10):
+    """
+    Time the cold start of doctor: every command runs repeat times in a new interpreter.
+    :return: Dictionary of command name to its min and median seconds, seconds over the bare interpreter
+             and the heavy modules it imported (expected to be empty).
+    """
+    results = {}
+    for name, args in startup_commands(capture, output_dir).items():
+        seconds = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            subprocess.run([sys.executable] + args, cwd=os.path.dirname(DOCTOR), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+            seconds.append(time.perf_counter() - start)
+        results[name] = {'min_seconds': round(min(seconds), 4), 'median_seconds': round(statistics.median(seconds), 4)}
+        if name in STARTUP_HEAVY:
+            modules = imported_modules(args)
+            results[name]['heavy_modules'] = [module for module in STARTUP_HEAVY[name] if module in modules]
+    for name, result in results.items():
+        result['overhead_seconds'] = round(result['min_seconds'] - results['interpreter']['min_seconds'], 4)
+    return results
+
+def startup_regressions(results, max_seconds=None):
+    """
+    Regressions of a startup benchmark: heavy modules imported, commands slower than max_seconds over the bare interpreter
+    and command line choices of doctor out of date.
+    :return: List of messages (empty when the startup is as expected).
+    """
+    import doctor, WindowAggregator
+    messages = []
+    # doctor keeps copies of these choices so its command line does not import the pipelines
+    if doctor.BACKENDS != PcapReader.BACKENDS or doctor.WINDOW_KEYS != WindowAggregator.KEYS:
+        messages.append("doctor.BACKENDS or doctor.WINDOW_KEYS differ from PcapReader.BACKENDS or WindowAggregator.KEYS")
+    for name, result in results.items():
+        if result.get('heavy_modules'):
+            messages.append(f"{name} imports {', '.join(result['heavy_modules'])}")
+        if max_seconds is not None and name in ('import', 'help') and result['overhead_seconds'] > max_seconds:
+            messages.append(f"{name} takes {result['overhead_seconds']:.3f} s over the interpreter (limit {max_seconds:.3f} s)")
+    return messages
+
+"""
+Driver
+"""
+def synthetic_capture(workdir, frames, bssids, channels, data_ratio, control_ratio, seed):
+    """
+    Path of a synthetic capture, generated once per set of parameters (generation is deterministic).
+    :return: Tuple (path, seconds spent generating, None if the capture already existed).
+    """
+    mix = '-'.join(f"{channel}x{weight:g}" for channel, weight in channels)
+    name = f"synthetic_{frames}_b{bssids}_c{mix}_d{data_ratio:g}_k{control_ratio:g}_s{seed}.pcapng"
+    path = os.path.join(workdir, name)
+    if os.path.exists(path):
+        return path, None
+    start = time.perf_counter()
+    partial = path + '.part'
+    with open(partial, 'wb', buffering=1024 * 1024) as output:
+        synthetic.generate(output, frames, bssids, channels, data_ratio, control_ratio, seed=seed)
+    os.replace(partial, path) # Never leave a truncated capture behind
+    return path, time.perf_counter() - start
+
+def run(captures, backends, pipelines, limit=-1, batch_size=65536, repeat=1, plot=True, output_dir=None):
+    """
+    Run every pipeline and backend on every capture, each run in a fresh process so peak RSS is its own.
+    :return: List of result dictionaries (with an 'error' entry for the runs that failed).
+    """
+    results = []
+    context = multiprocessing.get_context('spawn')
+    for capture in captures:
+        for backend in backends:
+            for pipeline in pipelines:
+                case = {'capture': capture, 'backend': backend, 'pipeline': pipeline, 'limit': limit,
+                        'output_dir': output_dir, 'batch_size': batch_size, 'plot': plot}
+                for _ in range(repeat):
+                    with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                        try:
+                            result = executor.submit(run_case, case).result()
+                        except Exception as e: # Missing tshark, unreadable capture, ...
+                            result = {'capture': capture, 'backend': backend, 'pipeline': pipeline,
+                                      'error': f"{type(e).__name__}: {e}"}
+                    results.append(result)
+    return results
+
+if __name__ == "__main__":
+    # Get the command line arguments.
+    parser = argparse.ArgumentParser(description="Time the stages of the doctor pipeline on the bundled and synthetic captures.")
+    parser.add_argument("captures", type=str, nargs='*', help="Extra capture files to time.")
+    parser.add_argument("-b", "--backend", type=str, nargs='+', default=['native'], choices=PcapReader.BACKENDS, help="Packet decoders to time (default: native).")
+    parser.add_argument("-p", "--pipeline", type=str, nargs='+', default=list(PIPELINES), choices=PIPELINES, help="Pipelines to time (default: packets batches).")
+    parser.add_argument("--no-bundled", action="store_true", help="Skip the captures of the pcap directory.")
+    parser.add_argument("-n", "--synthetic", type=int, nargs='*', default=list(DEFAULT_SYNTHETIC), help="Frames of the synthetic captures, 10k to 10M (default: 10000 100000).")
+    parser.add_argument("--bssids", type=int, default=synthetic.DEFAULT_BSSIDS, help=f"BSSIDs of the synthetic captures (default: {synthetic.DEFAULT_BSSIDS}).")
+    parser.add_argument("--channels", type=synthetic.parse_channels, default=synthetic.DEFAULT_CHANNELS, help="Channel mix of the synthetic captures, e.g. 1,6,11 or 1:3,36:1 (default: 1,6,11,36,44).")
+    parser.add_argument("--data-ratio", type=float, default=synthetic.DEFAULT_DATA_RATIO, help=f"Fraction of data frames (default: {synthetic.DEFAULT_DATA_RATIO}).")
+    parser.add_argument("--control-ratio", type=float, default=synthetic.DEFAULT_CONTROL_RATIO, help=f"Fraction of control frames (default: {synthetic.DEFAULT_CONTROL_RATIO}).")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the synthetic captures (default: 0).")
+    parser.add_argument("-l", "--limit", type=int, default=-1, help="Frames processed per run (default: -1 for all).")
+    parser.add_argument("--batch-size", type=int, default=65536, help="Batch size of the batches pipeline (default: 65536).")
+    parser.add_argument("--repeat", type=int, default=1, help="Runs of every case (default: 1).")
+    parser.add_argument("--no-plot", action="store_true", help="Do not draw the figure in the rendering stage.")
+    parser.add_argument("--workdir", type=str, default=DEFAULT_WORKDIR, help="Directory of the synthetic captures and reports (default: system temp directory).")
+    parser.add_argument("--startup", action="store_true", help="Time the cold start of doctor.py instead of the stages, exit 1 on a regression.")
+    parser.add_argument("--max-startup", type=float, default=None, help="Seconds over the bare interpreter allowed to import doctor and print --help (default: no limit).")
+    parser.add_argument("-o", "--output", type=str, default="-", help="JSON results file, - for stdout (default: -).")
+
+    # Parse the arguments.
+    args = parser.parse_args()
+    reports = os.path.join(args.workdir, 'reports')
+    os.makedirs(reports, exist_ok=True)
+
+    if args.startup:
+        capture = args.captures[0] if args.captures else os.path.join(BUNDLED_DIR, sorted(os.listdir(BUNDLED_DIR))[0])
+        startup = run_startup(os.path.abspath(capture), reports, max(args.repeat, 5))
+        regressions = startup_regressions(startup, args.max_startup)
+        text = json.dumps({'python': platform.python_version(), 'platform': platform.platform(), 'startup': startup,
+                           'regressions': regressions}, indent=2)
+        if args.output == "-":
+            print(text)
+        else:
+            with open(args.output, 'w') as output:
+                output.write(text + '\n')
+        for message in regressions:
+            print(f"Startup regression: {message}", file=sys.stderr)
+        sys.exit(1 if regressions else 0)
+
+    captures = list(args.captures)
+    if not args.no_bundled:
+        captures += sorted(os.path.join(BUNDLED_DIR, name) for name in os.listdir(BUNDLED_DIR) if name.endswith('.pcapng'))
+    generated = []
+    try:
+        for frames in args.synthetic:
+            path, seconds = synthetic_capture(args.workdir, frames, args.bssids, args.channels, args.data_ratio, args.control_ratio, args.seed)
+            captures.append(path)
+            generated.append({'capture': path, 'frames': frames, 'generate_seconds': round(seconds, 3) if seconds is not None else None})
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        sys.exit(1)
+
+    started = time.strftime('%Y-%m-%dT%H:%M:%S%z')
+    results = run(captures, args.backend, args.pipeline, args.limit, args.batch_size, args.repeat, not args.no_plot, reports)
+    document = {
+        'started': started, 'python': platform.python_version(), 'platform': platform.platform(), 'cpus': os.cpu_count(),
+        'limit': args.limit, 'batch_size': args.batch_size, 'synthetic': generated, 'runs': results,
+    }
+    text = json.dumps(document, indent=2)
+    if args.output == "-":
+        print(text)
+    else:
+        with open(args.output, 'w') as output:
+            output.write(text + '\n')
+        for result in results:
+            name = os.path.basename(result['capture'])
+            if 'error' in result:
+                print(f"{name} {result['backend']} {result['pipeline']}: {result['error']}")
+            else:
+                print(f"{name} {result['backend']} {result['pipeline']}: {result['frames']} frames, "
+                      f"{result['frames_per_second']:.0f} frames/s, peak RSS {result['peak_rss_mb']:.0f} MB")
+
+    sys.exit(0)
@@ -1,12 +1,12 @@
-import PcapReader, pyshark
-import argparse
-import matplotlib.pyplot as plt
-from collections import deque
-import pandas as pd
-import numpy as np
+import argparse, csv, os
 import time, sys
 
 DBG_MODE = False
+# Choices of the command line, as PcapReader.BACKENDS and WindowAggregator.KEYS: the modules of the
+# pipelines (numpy, pyshark, matplotlib) are only imported by the code paths that use them, so --help,
+# argument errors and get_text_from_metrics run on the standard library alone
+BACKENDS = ('pyshark', 'native', 'tshark')
+WINDOW_KEYS = ('bssid', 'ta')
 
 """
 Performance monitoring and analysis subroutine
@@ -125,35 +125,11 @@ def get_text_from_metrics(density_metrics: list, performance_monitor_data: dict,
     text.append(f"\n\nProcessing runtime {(time.time() - start_time):.3f} seconds.")
     return ''.join(text)
 
-def process_packets(reader, i, start_time, src_address=None, dst_address=None, entries_per_step=5):
-    # Initialize variables.
-    bandwidth_dict = {0: 20, 1: 40, 2: 80, 2: 160}
-    ## 1.1 ##
-    data = []
-    density_metrics = []
-
-    ## 1.2 Wi-Fi Network Performance Metrics ##
-    get_ts = entries_per_step
-
-    # Found on various forums and websites
-    # Max threasholds of bad performance ( > thereshold = good performance)
-    BAD_PHY = 5
-    BAD_MCS = 6
-    BAD_BANDWIDTH = 0
-    BAD_SIGNAL = -80
-
-    performance_monitor_data = {
-        # Total values
-        'total_packets': 0, 'retry_packets': 0, 'sum_data_rate': 0, 'max_data_rate': 0, 'min_data_rate': 1000,
-        # Last entries
-        'data_rate_le': deque(maxlen=30), # Limit the number of entries to 30
-    }
-    performance_analysis_data = {
-        # Total values
-        'total': 0, 'discarted': 0, 'phy': 0, 'bandwidth': 0, 'sgi': 0, 'mcs': 0, 'ssi': 0, 'phy_gap': 0
-    }
-
-    visualization_data = {
+def new_visualization_data():
+    """
+    Empty series of the visualization, sampled by process_packets.
+    """
+    return {
         'data_rate': [],
         'phy': [],
         'bandwidth': [],
@@ -161,192 +137,531 @@ def process_packets(reader, i, start_time, src_address=None, dst_address=None, e
         'ssi': [],
         'phy_gap': [],
     }
+
+def sample_visualization(visualization_data, performance_monitor_data, data_rate, phy, bandwidth, short_gi, signal_dbm, phy_gap):
+    """
+    Append a sample to the visualization series: throughput of the monitored packets so far and the values of the last packet.
+    """
+    import numpy as np
+    visualization_data['data_rate'].append((np.mean(performance_monitor_data['data_rate_le'])*(1-performance_monitor_data['retry_packets']/performance_monitor_data['total_packets'])) if len(performance_monitor_data['data_rate_le']) > 0 else 0)
+    visualization_data['phy_gap'].append(phy_gap)
+    visualization_data['phy'].append(phy)
+    visualization_data['bandwidth'].append(bandwidth)
+    visualization_data['sgi'].append(short_gi)
+    visualization_data['ssi'].append(signal_dbm)
+
+def update_performance(info, performance_monitor_data, performance_analysis_data, src_address=None, dst_address=None):
+    """
+    Account a packet in the performance monitor and analysis data of process_packets.
+    :param info: Dictionary returned by PcapReader.get_80211_info.
+    :return: Tuple (data_rate, phy, bandwidth, short_gi, signal_dbm, phy_gap) of the packet, sampled by the visualization.
+    """
+    import MetricsEngine
+    # Max threasholds of bad performance ( > thereshold = good performance)
+    BAD_PHY = MetricsEngine.BAD_PHY
+    BAD_MCS = MetricsEngine.BAD_MCS
+    BAD_BANDWIDTH = MetricsEngine.BAD_BANDWIDTH
+    BAD_SIGNAL = MetricsEngine.BAD_SIGNAL
+
+    data_rate = float(info.get('data_rate')) if info['data_rate'] else 0
+    phy = int(info.get('phy')) if info['phy'] else 0
+    bandwidth = int(info.get('bandwidth')) if info['bandwidth'] else 0
+    short_gi = int(info.get('short_gi')) if info['short_gi'] else 0
+    signal_dbm = int(info.get('signal_dbm')) if info['signal_dbm'] else 0
+    phy_gap = info.get('phy_gap') if info['phy_gap'] else 0
+
+    if (src_address and info['ta'] != src_address) or (dst_address and info['ra'] != dst_address):
+        pass # Not the requested source address
+    else:
+        if info['mcs_index']: # Means it is a data packet (Others have minimal impact)
+            # Monitor
+            performance_monitor_data['retry_packets'] += int(info['fc_retry'])
+            performance_monitor_data['total_packets'] += 1
+            performance_monitor_data['sum_data_rate'] += data_rate
+            performance_monitor_data['max_data_rate'] = max(performance_monitor_data['max_data_rate'], data_rate)
+            performance_monitor_data['min_data_rate'] = min(performance_monitor_data['min_data_rate'], data_rate)
+            # Add to the list of last entries
+            performance_monitor_data['data_rate_le'].append(data_rate)
+
+            # Analysis
+            performance_analysis_data['total'] += 1
+            # Add one to each metric the packet is over the threshold of "good metric"
+            if info['phy']:
+                performance_analysis_data['phy'] += 1 if phy > BAD_PHY else 0
+            if info['bandwidth']:
+                performance_analysis_data['bandwidth'] += 1 if bandwidth > BAD_BANDWIDTH else 0
+            if info['short_gi']:
+                performance_analysis_data['sgi'] += 1 if short_gi else 0
+            if info['mcs_index']:
+                performance_analysis_data['mcs'] += 1 if int(info['mcs_index']) > BAD_MCS else 0
+            if info['signal_dbm']: # Some times not reported
+                performance_analysis_data['ssi'] += 1 if signal_dbm > BAD_SIGNAL else 0
+            if info['phy_gap']:
+                performance_analysis_data['phy_gap'] += phy_gap          
+        else:
+            performance_analysis_data['discarted'] += 1
+
+    return data_rate, phy, bandwidth, short_gi, signal_dbm, phy_gap
+
+def process_packets(reader, i, start_time, src_address=None, dst_address=None, entries_per_step=5, renderer=None, profiler=None):
+    """
+    Process the packets one by one, sampling the visualization data every entries_per_step packets.
+    Packets without wlan or wlan_radio layers are skipped.
+    :param renderer: LiveRenderer drawing the metrics (None for headless runs).
+    :param profiler: Profiler timing the read, extraction, density, metrics and redraw stages (None for no profiling).
+    :return: Tuple (density_metrics, performance_monitor_data, performance_analysis_data, processed_packets, visualization_data).
+    """
+    import MetricsEngine, DensityTracker
+    # Initialize variables.
+    ## 1.1 ##
+    density = DensityTracker.DensityTracker()
+
+    ## 1.2 Wi-Fi Network Performance Metrics ##
+    get_ts = entries_per_step
+
+    performance_monitor_data = MetricsEngine.new_performance_monitor_data()
+    performance_analysis_data = MetricsEngine.new_performance_analysis_data()
+
+    visualization_data = new_visualization_data()
     
     processed_packets = 0
-    plt.figure(1, figsize=(18, 9))
+    get_text = lambda: get_text_from_metrics(density.get_density_metrics(), performance_monitor_data, performance_analysis_data, start_time, processed_packets)
+    t = profiler.clock() if profiler else None # Start of the current stage
     while processed_packets != i:
         if DBG_MODE:
             print(f"\rProcessing packets...\tTotal packets: {processed_packets}", end="")
 
         # Read the next packet.
         packet = reader.read_next_packet()
+        if profiler:
+            t = profiler.add('read', t)
         if packet is None or i == 0:
             break
-        info = reader.get_80211_info(packet)
+        try:
+            info = reader.get_80211_info(packet)
+        except ValueError: # No wlan or wlan_radio layer
+            if profiler:
+                profiler.count('dropped_frames')
+                t = profiler.add('extraction', t)
+            continue
+        if profiler:
+            t = profiler.add('extraction', t)
         processed_packets += 1
         
         ## 1.1 Wi-Fi Network Density ##
         if info.get('bssid') and info.get('signal_dbm') and info.get('channel'):
-            bssid = info['bssid']
-            signal_strength = abs(int(info['signal_dbm']))  # abs ensures positive RSSI
-            channel = int(info['channel'])
-
-            # Check if BSSID is already in the list
-            existing_entry = next((entry for entry in data if entry['BSSID'] == bssid), None)
-            if existing_entry:
-                # Update Signal Strength if the new value is stronger (higher)
-                existing_entry['signal_strength'] = max(existing_entry['signal_strength'], signal_strength)
-            else:
-                # Add new entry if BSSID is not in the list
-                data.append({
-                    'BSSID': bssid,
-                    'signal_strength': signal_strength,
-                    'Channel': channel
-                })
-
-            # Convert the data to a DataFrame
-            df = pd.DataFrame(data)
-
-            # Group data by channel to calculate metrics
-            grouped = df.groupby('Channel').agg(
-                total_signal_strength=('signal_strength', 'sum')  # Sum signal strengths of unique BSSIDs
-            )
-
-            # Compute density as the sum of signal strengths of unique BSSIDs divided by channel bandwidth
-            bandwidth = info.get('bandwidth')
-
-            grouped['density'] = grouped['total_signal_strength'] / (bandwidth_dict[int(info['bandwidth'])] if info['bandwidth'] else 22)
-
-            # Add frequency information to the result
-            grouped['frequency'] = info.get('frequency', 0)  # Get the frequency of the channel
-
-            # Convert to dictionary
-            density_per_channel = grouped[['density', 'frequency']].to_dict(orient='index')
-
-            metrics_per_channel = {
-                'frequency': 0,
-                'density': 0,
-                'classification': ""
-            }
-            
-            density_metrics = []
-            for channel, metrics in density_per_channel.items():
-                metrics_per_channel['frequency'] = metrics['frequency']
-                metrics_per_channel['density'] = metrics['density']
-                if metrics_per_channel['density'] < 8:
-                    metrics_per_channel['classification'] = "Not dense channel"
-                elif metrics_per_channel['density'] < 16:
-                    metrics_per_channel['classification'] = "Moderately dense"
-                elif metrics_per_channel['density'] < 24:
-                    metrics_per_channel['classification'] = "Dense"
-                else:
-                    metrics_per_channel['classification'] = "Very dense"
-
-                density_metrics.append(metrics_per_channel)
+            density.update(info['bssid'], info['signal_dbm'], info['channel'], info.get('bandwidth_mhz'), info.get('frequency'))
+        if profiler:
+            t = profiler.add('density', t)
         ## 1.1 End ##
 
         ## 1.2 Wi-Fi Network Performance ## 
-        data_rate = float(info.get('data_rate')) if info['data_rate'] else 0
-        phy = int(info.get('phy')) if info['phy'] else 0
-        bandwidth = int(info.get('bandwidth')) if info['bandwidth'] else 0
-        short_gi = int(info.get('short_gi')) if info['short_gi'] else 0
-        signal_dbm = int(info.get('signal_dbm')) if info['signal_dbm'] else 0
-        phy_gap = info.get('phy_gap') if info['phy_gap'] else 0
-
-        if (src_address and info['ta'] != src_address) or (dst_address and info['ra'] != dst_address):
-            pass # Not the requested source address
-        else:
-            if info['mcs_index']: # Means it is a data packet (Others have minimal impact)
-                # Monitor
-                performance_monitor_data['retry_packets'] += int(info['fc_retry'])
-                performance_monitor_data['total_packets'] += 1
-                performance_monitor_data['sum_data_rate'] += data_rate
-                performance_monitor_data['max_data_rate'] = max(performance_monitor_data['max_data_rate'], data_rate)
-                performance_monitor_data['min_data_rate'] = min(performance_monitor_data['min_data_rate'], data_rate)
-                # Add to the list of last entries
-                performance_monitor_data['data_rate_le'].append(data_rate)
-
-                # Analysis
-                performance_analysis_data['total'] += 1
-                # Add one to each metric the packet is over the threshold of "good metric"
-                if info['phy']:
-                    performance_analysis_data['phy'] += 1 if phy > BAD_PHY else 0
-                if info['bandwidth']:
-                    performance_analysis_data['bandwidth'] += 1 if bandwidth > BAD_BANDWIDTH else 0
-                if info['short_gi']:
-                    performance_analysis_data['sgi'] += 1 if short_gi else 0
-                if info['mcs_index']:
-                    performance_analysis_data['mcs'] += 1 if int(info['mcs_index']) > BAD_MCS else 0
-                if info['signal_dbm']: # Some times not reported
-                    performance_analysis_data['ssi'] += 1 if signal_dbm > BAD_SIGNAL else 0
-                if info['phy_gap']:
-                    performance_analysis_data['phy_gap'] += phy_gap          
-            else:
-                performance_analysis_data['discarted'] += 1
+        data_rate, phy, bandwidth, short_gi, signal_dbm, phy_gap = update_performance(
+            info, performance_monitor_data, performance_analysis_data, src_address, dst_address)
         ## 1.2 End ##
 
         ## Visualization ##
         get_ts -= 1
         if get_ts == 0 or processed_packets == 1:
-            visualization_data['data_rate'].append((np.mean(performance_monitor_data['data_rate_le'])*(1-performance_monitor_data['retry_packets']/performance_monitor_data['total_packets'])) if len(performance_monitor_data['data_rate_le']) > 0 else 0)
-            visualization_data['phy_gap'].append(phy_gap)
-            visualization_data['phy'].append(phy)
-            visualization_data['bandwidth'].append(bandwidth)
-            visualization_data['sgi'].append(short_gi)
-            visualization_data['ssi'].append(signal_dbm)
-            # Plotting
-            plt.clf()
-            plt.subplot(1,2,1)
-            plt.plot(visualization_data['data_rate'], label="Throughput (Mbps)")
-            plt.plot(visualization_data['phy_gap'], label="PHY Gap")
-            plt.plot(visualization_data['phy'], label="PHY")
-            plt.plot(visualization_data['bandwidth'], label="Bandwidth")
-            plt.plot(visualization_data['sgi'], label="Short GI (0/1)")
-            plt.plot(visualization_data['ssi'], label="Signal Strength (dBm)")
-            plt.xlabel("Time Steps")
-            plt.ylabel("Value")
-            plt.title("Dynamic Network Performance")
-            plt.legend()
-            plt.grid()
-
-            plt.subplot(1,2,2)
-            plt.text(0.01, 0.5, get_text_from_metrics(density_metrics, performance_monitor_data, performance_analysis_data, start_time, processed_packets), 
-                        fontsize=10, ha='left', va='center', family=['monospace'], transform=plt.gca().transAxes)
-            plt.axis('off')
-            
-            plt.pause(0.01)  # Pause to update the plot dynamically
+            sample_visualization(visualization_data, performance_monitor_data, data_rate, phy, bandwidth, short_gi, signal_dbm, phy_gap)
+            if profiler:
+                t = profiler.add('metrics', t)
+            # Plotting, the renderer limits how often the figure is redrawn
+            if renderer and renderer.update(visualization_data, get_text) and profiler:
+                t = profiler.add('redraw', t)
             get_ts = entries_per_step
+        elif profiler:
+            t = profiler.add('metrics', t)
         
     if DBG_MODE:
     ## 1.1 Results ##
         
     ## 1.2 Results ##
-        print(get_text_from_metrics(density_metrics, performance_monitor_data, performance_analysis_data, start_time, processed_packets))
+        print(get_text())
     
     # Keep the last plot open until the user closes it
-    plt.show()  # Keep the figure open
+    if renderer:
+        renderer.show(visualization_data, get_text)
+
+    return density.get_density_metrics(), performance_monitor_data, performance_analysis_data, processed_packets, visualization_data
+
+def write_report(prefix, text, visualization_data=None, entries_per_step=5, aggregator=None, breakdown=None, distributions=None):
+    """
+    Write the metrics report and the visualization time series of a headless run.
+    :param prefix: Output path prefix, files are <prefix>_report.txt and <prefix>_timeseries.csv.
+    :param text: Report text from get_text_from_metrics.
+    :param visualization_data: Sampled series of process_packets (None for no time series).
+    :param aggregator: WindowAggregator whose windows are written to <prefix>_windows.csv (None for none).
+    :param breakdown: StationBreakdown whose stations and BSSIDs are written to <prefix>_stations.csv (None for none).
+    :param distributions: DistributionTracker saved to <prefix>_distributions.json, for merging with other runs (None for none).
+    """
+    with open(f"{prefix}_report.txt", 'w') as report:
+        report.write(text.lstrip('\n') + '\n')
+    if aggregator is not None:
+        with open(f"{prefix}_windows.csv", 'w', newline='') as windows:
+            writer = csv.writer(windows)
+            writer.writerow(aggregator.row_names())
+            writer.writerows(aggregator.rows())
+    if breakdown is not None:
+        with open(f"{prefix}_stations.csv", 'w', newline='') as stations:
+            writer = csv.writer(stations)
+            writer.writerow(breakdown.row_names())
+            writer.writerows(breakdown.rows())
+    if distributions is not None:
+        distributions.save(f"{prefix}_distributions.json")
+    if visualization_data is None:
+        return
+    names = list(visualization_data)
+    with open(f"{prefix}_timeseries.csv", 'w', newline='') as timeseries:
+        writer = csv.writer(timeseries)
+        writer.writerow(['step', 'packet'] + names)
+        for step, row in enumerate(zip(*(visualization_data[name] for name in names))):
+            # First sample is taken on the first packet, then every entries_per_step packets
+            writer.writerow([step, 1 + step * entries_per_step] + list(row))
+
+def process_batches(reader, i, start_time, src_address=None, dst_address=None, batch_size=65536, aggregator=None, profiler=None, breakdown=None,
+                    distributions=None):
+    """
+    Vectorized counterpart of process_packets, reads column batches and computes the metrics with numpy.
+    :param aggregator: WindowAggregator also updated with the selected frames (None for none).
+    :param profiler: Profiler timing the read (with extraction), density, metrics, windows, stations and quantiles stages (None for no profiling).
+    :param breakdown: StationBreakdown also updated with every frame (None for none).
+    :param distributions: QuantileSketch.DistributionTracker also updated with the selected frames (None for none).
+    :return: Tuple (density_metrics, performance_monitor_data, performance_analysis_data, processed_packets).
+    """
+    import numpy as np
+    import MetricsEngine, DensityTracker
+    ## 1.1 ##
+    density = DensityTracker.DensityTracker()
+    ## 1.2 ##
+    engine = MetricsEngine.MetricsEngine(src_address, dst_address)
+
+    processed_packets = 0
+    columns = set(MetricsEngine.COLUMNS) | set(DensityTracker.COLUMNS)
+    if aggregator is not None:
+        columns |= set(aggregator.columns)
+    if breakdown is not None:
+        columns |= set(breakdown.columns)
+    if distributions is not None:
+        columns |= set(distributions.columns)
+    t = profiler.clock() if profiler else None # Start of the current stage
+    for batch in reader.read_batches(batch_size, columns):
+        if profiler:
+            t = profiler.add('read', t)
+        if i > -1 and processed_packets + len(batch) > i:
+            batch = batch.select(np.arange(len(batch)) < i - processed_packets)
+        processed_packets += len(batch)
+
+        ## 1.1 Wi-Fi Network Density ##
+        density.update_batch(batch)
+        if profiler:
+            t = profiler.add('density', t)
+
+        ## 1.2 Wi-Fi Network Performance ##
+        engine.update(batch)
+        if profiler:
+            t = profiler.add('metrics', t)
+        if aggregator is not None:
+            aggregator.update(batch, engine.address_mask(batch))
+            if profiler:
+                t = profiler.add('windows', t)
+        if breakdown is not None:
+            breakdown.update(batch)
+            if profiler:
+                t = profiler.add('stations', t)
+        if distributions is not None:
+            distributions.update(batch, engine.address_mask(batch))
+            if profiler:
+                t = profiler.add('quantiles', t)
+
+        if processed_packets == i:
+            break
+
+    return density.get_density_metrics(), engine.performance_monitor_data, engine.performance_analysis_data, processed_packets
+
+def process_stream(reader, i, start_time, src_address=None, dst_address=None, aggregator=None, report_every=1.0, batch_size=1024, on_report=None,
+                   profiler=None, breakdown=None, distributions=None):
+    """
+    Process a live capture until it ends (or Ctrl-C), with memory that does not grow with its duration:
+    totals are counters, and the time series is the bounded history of a WindowAggregator.
+    :param aggregator: WindowAggregator of the windowed metrics (default: 10 second windows sliding every second, 600 seconds kept).
+    :param report_every: Seconds between two reports, also the longest time frames wait in a partial batch.
+    :param on_report: Callable receiving the report text every report_every seconds and at the end (None for no reports).
+    :param profiler: Profiler timing the read, density, metrics, windows, stations, quantiles and report stages (None for no profiling).
+    :param breakdown: StationBreakdown also updated with every frame and added to the reports (None for none).
+    :param distributions: QuantileSketch.DistributionTracker also updated with the selected frames and added to the reports (None for none).
+    :return: Tuple (density_metrics, performance_monitor_data, performance_analysis_data, processed_packets, aggregator).
+    """
+    import numpy as np
+    import MetricsEngine, DensityTracker, WindowAggregator
+    ## 1.1 ##
+    density = DensityTracker.DensityTracker()
+    ## 1.2 ##
+    engine = MetricsEngine.MetricsEngine(src_address, dst_address)
+    if aggregator is None:
+        aggregator = WindowAggregator.WindowAggregator(10, 1, history=600)
+
+    processed_packets = 0
+    get_text = lambda: get_text_from_metrics(density.get_density_metrics(), engine.performance_monitor_data,
+                                             engine.performance_analysis_data, start_time, processed_packets) + aggregator.get_text() + (
+                                             breakdown.get_text() if breakdown is not None else '') + (
+                                             distributions.get_text() if distributions is not None else '')
+    columns = set(MetricsEngine.COLUMNS) | set(DensityTracker.COLUMNS) | set(aggregator.columns)
+    if breakdown is not None:
+        columns |= set(breakdown.columns)
+    if distributions is not None:
+        columns |= set(distributions.columns)
+    last_report = time.monotonic()
+    t = profiler.clock() if profiler else None # Start of the current stage
+    try:
+        for batch in reader.read_batches(batch_size, columns, max_latency=report_every):
+            if profiler:
+                t = profiler.add('read', t)
+            if i > -1 and processed_packets + len(batch) > i:
+                batch = batch.select(np.arange(len(batch)) < i - processed_packets)
+            processed_packets += len(batch)
+
+            density.update_batch(batch)
+            if profiler:
+                t = profiler.add('density', t)
+            engine.update(batch)
+            if profiler:
+                t = profiler.add('metrics', t)
+            aggregator.update(batch, engine.address_mask(batch))
+            if profiler:
+                t = profiler.add('windows', t)
+            if breakdown is not None:
+                breakdown.update(batch)
+                if profiler:
+                    t = profiler.add('stations', t)
+            if distributions is not None:
+                distributions.update(batch, engine.address_mask(batch))
+                if profiler:
+                    t = profiler.add('quantiles', t)
+
+            if on_report and time.monotonic() - last_report >= report_every:
+                on_report(get_text())
+                last_report = time.monotonic()
+                if profiler:
+                    t = profiler.add('report', t)
+            if processed_packets == i:
+                break
+    except KeyboardInterrupt:
+        pass # Stop monitoring, the final report is still produced
+    if on_report:
+        on_report(get_text())
+
+    return density.get_density_metrics(), engine.performance_monitor_data, engine.performance_analysis_data, processed_packets, aggregator
 
 if __name__ == "__main__":
     # Get the command line arguments.
     parser = argparse.ArgumentParser(description="Process a PCAP file to extract WiFi information.")
     parser.add_argument("-s", "--src", type=str, default="--", help="Source address (default: --).")
     parser.add_argument("-d", "--dst", type=str, default="--", help="Destination address (default: --).")
-    parser.add_argument("-l", "--limit", type=int, default=-1, help="Limit the number of packets to process (default: -1 for no limit).")
-    parser.add_argument("-f", "--filename", type=str, required=True, help="Path to the PCAP file.")
+    parser.add_argument("-l", "--limit", type=int, default=-1, help="Limit the number of packets to process, counted before --prefilter (default: -1 for no limit).")
+    parser.add_argument("-f", "--filename", type=str, nargs='+', required=True, help="Path to the PCAP file or pipe, - for stdin. Several paths are monitored at once, each as its own source.")
+    parser.add_argument("-b", "--backend", type=str, default=None, choices=BACKENDS, help="Packet decoder (default: pyshark, native for live captures).")
+    parser.add_argument("--prefilter", action="store_true", help="Drop the frames not matching -s/-d in the decoder, before they are dissected (density then only covers those frames).")
+    parser.add_argument("--batch-size", type=int, default=0, help="Compute the metrics on column batches of this size with no live plot (default: 0 for per packet processing).")
+    parser.add_argument("--cache", type=str, nargs='?', const="", default=None, help="Cache the extracted columns (in DIR, default: .doctor_cache next to the capture), implies batch processing.")
+    parser.add_argument("--cache-size", type=int, default=1024, help="Maximum size of the cache directory in MB (default: 1024).")
+    parser.add_argument("--headless", action="store_true", help="Write the report and time series to files instead of plotting.")
+    parser.add_argument("-o", "--output", type=str, default=None, help="Output prefix of headless runs (default: capture file name).")
+    parser.add_argument("--fps", type=float, default=2.0, help="Maximum plot redraws per second (default: 2).")
+    parser.add_argument("--follow", action="store_true", help="Follow a capture file that is still being written (live capture).")
+    parser.add_argument("--idle-timeout", type=float, default=None, help="Stop following after this many seconds without new frames (default: never).")
+    parser.add_argument("--window", type=float, default=None, help="Length of the time windows in seconds, e.g. 0.1, 1 or 10 (default: 10 for live captures, no windows otherwise), implies batch processing.")
+    parser.add_argument("--slide", type=float, default=None, help="Seconds between two windows (default: 1 for live captures, the window length otherwise).")
+    parser.add_argument("--per", type=str, default=None, choices=WINDOW_KEYS, help="Also compute the windowed metrics per BSSID or transmitter.")
+    parser.add_argument("--history", type=float, default=None, help="Seconds of windowed metrics kept (default: 600 for live captures, all otherwise).")
+    parser.add_argument("--top", type=int, default=None, help="Break the frames down per station (TA/RA pair) and BSSID and report the top K talkers and worst stations, implies batch processing.")
+    parser.add_argument("--stations", type=int, default=4096, help="Stations and BSSIDs tracked exactly by --top, the lightest are then counted as other (default: 4096).")
+    parser.add_argument("--quantiles", action="store_true", help="Report the p1/p5/p50/p95/p99 and histograms of the data rate, signal, MCS index and PHY gap, implies batch processing.")
+    parser.add_argument("--store", type=str, default=None, help="Also write the windowed metrics, densities and station breakdown to this SQLite report store, implies 1 second windows without --window.")
+    parser.add_argument("--report-every", type=float, default=1.0, help="Seconds between two reports of live captures (default: 1).")
+    parser.add_argument("--profile", action="store_true", help="Time the pipeline stages and print their breakdown at the end.")
+    parser.add_argument("--profile-stats", type=str, default=None, help="Also write the stage statistics as JSON to this file, implies --profile.")
+    parser.add_argument("--profile-every", type=float, default=None, help="Seconds between two writes of the JSON statistics (default: only at the end).")
+    parser.add_argument("--pstats", type=str, default=None, help="Run under cProfile and dump the pstats to this file, implies --profile.")
     parser.add_argument("-dbg", action="store_true", help="Enable debug mode.")
     
     # Parse the arguments.
     args = parser.parse_args()
-    filename = args.filename
+    import PcapReader, WindowAggregator
+    filenames = args.filename
+    filename = filenames[0]
     packet_limit = args.limit
-    src_address = args.src
-    dst_address = args.dst
+    src_address = args.src if args.src != "--" else None
+    dst_address = args.dst if args.dst != "--" else None
+    live = args.follow or '-' in filenames # Stream the capture until it ends
+    if args.store and not live and not args.window:
+        args.window = 1.0 # The store keeps the panes of the windows
+    backend = args.backend or ('native' if live else 'pyshark')
     DBG_MODE = args.dbg
     
     if DBG_MODE: # Information for debugging
-        print(f"Debug mode enabled.")
+        print("Debug mode enabled.")
         print(f"Processing file: {filename.split('/')[-1]}{f' with packet limit: {packet_limit}' if packet_limit > -1 else ''}")
-        if src_address != "--" and dst_address != "--":
+        if src_address and dst_address:
             print(f"Throughput between {src_address} and {dst_address}")
     
     # Start timer.
     start_time = time.time() 
 
+    # Profiling (no hooks run without it)
+    profiler = None
+    if args.profile or args.profile_stats or args.pstats:
+        import Profiler
+        profiler = Profiler.Profiler(args.profile_stats, args.profile_every)
+    if args.pstats:
+        import cProfile
+        cprofile = cProfile.Profile()
+
     # Open reader object.
-    reader = PcapReader.PcapReader(filename)
+    cache = None
+    if args.cache is not None:
+        import CaptureCache
+        max_bytes = args.cache_size * 1024 * 1024
+        open_cache = lambda path: CaptureCache.CaptureCache(args.cache, max_bytes) if args.cache else CaptureCache.CaptureCache.for_capture(path, max_bytes)
+        cache = open_cache(filename)
+        if args.batch_size <= 0:
+            args.batch_size = 65536
+    open_breakdown = lambda: None
+    if args.top:
+        import StationBreakdown
+        open_breakdown = lambda: StationBreakdown.StationBreakdown(args.stations, args.top)
+    open_distributions = lambda: None
+    if args.quantiles:
+        import QuantileSketch
+        open_distributions = QuantileSketch.DistributionTracker
+    store = None
+    if args.store:
+        import ReportStore
+        store = ReportStore.ReportStore(args.store)
+    frame_filter = None
+    frame_range = None
+    if args.prefilter:
+        import FrameFilter
+        frame_filter = FrameFilter.FrameFilter(ta=src_address, ra=dst_address)
+        if packet_limit > -1:
+            # The limit counts the captured frames, as without the filter: the reader stops after them
+            frame_range = (0, packet_limit)
+            packet_limit = -1
+
+    if len(filenames) > 1:
+        # Several sources in one event loop, each with its own metrics
+        import CaptureOrchestrator
+        orchestrator = CaptureOrchestrator.CaptureOrchestrator(src_address, dst_address, args.batch_size or 1024, args.report_every)
+        prefixes, captures = {}, {}
+        for path in filenames:
+            name = os.path.splitext(os.path.basename(path))[0] if path != '-' else 'stdin'
+            prefixes[name] = f"{args.output}_{name}" if args.output else (os.path.splitext(path)[0] if path != '-' else 'stdin')
+            aggregator = None
+            if store:
+                captures[name] = store.capture(name, os.path.abspath(path) if path != '-' else None, args.slide or (min(1.0, args.window or 10) if live else args.window))
+            if live or args.window:
+                width = args.window or 10
+                aggregator = WindowAggregator.WindowAggregator(width, args.slide or (min(1.0, width) if live else None), args.per,
+                                                               args.history or (600 if live else None))
+            orchestrator.add_source(name, PcapReader.PcapReader(path, backend, cache=open_cache(path) if cache else None, follow=args.follow,
+                                                                idle_timeout=args.idle_timeout, frame_range=frame_range, frame_filter=frame_filter,
+                                                                profiler=profiler), aggregator,
+                                    open_breakdown(), open_distributions())
+        if args.headless:
+            def show(text):
+                for source in orchestrator.sources:
+                    write_report(prefixes[source.name], source.get_text(start_time), aggregator=source.aggregator, breakdown=source.breakdown,
+                                 distributions=source.distributions)
+        else:
+            show = lambda text: print(("\033[H\033[J" if sys.stdout.isatty() and live else "") + text.lstrip('\n'), flush=True)
+        def on_report(text):
+            show(text)
+            for source in orchestrator.sources if store else ():
+                store.write(captures[source.name], source.frames, source.aggregator, source.density.get_density_metrics(), source.breakdown)
+        for source in orchestrator.monitor(start_time, packet_limit, args.report_every, on_report):
+            source.reader.close()
+        if store:
+            store.close()
+        if profiler:
+            profiler.close()
+            print(profiler.get_text().lstrip('\n'), file=sys.stderr)
+        sys.exit(0)
+
+    reader = PcapReader.PcapReader(filename, backend, frame_range=frame_range, cache=cache, follow=args.follow, idle_timeout=args.idle_timeout,
+                                   frame_filter=frame_filter, profiler=profiler)
+    prefix = args.output or (os.path.splitext(filename)[0] if filename != '-' else 'stdin')
+    capture = None
+    if store:
+        name = os.path.splitext(os.path.basename(filename))[0] if filename != '-' else 'stdin'
+        capture = store.capture(name, os.path.abspath(filename) if filename != '-' else None,
+                                args.slide or (min(1.0, args.window or 10) if live else args.window))
     
     # Process packets and display results.
-    process_packets(reader, packet_limit, start_time, src_address, dst_address)
+    visualization_data = None
+    aggregator = None
+    breakdown = open_breakdown()
+    distributions = open_distributions()
+    if args.pstats:
+        cprofile.enable()
+    if live:
+        width = args.window or 10
+        aggregator = WindowAggregator.WindowAggregator(width, args.slide or min(1.0, width), args.per, args.history or 600)
+        if args.headless:
+            on_report = lambda text: write_report(prefix, text, aggregator=aggregator, breakdown=breakdown, distributions=distributions)
+        else:
+            # Redraw the report in place on terminals
+            on_report = lambda text: print(("\033[H\033[J" if sys.stdout.isatty() else "") + text.lstrip('\n'), flush=True)
+        if store:
+            # Bulk write of the new panes and the breakdown with every report, densities are written at the end
+            show = on_report
+            def on_report(text):
+                show(text)
+                store.write(capture, None, aggregator, None, breakdown)
+        density_metrics, performance_monitor_data, performance_analysis_data, processed_packets, aggregator = process_stream(
+            reader, packet_limit, start_time, src_address, dst_address, aggregator, args.report_every, args.batch_size or 1024, on_report,
+            profiler, breakdown, distributions)
+    elif args.batch_size > 0 or args.window or breakdown is not None or distributions is not None:
+        if args.window:
+            aggregator = WindowAggregator.WindowAggregator(args.window, args.slide, args.per, args.history)
+        density_metrics, performance_monitor_data, performance_analysis_data, processed_packets = process_batches(
+            reader, packet_limit, start_time, src_address, dst_address, args.batch_size or 65536, aggregator, profiler, breakdown, distributions)
+        if not args.headless:
+            print(get_text_from_metrics(density_metrics, performance_monitor_data, performance_analysis_data, start_time, processed_packets)
+                  + (aggregator.get_text() if aggregator else '') + (breakdown.get_text() if breakdown else '')
+                  + (distributions.get_text() if distributions else ''))
+    else:
+        renderer = None
+        if not args.headless:
+            import LiveRenderer
+            renderer = LiveRenderer.LiveRenderer(args.fps)
+        density_metrics, performance_monitor_data, performance_analysis_data, processed_packets, visualization_data = process_packets(
+            reader, packet_limit, start_time, src_address, dst_address, renderer=renderer, profiler=profiler)
+    if args.pstats:
+        cprofile.disable()
+        cprofile.dump_stats(args.pstats)
+
+    if store:
+        t = profiler.clock() if profiler else None
+        store.write(capture, processed_packets, aggregator, density_metrics, breakdown)
+        store.close()
+        if profiler:
+            profiler.add('report', t)
+
+    if args.headless and not live: # Live reports are written by process_stream
+        t = profiler.clock() if profiler else None
+        write_report(prefix, get_text_from_metrics(density_metrics, performance_monitor_data, performance_analysis_data, start_time, processed_packets)
+                     + (aggregator.get_text() if aggregator else '') + (breakdown.get_text() if breakdown else '')
+                     + (distributions.get_text() if distributions else ''), visualization_data,
+                     aggregator=aggregator, breakdown=breakdown, distributions=distributions)
+        if profiler:
+            profiler.add('report', t)
+        if DBG_MODE:
+            print(f"\nReport written to {prefix}_report.txt")
     reader.close()
+
+    if profiler:
+        profiler.close()
+        # Breakdown on stderr, stdout may hold the report
+        print(profiler.get_text().lstrip('\n'), file=sys.stderr)
     
     sys.exit(0)
\ No newline at end of file
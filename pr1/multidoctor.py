@@ -0,0 +1,189 @@
+import PcapReader, PcapngDecoder, MetricsEngine, DensityTracker, FrameFilter, QuantileSketch
+from doctor import get_text_from_metrics
+from concurrent.futures import ProcessPoolExecutor
+import argparse, os
+import time, sys
+
+# Extensions of the capture files picked from a directory
+CAPTURE_EXTENSIONS = ('.pcapng', '.pcap', '.cap')
+# Name of the report of every file together, not given to a capture
+COMBINED = 'combined'
+# Columns read by the chunk workers
+COLUMNS = tuple(set(MetricsEngine.COLUMNS) | set(DensityTracker.COLUMNS))
+
+"""
+Partial aggregates
+"""
+class PartialResult:
+    """
+    Monitor, analysis and density aggregates of a range of frames, with optional distribution sketches.
+    Partial results of consecutive ranges are merged with merge().
+    """
+    def __init__(self, src_address=None, dst_address=None, quantiles=False):
+        self.frames = 0
+        self.engine = MetricsEngine.MetricsEngine(src_address, dst_address)
+        self.density = DensityTracker.DensityTracker()
+        self.distributions = QuantileSketch.DistributionTracker() if quantiles else None
+
+    def merge(self, other):
+        """
+        Merge the aggregates of the frames following this range.
+        """
+        self.frames += other.frames
+        self.engine.merge(other.engine)
+        self.density.merge(other.density)
+        if other.distributions is not None:
+            if self.distributions is None:
+                self.distributions = QuantileSketch.DistributionTracker()
+            self.distributions.merge(other.distributions)
+        return self
+
+    def get_text(self, start_time):
+        return get_text_from_metrics(self.density.get_density_metrics(), self.engine.performance_monitor_data,
+                                     self.engine.performance_analysis_data, start_time, self.frames) + (
+                                     self.distributions.get_text() if self.distributions is not None else '')
+
+def analyze_chunk(task):
+    """
+    Worker: aggregate a range of frames of a capture file.
+    :param task: Tuple (file path, first frame, end frame, backend, src address, dst address, batch size, prefilter, quantiles).
+    :return: Tuple (file path, first frame, PartialResult).
+    """
+    file_path, start, stop, backend, src_address, dst_address, batch_size, prefilter, quantiles = task
+    frame_filter = FrameFilter.FrameFilter(ta=src_address, ra=dst_address) if prefilter else None
+    reader = PcapReader.PcapReader(file_path, backend, use_mmap=backend == 'native', frame_range=(start, stop), frame_filter=frame_filter)
+    result = PartialResult(src_address, dst_address, quantiles)
+    columns = set(COLUMNS) | (set(QuantileSketch.COLUMNS) if quantiles else set())
+    for batch in reader.read_batches(batch_size, columns):
+        result.frames += len(batch)
+        result.density.update_batch(batch)
+        result.engine.update(batch)
+        if result.distributions is not None:
+            result.distributions.update(batch, result.engine.address_mask(batch))
+    return file_path, start, result
+
+"""
+Driver
+"""
+def find_captures(paths):
+    """
+    Expand directories into the capture files they contain.
+    :param paths: List of capture files and directories.
+    :return: Sorted list of capture files.
+    """
+    files = set()
+    for path in paths:
+        if os.path.isdir(path):
+            for name in os.listdir(path):
+                if name.endswith(CAPTURE_EXTENSIONS):
+                    files.add(os.path.join(path, name))
+        elif os.path.isfile(path):
+            files.add(path)
+        else:
+            raise ValueError(f"File not found: {path}")
+    return sorted(files)
+
+def report_names(files):
+    """
+    Unique report name of every capture file: its name without extension, prefixed by its parent directory
+    when several files share it (or it is COMBINED), with an index suffix if that is not enough.
+    :return: Dictionary of file path to name.
+    """
+    base = {path: os.path.splitext(os.path.basename(path))[0] for path in files}
+    counts = {}
+    for name in base.values():
+        counts[name] = counts.get(name, 0) + 1
+    names, used = {}, {COMBINED}
+    for path in files:
+        name = base[path]
+        if counts[name] > 1 or name == COMBINED:
+            parent = os.path.basename(os.path.dirname(os.path.abspath(path)))
+            name = f"{parent}_{name}" if parent else name
+        unique, index = name, 1
+        while unique in used:
+            unique, index = f"{name}_{index}", index + 1
+        names[path] = unique
+        used.add(unique)
+    return names
+
+def make_tasks(files, chunk_frames, backend, src_address=None, dst_address=None, batch_size=65536, prefilter=False, quantiles=False):
+    """
+    Split the capture files in frame ranges of at most chunk_frames frames.
+    :param chunk_frames: Frames per chunk (0 to process every file as one chunk).
+    :param prefilter: Drop the frames not matching the addresses in the decoder.
+    :param quantiles: Also sketch the distributions of the frames.
+    """
+    tasks = []
+    for file_path in files:
+        if chunk_frames > 0 and backend == 'native':
+            frames = PcapngDecoder.PcapngDecoder(file_path).count_frames()
+            ranges = [(start, min(start + chunk_frames, frames)) for start in range(0, frames, chunk_frames)] or [(0, 0)]
+        else:
+            ranges = [(0, None)]
+        for start, stop in ranges:
+            tasks.append((file_path, start, stop, backend, src_address, dst_address, batch_size, prefilter, quantiles))
+    return tasks
+
+def run(files, jobs=None, chunk_frames=0, backend='native', src_address=None, dst_address=None, batch_size=65536, prefilter=False, quantiles=False):
+    """
+    Analyze capture files in parallel.
+    :param jobs: Number of worker processes (None for one per CPU).
+    :return: Tuple (dictionary of file path to PartialResult, combined PartialResult).
+    """
+    tasks = make_tasks(files, chunk_frames, backend, src_address, dst_address, batch_size, prefilter, quantiles)
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        chunks = list(executor.map(analyze_chunk, tasks))
+
+    # Merge chunks in file and frame order, so the result does not depend on scheduling
+    per_file = {}
+    for file_path, start, result in sorted(chunks, key=lambda chunk: (chunk[0], chunk[1])):
+        if file_path in per_file:
+            per_file[file_path].merge(result)
+        else:
+            per_file[file_path] = result
+    combined = PartialResult(src_address, dst_address)
+    for file_path in files:
+        combined.merge(per_file[file_path])
+    return per_file, combined
+
+if __name__ == "__main__":
+    # Get the command line arguments.
+    parser = argparse.ArgumentParser(description="Process many PCAP files in parallel and merge their WiFi metrics.")
+    parser.add_argument("paths", nargs='+', help="PCAP files or directories of PCAP files.")
+    parser.add_argument("-s", "--src", type=str, default="--", help="Source address (default: --).")
+    parser.add_argument("-d", "--dst", type=str, default="--", help="Destination address (default: --).")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="Number of worker processes (default: one per CPU).")
+    parser.add_argument("-c", "--chunk-frames", type=int, default=500000, help="Split files in chunks of this many frames (default: 500000, 0 for no split).")
+    parser.add_argument("-b", "--backend", type=str, default="native", choices=PcapReader.BACKENDS, help="Packet decoder (default: native).")
+    parser.add_argument("--batch-size", type=int, default=65536, help="Frames per column batch (default: 65536).")
+    parser.add_argument("--prefilter", action="store_true", help="Drop the frames not matching -s/-d in the decoder (density then only covers those frames).")
+    parser.add_argument("--quantiles", action="store_true", help="Also report the quantiles and histograms of the data rate, signal, MCS index and PHY gap.")
+    parser.add_argument("-o", "--output", type=str, default=None, help="Directory to write the reports to (default: print them).")
+
+    # Parse the arguments.
+    args = parser.parse_args()
+    src_address = args.src if args.src != "--" else None
+    dst_address = args.dst if args.dst != "--" else None
+
+    # Start timer.
+    start_time = time.time()
+
+    files = find_captures(args.paths)
+    per_file, combined = run(files, args.jobs, args.chunk_frames, args.backend, src_address, dst_address, args.batch_size, args.prefilter, args.quantiles)
+
+    names = report_names(files)
+    results = [(names[file_path], per_file[file_path]) for file_path in files] + [(COMBINED, combined)]
+    reports = [(name, result.get_text(start_time)) for name, result in results]
+    if args.output:
+        os.makedirs(args.output, exist_ok=True)
+        for name, text in reports:
+            with open(os.path.join(args.output, f"{name}_report.txt"), 'w') as report:
+                report.write(text.lstrip('\n') + '\n')
+        for name, result in results:
+            if result.distributions is not None:
+                result.distributions.save(os.path.join(args.output, f"{name}_distributions.json"))
+    else:
+        for name, text in reports:
+            print(f"\n{'=' * 80}\n{name}{text}")
+
+    sys.exit(0)
@@ -0,0 +1,91 @@
+import PcapngDecoder
+import argparse, struct
+import time, sys
+
+"""
+pcapng writer
+"""
+def section_header():
+    """
+    Section Header Block of a little endian pcapng file of unknown length.
+    """
+    return struct.pack('<IIIHHq', PcapngDecoder.PCAPNG_SHB, 28, PcapngDecoder.PCAPNG_BYTE_ORDER_MAGIC, 1, 0, -1) + struct.pack('<I', 28)
+
+def interface_description(linktype):
+    """
+    Interface Description Block with microsecond timestamps (the pcapng default).
+    """
+    return struct.pack('<IIHHII', PcapngDecoder.PCAPNG_IDB, 20, linktype, 0, 0, 20)
+
+def enhanced_packet(timestamp, data, orig_len):
+    """
+    Enhanced Packet Block of a frame of interface 0.
+    """
+    ticks = int(round(timestamp * 1e6))
+    padded = data + b'\0' * (-len(data) % 4)
+    block_len = 32 + len(padded)
+    return (struct.pack('<IIIIIII', PcapngDecoder.PCAPNG_EPB, block_len, 0, ticks >> 32, ticks & 0xFFFFFFFF, len(data), orig_len)
+            + padded + struct.pack('<I', block_len))
+
+def replay(file_path, output, rate=0.0, restamp=False, split=False, loops=1):
+    """
+    Append the frames of a capture to an output stream as pcapng blocks, like a live capture would.
+    :param file_path: Capture file to replay.
+    :param output: Binary file object, flushed after every frame.
+    :param rate: Frames per second (0 for as fast as possible).
+    :param restamp: Replace the capture timestamps by the current time.
+    :param split: Write every block in two halves, to exercise readers on partially written blocks.
+    :param loops: Number of times the capture is replayed.
+    :return: Number of frames written.
+    """
+    output.write(section_header())
+    linktype = None
+    written = 0
+    for _ in range(loops):
+        decoder = PcapngDecoder.PcapngDecoder(file_path)
+        try:
+            for frame_linktype, timestamp, data, orig_len in decoder.read_frames():
+                if linktype is None:
+                    linktype = frame_linktype
+                    output.write(interface_description(linktype))
+                elif frame_linktype != linktype:
+                    continue # Only one interface is written
+                if restamp or timestamp is None:
+                    timestamp = time.time()
+                block = enhanced_packet(timestamp, data, orig_len)
+                if split:
+                    output.write(block[:len(block) // 2])
+                    output.flush()
+                    time.sleep(0.001)
+                    block = block[len(block) // 2:]
+                output.write(block)
+                output.flush()
+                written += 1
+                if rate > 0:
+                    time.sleep(1.0 / rate)
+        finally:
+            decoder.close()
+    return written
+
+if __name__ == "__main__":
+    # Get the command line arguments.
+    parser = argparse.ArgumentParser(description="Replay a PCAP file as a growing pcapng file or stream, to test live captures.")
+    parser.add_argument("-f", "--filename", type=str, required=True, help="Path to the PCAP file to replay.")
+    parser.add_argument("-o", "--output", type=str, default="-", help="File to append the frames to, - for stdout (default: -).")
+    parser.add_argument("-r", "--rate", type=float, default=100.0, help="Frames per second (default: 100, 0 for as fast as possible).")
+    parser.add_argument("--restamp", action="store_true", help="Stamp the frames with the current time.")
+    parser.add_argument("--split", action="store_true", help="Write every block in two halves.")
+    parser.add_argument("--loops", type=int, default=1, help="Number of times the capture is replayed (default: 1).")
+
+    # Parse the arguments.
+    args = parser.parse_args()
+    output = sys.stdout.buffer if args.output == "-" else open(args.output, 'wb')
+    try:
+        replay(args.filename, output, args.rate, args.restamp, args.split, args.loops)
+    except (BrokenPipeError, KeyboardInterrupt):
+        pass # Reader stopped
+    finally:
+        if output is not sys.stdout.buffer:
+            output.close()
+
+    sys.exit(0)
@@ -0,0 +1,176 @@
+import PcapngDecoder, RateTables
+from replay import section_header, interface_description, enhanced_packet
+import argparse, random, struct
+import sys
+
+# Default network mix of the generated captures
+DEFAULT_CHANNELS = ((1, 1), (6, 1), (11, 1), (36, 1), (44, 1)) # (channel, weight)
+DEFAULT_BSSIDS = 8
+DEFAULT_STATIONS = 4 # Stations associated to every BSSID
+DEFAULT_DATA_RATIO = 0.6 # Data frames, sent with an 802.11n MCS
+DEFAULT_CONTROL_RATIO = 0.25 # Control frames (ACK, RTS, CTS), the rest are beacons
+DEFAULT_RETRY_RATIO = 0.1 # Data frames with the retry flag
+DEFAULT_FRAME_RATE = 2000.0 # Mean frames per second of the capture timeline
+START_TIME = 1700000000.0 # Timestamp of the first frame
+
+BROADCAST = b'\xff' * 6
+FC_BEACON = 0x80
+FC_QOS_DATA = 0x88
+FC_RTS = 0xb4
+FC_CTS = 0xc4
+FC_ACK = 0xd4
+
+"""
+Radiotap headers
+"""
+RADIOTAP_LEGACY = (1 << 1) | (1 << 2) | (1 << 3) | (1 << 5) # Flags, rate, channel, signal
+RADIOTAP_HT = (1 << 1) | (1 << 3) | (1 << 5) | (1 << 19) # Flags, channel, signal, MCS
+MCS_KNOWN = PcapngDecoder.RADIOTAP_MCS_HAVE_BW | PcapngDecoder.RADIOTAP_MCS_HAVE_MCS | PcapngDecoder.RADIOTAP_MCS_HAVE_GI
+
+def channel_to_mhz(channel):
+    """
+    Center frequency of a 2.4 or 5 GHz channel number.
+    """
+    if channel == 14:
+        return 2484
+    return 2407 + 5 * channel if channel < 14 else 5000 + 5 * channel
+
+def legacy_radiotap(frequency, signal_dbm, rate):
+    """
+    Radiotap header of a legacy (802.11b/g/a) frame with FCS.
+    :param rate: Data rate in Mbps.
+    """
+    flags = PcapngDecoder.CHAN_OFDM | (PcapngDecoder.CHAN_2GHZ if frequency < 3000 else PcapngDecoder.CHAN_5GHZ)
+    return struct.pack('<BBHIBBHHb', 0, 0, 15, RADIOTAP_LEGACY, PcapngDecoder.RADIOTAP_FLAGS_FCS, int(rate * 2),
+                       frequency, flags, signal_dbm)
+
+def ht_radiotap(frequency, signal_dbm, mcs_index, bandwidth, short_gi):
+    """
+    Radiotap header of an 802.11n frame with FCS.
+    :param bandwidth: 802.11n bandwidth (0: 20, 1: 40).
+    """
+    flags = PcapngDecoder.CHAN_OFDM | (PcapngDecoder.CHAN_2GHZ if frequency < 3000 else PcapngDecoder.CHAN_5GHZ)
+    return struct.pack('<BBHIBxHHbBBB', 0, 0, 18, RADIOTAP_HT, PcapngDecoder.RADIOTAP_FLAGS_FCS, frequency, flags,
+                       signal_dbm, MCS_KNOWN, bandwidth | (short_gi << 2), mcs_index)
+
+"""
+Generator
+"""
+class Network:
+    """
+    BSSID of a generated capture with its channel, SSID and stations.
+    """
+    def __init__(self, index, channel, stations, rnd):
+        self.bssid = bytes([0x02, 0x00, 0x00, 0x00, index >> 8, index & 0xff])
+        self.channel = channel
+        self.frequency = channel_to_mhz(channel)
+        self.ssid = f"net{index}".encode()
+        self.bandwidth = 0 if channel < 14 else 1 # 40 MHz on 5 GHz
+        # Station address and mean signal strength (dBm)
+        self.stations = [(bytes([0x02, 0x01, index >> 8, index & 0xff, 0x00, station]), rnd.randint(-85, -35))
+                         for station in range(stations)]
+
+def generate(output, frames, bssids=DEFAULT_BSSIDS, channels=DEFAULT_CHANNELS, data_ratio=DEFAULT_DATA_RATIO,
+             control_ratio=DEFAULT_CONTROL_RATIO, retry_ratio=DEFAULT_RETRY_RATIO, stations=DEFAULT_STATIONS,
+             frame_rate=DEFAULT_FRAME_RATE, seed=0):
+    """
+    Write a deterministic synthetic radiotap capture: the same arguments always give the same file.
+    :param output: Binary file object the pcapng blocks are written to.
+    :param frames: Number of frames.
+    :param bssids: Number of BSSIDs.
+    :param channels: Sequence of (channel, weight) the BSSIDs are spread over.
+    :param data_ratio: Fraction of data frames (QoS data with an 802.11n MCS picked from the signal strength).
+    :param control_ratio: Fraction of control frames, the remaining frames are beacons.
+    :param retry_ratio: Fraction of the data frames with the retry flag.
+    :param stations: Stations per BSSID.
+    :param frame_rate: Mean frames per second of the capture timeline.
+    :param seed: Seed of the random generator.
+    :return: Number of frames written.
+    """
+    if data_ratio < 0 or control_ratio < 0 or data_ratio + control_ratio > 1:
+        raise ValueError("The data and control ratios must be positive and sum to at most 1.")
+    rnd = random.Random(seed)
+    numbers, weights = zip(*channels)
+    networks = [Network(index, channel, stations, rnd)
+                for index, channel in enumerate(rnd.choices(numbers, weights, k=bssids))]
+
+    output.write(section_header())
+    output.write(interface_description(PcapngDecoder.LINKTYPE_IEEE802_11_RADIOTAP))
+    timestamp = START_TIME
+    fcs = b'\0' * 4 # Not checked by the decoders
+    for _ in range(frames):
+        timestamp += rnd.expovariate(frame_rate)
+        network = rnd.choice(networks)
+        station, mean_signal = rnd.choice(network.stations)
+        signal_dbm = max(-100, min(-20, mean_signal + rnd.randint(-4, 4)))
+        kind = rnd.random()
+        if kind < data_ratio:
+            # Data between a station and its access point, at an MCS close to what the signal allows
+            bandwidth_mhz = RateTables.HT_BANDWIDTH_MHZ[network.bandwidth]
+            mcs = max(0, RateTables.expected_mcs(signal_dbm, bandwidth_mhz) - rnd.randint(0, 2))
+            streams = rnd.randint(0, 1)
+            radiotap = ht_radiotap(network.frequency, signal_dbm, mcs + 8 * streams, network.bandwidth, rnd.randint(0, 1))
+            retry = 0x08 if rnd.random() < retry_ratio else 0
+            if rnd.random() < 0.5:
+                flags, addresses = 0x01 | retry, network.bssid + station + network.bssid # To DS: BSSID, SA, DA
+            else:
+                flags, addresses = 0x02 | retry, station + network.bssid + network.bssid # From DS: DA, BSSID, SA
+            header = struct.pack('<BBH', FC_QOS_DATA, flags, 0) + addresses + struct.pack('<HH', 0, 0)
+            body = bytes(rnd.randint(40, 1500))
+        elif kind < data_ratio + control_ratio:
+            radiotap = legacy_radiotap(network.frequency, signal_dbm, 6 if network.frequency > 3000 else 1)
+            subtype = rnd.choice((FC_ACK, FC_ACK, FC_RTS, FC_CTS))
+            if subtype == FC_RTS:
+                header = struct.pack('<BBH', subtype, 0, 0) + network.bssid + station
+            else:
+                header = struct.pack('<BBH', subtype, 0, 0) + station
+            body = b''
+        else:
+            station = network.bssid # Beacons are sent by the access point
+            radiotap = legacy_radiotap(network.frequency, signal_dbm, 6 if network.frequency > 3000 else 1)
+            header = struct.pack('<BBH', FC_BEACON, 0, 0) + BROADCAST + network.bssid + network.bssid + b'\0\0'
+            body = (b'\0' * 8 + struct.pack('<HH', 100, 0x0401) # Timestamp, interval, capabilities
+                    + bytes([0, len(network.ssid)]) + network.ssid + bytes([3, 1, network.channel]))
+        data = radiotap + header + body + fcs
+        output.write(enhanced_packet(timestamp, data, len(data)))
+    return frames
+
+def parse_channels(text):
+    """
+    Parse a channel mix such as "1,6,11" or "1:3,36:1" (channel:weight).
+    :return: Tuple of (channel, weight).
+    """
+    channels = []
+    for item in text.split(','):
+        channel, _, weight = item.partition(':')
+        channels.append((int(channel), float(weight) if weight else 1.0))
+    return tuple(channels)
+
+if __name__ == "__main__":
+    # Get the command line arguments.
+    parser = argparse.ArgumentParser(description="Generate a deterministic synthetic 802.11 pcapng capture.")
+    parser.add_argument("-o", "--output", type=str, required=True, help="Capture file to write, - for stdout.")
+    parser.add_argument("-n", "--frames", type=int, default=10000, help="Number of frames (default: 10000).")
+    parser.add_argument("--bssids", type=int, default=DEFAULT_BSSIDS, help=f"Number of BSSIDs (default: {DEFAULT_BSSIDS}).")
+    parser.add_argument("--stations", type=int, default=DEFAULT_STATIONS, help=f"Stations per BSSID (default: {DEFAULT_STATIONS}).")
+    parser.add_argument("--channels", type=parse_channels, default=DEFAULT_CHANNELS, help="Channel mix, e.g. 1,6,11 or 1:3,36:1 for weights (default: 1,6,11,36,44).")
+    parser.add_argument("--data-ratio", type=float, default=DEFAULT_DATA_RATIO, help=f"Fraction of data frames (default: {DEFAULT_DATA_RATIO}).")
+    parser.add_argument("--control-ratio", type=float, default=DEFAULT_CONTROL_RATIO, help=f"Fraction of control frames, the others are beacons (default: {DEFAULT_CONTROL_RATIO}).")
+    parser.add_argument("--retry-ratio", type=float, default=DEFAULT_RETRY_RATIO, help=f"Fraction of data frames with the retry flag (default: {DEFAULT_RETRY_RATIO}).")
+    parser.add_argument("--frame-rate", type=float, default=DEFAULT_FRAME_RATE, help=f"Mean frames per second of the timeline (default: {DEFAULT_FRAME_RATE:g}).")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed (default: 0).")
+
+    # Parse the arguments.
+    args = parser.parse_args()
+    output = sys.stdout.buffer if args.output == "-" else open(args.output, 'wb', buffering=1024 * 1024)
+    try:
+        generate(output, args.frames, args.bssids, args.channels, args.data_ratio, args.control_ratio,
+                 args.retry_ratio, args.stations, args.frame_rate, args.seed)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        sys.exit(1)
+    finally:
+        if output is not sys.stdout.buffer:
+            output.close()
+
+    sys.exit(0)
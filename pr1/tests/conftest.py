@@ -0,0 +1,9 @@
+import glob, os, sys
+
+# The modules of the project are flat files next to this directory
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Bundled captures and their golden get_80211_info values
+CAPTURES = sorted(glob.glob(os.path.join(ROOT, 'pcap', '*.pcapng')))
+FIXTURES = os.path.join(ROOT, 'tests', 'fixtures')
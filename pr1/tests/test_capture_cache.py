@@ -0,0 +1,35 @@
+import json, os
+import numpy as np
+import CaptureCache, FrameBatch
+
+def make_batch(frames):
+    columns = {'frame_number': np.arange(1, frames + 1, dtype=np.int64)}
+    return FrameBatch.FrameBatch(columns, {'frame_number': np.ones(frames, dtype=bool)})
+
+def write_capture(path, data):
+    with open(path, 'wb') as capture:
+        capture.write(data)
+    return str(path)
+
+def test_evict_prunes_hashes(tmp_path):
+    cache = CaptureCache.CaptureCache(str(tmp_path / 'cache'))
+    kept = write_capture(tmp_path / 'kept.pcapng', b'kept')
+    deleted = write_capture(tmp_path / 'deleted.pcapng', b'deleted')
+    uncached = write_capture(tmp_path / 'uncached.pcapng', b'uncached')
+    cache.store(kept, 'native', make_batch(3))
+    cache.store(deleted, 'native', make_batch(2))
+    cache.content_hash(uncached) # Hashed by a lookup, never stored
+    os.remove(deleted)
+
+    assert cache.evict() == 0
+    with open(tmp_path / 'cache' / CaptureCache.HASHES_FILE) as hashes:
+        assert list(json.load(hashes)) == [os.path.abspath(kept)]
+    assert len(cache.load(kept, 'native')) == 3
+
+def test_evict_forgets_hashes_of_evicted_entries(tmp_path):
+    cache = CaptureCache.CaptureCache(str(tmp_path / 'cache'), max_bytes=0)
+    capture = write_capture(tmp_path / 'capture.pcapng', b'capture')
+    cache.store(capture, 'native', make_batch(3)) # Evicted at once, over the size limit
+    with open(tmp_path / 'cache' / CaptureCache.HASHES_FILE) as hashes:
+        assert json.load(hashes) == {}
+    assert cache.load(capture, 'native') is None
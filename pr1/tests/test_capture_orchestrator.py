@@ -0,0 +1,56 @@
+import asyncio, threading, time
+import pytest
+import CaptureOrchestrator, PcapReader
+from conftest import CAPTURES
+
+"""
+Helpers
+"""
+def frame_count(path):
+    return sum(len(batch) for batch in PcapReader.PcapReader(path, backend='native').read_batches())
+
+def reader_threads():
+    return [thread for thread in threading.enumerate() if thread.name.startswith('PcapReader ')]
+
+def wait_for_readers(timeout=5):
+    deadline = time.monotonic() + timeout
+    while reader_threads() and time.monotonic() < deadline:
+        time.sleep(0.05)
+    return reader_threads()
+
+"""
+Tests
+"""
+def test_sources_are_monitored_separately():
+    orchestrator = CaptureOrchestrator.CaptureOrchestrator(batch_size=256, queue_size=2)
+    for path in CAPTURES:
+        orchestrator.add_source(path, PcapReader.PcapReader(path, backend='native'))
+    missing = orchestrator.add_source('missing', PcapReader.PcapReader('missing.pcapng', backend='native'))
+    reports = []
+    sources = orchestrator.monitor(time.time(), report_every=60, on_report=reports.append)
+
+    assert all(source.done for source in sources)
+    assert missing.error and missing.frames == 0
+    for source in sources[:-1]:
+        assert source.error is None and source.frames == frame_count(source.name)
+    assert len(reports) == 1 and reports[0].count('Source ') == len(sources)
+    assert not wait_for_readers()
+
+def test_limit_per_source():
+    orchestrator = CaptureOrchestrator.CaptureOrchestrator(batch_size=64, queue_size=1)
+    for path in CAPTURES:
+        orchestrator.add_source(path, PcapReader.PcapReader(path, backend='native'))
+    assert [source.frames for source in orchestrator.monitor(time.time(), limit=100)] == [100] * len(CAPTURES)
+    # Readers blocked on their full queue give up once their consumer stopped
+    assert not wait_for_readers()
+
+@pytest.mark.filterwarnings('ignore:coroutine .Queue.put. was never awaited')
+def test_reader_stops_with_its_event_loop():
+    reader = PcapReader.PcapReader(CAPTURES[0], backend='native')
+    loop = asyncio.new_event_loop()
+    batches = reader.aiter(batch_size=16, queue_size=1)
+    assert len(loop.run_until_complete(batches.__anext__())) == 16
+    time.sleep(0.5) # The reader thread now waits on its full queue
+    # The loop stops without closing the iterator: the reader thread must not wait forever
+    loop.close()
+    assert not wait_for_readers()
@@ -0,0 +1,56 @@
+import os, threading, time, tracemalloc
+import PcapReader, replay
+from conftest import CAPTURES
+
+CAPTURE = min(CAPTURES, key=os.path.getsize) # Smallest bundled capture
+IDLE_TIMEOUT = 0.5
+
+def start_writer(path, loops):
+    """
+    Replay the capture into a new file in a thread, every block written in two halves.
+    :return: Thread and list receiving the number of written frames and the time the writer finished.
+    """
+    output = open(path, 'wb')
+    written = []
+    def write():
+        with output:
+            written.append(replay.replay(CAPTURE, output, split=True, loops=loops))
+        written.append(time.monotonic())
+    writer = threading.Thread(target=write, daemon=True)
+    writer.start()
+    return writer, written
+
+def test_follow_growing_capture(tmp_path):
+    path = str(tmp_path / 'live.pcapng')
+    writer, written = start_writer(path, loops=10)
+    reader = PcapReader.PcapReader(path, backend='native', follow=True, idle_timeout=IDLE_TIMEOUT)
+
+    tracemalloc.start()
+    frames, sizes = 0, []
+    for batch in reader.read_batches(batch_size=64):
+        frames += len(batch)
+        sizes.append(len(batch))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    stopped = time.monotonic()
+    writer.join(timeout=5)
+
+    assert not writer.is_alive() and frames == written[0]
+    assert max(sizes) <= 64
+    # Reading stopped once the file had not grown for idle_timeout
+    assert IDLE_TIMEOUT <= stopped - written[1] < IDLE_TIMEOUT + 2
+    # Frames are not kept once their batch is yielded: the reader holds much less than the written capture
+    assert peak < os.path.getsize(path) / 3
+
+def test_follow_stops_when_idle(tmp_path):
+    path = str(tmp_path / 'live.pcapng')
+    writer, written = start_writer(path, loops=1)
+    writer.join(timeout=10)
+    reader = PcapReader.PcapReader(path, backend='native', follow=True, idle_timeout=IDLE_TIMEOUT)
+    start = time.monotonic()
+    frames = sum(len(batch) for batch in reader.read_batches(batch_size=64))
+    elapsed = time.monotonic() - start
+
+    assert frames == written[0]
+    # The complete file is read at once, then the reader waits idle_timeout for new frames and stops
+    assert IDLE_TIMEOUT <= elapsed < IDLE_TIMEOUT + 2
@@ -0,0 +1,68 @@
+import os
+import pytest
+import DensityTracker, PcapReader, synthetic
+from conftest import CAPTURES
+
+pd = pytest.importorskip('pandas')
+
+"""
+Helpers
+"""
+def dataframe_density(infos):
+    """
+    Density per channel with the per packet DataFrame calculation doctor.py used before DensityTracker,
+    on all the frames at once and with its documented corrections: the strongest frame of every BSSID,
+    and the frequency and widest bandwidth of each channel.
+    :return: Dictionary of channel to (frequency, density, classification).
+    """
+    rows = [{'BSSID': info['bssid'], 'signal_dbm': int(info['signal_dbm']), 'Channel': int(info['channel']),
+             'frequency': int(info['frequency']) if info['frequency'] else 0, 'bandwidth': info['bandwidth_mhz']}
+            for info in infos if info.get('bssid') and info.get('signal_dbm') and info.get('channel')]
+    df = pd.DataFrame(rows)
+    strongest = df.sort_values(['BSSID', 'signal_dbm', 'Channel'], ascending=[True, False, True]).drop_duplicates('BSSID')
+    strongest = strongest.assign(signal_strength=strongest['signal_dbm'].abs())
+    grouped = strongest.groupby('Channel').agg(total_signal_strength=('signal_strength', 'sum'))
+    channels = df.groupby('Channel').agg(frequency=('frequency', 'first'), bandwidth=('bandwidth', 'max'))
+    grouped['density'] = grouped['total_signal_strength'] / channels['bandwidth'].reindex(grouped.index).fillna(22)
+    result = {}
+    for channel, metrics in grouped.iterrows():
+        density = metrics['density']
+        classification = ("Not dense channel" if density < 8 else "Moderately dense" if density < 16
+                          else "Dense" if density < 24 else "Very dense")
+        result[int(channel)] = (int(channels['frequency'][channel]), density, classification)
+    return result
+
+def tracker_density(tracker):
+    return {metrics['channel']: (metrics['frequency'], metrics['density'], metrics['classification'])
+            for metrics in tracker.get_density_metrics()}
+
+@pytest.fixture(scope='module', params=CAPTURES + ['synthetic'], ids=os.path.basename)
+def capture(request, tmp_path_factory):
+    if request.param != 'synthetic':
+        return request.param
+    path = str(tmp_path_factory.mktemp('density') / 'synthetic.pcapng') # 802.11n frames of 20 and 40 MHz
+    with open(path, 'wb') as output:
+        synthetic.generate(output, 5000)
+    return path
+
+"""
+Tests
+"""
+def test_packets_match_dataframe(capture):
+    reader = PcapReader.PcapReader(capture, backend='native')
+    infos = [reader.get_80211_info(packet) for packet in reader.read_packets()]
+    tracker = DensityTracker.DensityTracker()
+    for info in infos:
+        if info.get('bssid') and info.get('signal_dbm') and info.get('channel'):
+            tracker.update(info['bssid'], info['signal_dbm'], info['channel'], info.get('bandwidth_mhz'), info.get('frequency'))
+    expected = dataframe_density(infos)
+    assert expected
+    assert tracker_density(tracker) == pytest.approx(expected)
+
+def test_batches_match_dataframe(capture):
+    reader = PcapReader.PcapReader(capture, backend='native')
+    infos = [reader.get_80211_info(packet) for packet in reader.read_packets()]
+    tracker = DensityTracker.DensityTracker()
+    for batch in PcapReader.PcapReader(capture, backend='native').read_batches(1000, DensityTracker.COLUMNS):
+        tracker.update_batch(batch)
+    assert tracker_density(tracker) == pytest.approx(dataframe_density(infos))
@@ -0,0 +1,117 @@
+import os, subprocess, sys
+import pytest
+import doctor, PcapReader
+import synthetic
+from conftest import ROOT
+
+# Most frequent data link of the synthetic capture of seed 0
+SRC, DST = '02:01:00:01:00:03', '02:00:00:00:00:01'
+LIMIT = 5000
+
+@pytest.fixture(scope='module')
+def capture(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp('doctor') / 'synthetic.pcapng')
+    with open(path, 'wb') as output:
+        synthetic.generate(output, 8000)
+    return path
+
+def run_doctor(capture, prefix, *args):
+    """
+    Headless doctor.py run on the capture.
+    :return: Report text.
+    """
+    subprocess.run([sys.executable, os.path.join(ROOT, 'doctor.py'), '-f', capture, '-b', 'native', '-s', SRC, '-d', DST,
+                    '-l', str(LIMIT), '--headless', '-o', prefix] + list(args), check=True, capture_output=True)
+    with open(f"{prefix}_report.txt") as report:
+        return report.read()
+
+def performance(report):
+    """
+    Performance monitor and analysis sections of a report (density only covers the prefiltered frames).
+    """
+    return report[report.index('Performance Monitor'):report.index('Processing runtime')]
+
+@pytest.mark.parametrize('mode', [(), ('--batch-size', '4096')], ids=['packets', 'batches'])
+def test_prefilter_keeps_limit(capture, tmp_path, mode):
+    report = run_doctor(capture, str(tmp_path / 'all'), *mode)
+    prefiltered = run_doctor(capture, str(tmp_path / 'prefiltered'), '--prefilter', *mode)
+    # -l counts the captured frames, before the filter drops those of other links
+    assert report.startswith(f"Processing {LIMIT} packets")
+    assert performance(prefiltered) == performance(report)
+    assert 'on 0 packets' not in report
+
+class CountingRenderer:
+    """
+    LiveRenderer stand-in that draws on every third update.
+    """
+    def __init__(self):
+        self.updates = self.draws = 0
+
+    def update(self, visualization_data, get_text, force=False):
+        self.updates += 1
+        if self.updates % 3:
+            return False
+        self.draws += 1
+        return True
+
+    def show(self, visualization_data, get_text):
+        pass
+
+def test_redraw_profiled_when_drawn(capture):
+    import Profiler
+    renderer, profiler = CountingRenderer(), Profiler.Profiler()
+    processed = doctor.process_packets(PcapReader.PcapReader(capture, backend='native'), 1000, 0, renderer=renderer,
+                                       profiler=profiler)[3]
+    assert processed == 1000 and renderer.updates == 200 # Packet 1, 6, 11, ... 996
+    assert profiler.calls['redraw'] == renderer.draws == 66
+
+@pytest.mark.parametrize('src, dst', [(None, None), (SRC, None), (None, DST), (SRC, DST)])
+def test_batches_match_packets(capture, src, dst):
+    packets = doctor.process_packets(PcapReader.PcapReader(capture, backend='native'), -1, 0, src, dst)
+    batches = doctor.process_batches(PcapReader.PcapReader(capture, backend='native'), -1, 0, src, dst, batch_size=512)
+    density, monitor, analysis, processed = batches
+    assert processed == packets[3] == 8000
+    assert density == packets[0] and analysis == packets[2]
+    assert monitor['total_packets'] > 0 and analysis['total'] > 0 # The synthetic capture has 802.11n data frames
+    # Rates are float32 columns in batches and 6 digit strings per packet
+    expected = dict(packets[1])
+    rates = expected.pop('data_rate_le')
+    monitor = dict(monitor)
+    assert list(monitor.pop('data_rate_le')) == pytest.approx(list(rates), rel=1e-5)
+    assert monitor == pytest.approx(expected, rel=1e-6)
+    assert doctor.get_text_from_metrics(*batches[:3], 0, processed).split('Processing runtime')[0] \
+        == doctor.get_text_from_metrics(*packets[:3], 0, processed).split('Processing runtime')[0]
+
+def stripped_packets(capture, count=100):
+    """
+    First native packets of the capture, the 11th without its wlan_radio layer and the 21st without its wlan layer.
+    """
+    reader = PcapReader.PcapReader(capture, backend='native')
+    packets = [reader.read_next_packet() for _ in range(count)]
+    reader.close()
+    del packets[10].layers['wlan_radio'], packets[20].layers['wlan']
+    return packets
+
+class StubReader(PcapReader.PcapReader):
+    """
+    PcapReader yielding the given packets on the pyshark code paths.
+    """
+    def __init__(self, packets, profiler=None):
+        super().__init__(None, backend='pyshark', profiler=profiler)
+        self.packets = iter(packets)
+
+    def read_packets(self):
+        return self.packets
+
+    def read_next_packet(self):
+        return next(self.packets, None)
+
+def test_non_80211_packets_dropped(capture):
+    import Profiler
+    profiler = Profiler.Profiler()
+    processed = doctor.process_packets(StubReader(stripped_packets(capture), profiler), -1, 0, profiler=profiler)[3]
+    assert processed == 98 and profiler.counters['dropped_frames'] == 2
+
+    profiler = Profiler.Profiler()
+    batches = list(StubReader(stripped_packets(capture), profiler).read_batches(batch_size=64))
+    assert sum(len(batch) for batch in batches) == 98 and profiler.counters['dropped_frames'] == 2
@@ -0,0 +1,27 @@
+import numpy as np
+import pytest
+import FrameBatch, FrameRecord, PcapReader
+from conftest import CAPTURES
+
+def assert_batches_equal(batch, expected):
+    assert list(batch.columns) == list(expected.columns)
+    for name in expected.columns:
+        assert np.array_equal(batch.valid[name], expected.valid[name]), name
+        assert np.array_equal(np.where(expected.valid[name], batch[name], 0), np.where(expected.valid[name], expected[name], 0)), name
+
+@pytest.mark.parametrize('capture', CAPTURES[:2])
+@pytest.mark.parametrize('columns', [None, ['phy_gap'], ['ta', 'spatial_streams', 'signal_dbm']], ids=['all', 'phy_gap', 'mixed'])
+def test_store_batches_match_reader(capture, columns):
+    batches = list(PcapReader.PcapReader(capture, backend='native').read_batches(4096))
+    store = FrameRecord.FrameStore(capacity=16)
+    for batch in batches:
+        store.extend_batch(batch)
+    expected = FrameBatch.FrameBatch.concatenate(batches)
+    names = columns or list(FrameBatch.COLUMNS)
+    expected = FrameBatch.FrameBatch({name: expected[name] for name in names}, {name: expected.valid[name] for name in names})
+    assert_batches_equal(store.to_batch(columns), expected)
+
+def test_record_size():
+    store = FrameRecord.FrameStore()
+    store.append(FrameRecord.FrameRecord.from_values({'length': 100}))
+    assert store.nbytes == FrameRecord.RECORD_DTYPE.itemsize == 54
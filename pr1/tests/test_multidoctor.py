@@ -0,0 +1,11 @@
+import multidoctor
+
+def test_report_names_are_unique():
+    files = ['a/cap.pcapng', 'b/cap.pcapng', 'c/combined.pcapng', 'd/other.pcap', 'a/cap.pcap']
+    names = multidoctor.report_names(files)
+    assert names['d/other.pcap'] == 'other'
+    assert names['a/cap.pcapng'] == 'a_cap'
+    assert names['b/cap.pcapng'] == 'b_cap'
+    assert names['c/combined.pcapng'] == 'c_combined'
+    assert names['a/cap.pcap'] == 'a_cap_1' # Same directory and name, different extension
+    assert len(set(names.values())) == len(files) and multidoctor.COMBINED not in names.values()
@@ -0,0 +1,142 @@
+import gzip, json, os, shutil, struct
+import pytest
+from conftest import CAPTURES, FIXTURES
+import PcapReader
+
+"""
+Helpers
+"""
+def golden_path(capture):
+    return os.path.join(FIXTURES, os.path.splitext(os.path.basename(capture))[0] + '_info.json.gz')
+
+def read_infos(capture, backend, **kwargs):
+    reader = PcapReader.PcapReader(capture, backend, **kwargs)
+    try:
+        return [reader.get_80211_info(packet) for packet in reader.read_packets()]
+    finally:
+        reader.close()
+
+def load_golden(capture):
+    """
+    Reference values of a capture.
+    :return: Tuple (fields, list of per frame dictionaries of the fields).
+    """
+    with gzip.open(golden_path(capture), 'rt') as golden:
+        data = json.load(golden)
+    return data['fields'], [dict(zip(data['fields'], frame)) for frame in data['frames']]
+
+def write_golden(capture):
+    """
+    Regenerate a fixture (UPDATE_GOLDEN=1) from a reference dissector, never from the native decoder:
+    every get_80211_info field of the pyshark backend when tshark is installed, else the header fields
+    dissected by scapy, in the string form of pyshark.
+    """
+    if shutil.which('tshark'):
+        source, infos = 'tshark', read_infos(capture, 'pyshark')
+        fields = list(infos[0])
+    else:
+        import scapy
+        source, infos = f"scapy {scapy.__version__}", scapy_infos(capture)
+        fields = list(SCAPY_FIELDS)
+    data = json.dumps({'source': source, 'fields': fields, 'frames': [[info[name] for name in fields] for info in infos]},
+                      separators=(',', ':'))
+    with open(golden_path(capture), 'wb') as golden:
+        golden.write(gzip.compress(data.encode(), mtime=0)) # Same bytes for the same values
+
+# Fields of the scapy reference, the others (airtime, derived values) are computed by wireshark
+SCAPY_FIELDS = ('bssid', 'ta', 'ra', 'type_subtype', 'fc_retry', 'phy', 'data_rate', 'channel', 'frequency', 'signal_dbm',
+                'bandwidth', 'short_gi', 'mcs_index', 'ssid')
+# wlan_radio.phy of the radiotap channel flags (CCK, OFDM, 2 GHz, 5 GHz, dynamic CCK-OFDM): 802.11b, a and g
+SCAPY_CHANNEL_PHY = {0x20 | 0x80: 4, 0x40 | 0x100: 5, 0x40 | 0x80: 6, 0x400 | 0x80: 6}
+
+def scapy_infos(capture):
+    """
+    get_80211_info values of the frames dissected by scapy, with the wireshark address roles
+    (wlan.ta, wlan.ra and wlan.bssid by frame type and DS bits).
+    """
+    from scapy.all import rdpcap, RadioTap, Dot11, Dot11Elt
+    infos = []
+    for packet in rdpcap(capture):
+        radio, mac = packet[RadioTap], packet[Dot11]
+        present = radio.present
+        frame_type, subtype, flags = mac.type, mac.subtype, int(mac.FCfield)
+        ta = bssid = None
+        if frame_type == 0:
+            ta, bssid = mac.addr2, mac.addr3
+        elif frame_type == 1:
+            if subtype == 10: # PS-Poll
+                ta, bssid = mac.addr2, mac.addr1
+            elif subtype in (14, 15): # CF-End
+                bssid = mac.addr2
+            elif subtype not in (7, 12, 13): # Wrapper, CTS and ACK have no TA
+                ta = mac.addr2
+        elif frame_type == 2:
+            ta, bssid = mac.addr2, (mac.addr3, mac.addr1, mac.addr2, None)[flags & 0x03]
+        info = {name: None for name in SCAPY_FIELDS}
+        info.update({'bssid': bssid, 'ta': ta, 'ra': mac.addr1, 'type_subtype': f"0x{frame_type << 4 | subtype:04x}",
+                     'fc_retry': str(flags >> 3 & 1)})
+        if 'Rate' in present:
+            info['data_rate'] = f"{radio.Rate:g}"
+        if 'Channel' in present:
+            frequency = radio.ChannelFrequency
+            channel = 14 if frequency == 2484 else (frequency - 2407) // 5 if frequency < 2484 else (frequency - 5000) // 5
+            info.update({'frequency': str(frequency), 'channel': str(channel),
+                         'phy': str(SCAPY_CHANNEL_PHY.get(int(radio.ChannelFlags) & 0x5e0, 0))})
+        if 'dBm_AntSignal' in present:
+            info['signal_dbm'] = str(radio.dBm_AntSignal)
+        if 'MCS' in present:
+            known = int(radio.knownMCS)
+            info['phy'] = '7'
+            info['bandwidth'] = str(radio.MCS_bandwidth) if known & 0x01 else None
+            info['mcs_index'] = str(radio.MCS_index) if known & 0x02 else None
+            info['short_gi'] = str(int(radio.guard_interval)) if known & 0x04 else None
+        if frame_type == 0:
+            element = packet.getlayer(Dot11Elt)
+            while isinstance(element, Dot11Elt) and element.ID != 0:
+                element = element.payload
+            if isinstance(element, Dot11Elt):
+                info['ssid'] = element.info.decode('utf-8', errors='backslashreplace') or None
+        infos.append(info)
+    return infos
+
+def block(block_type, body):
+    body += b'\0' * (-len(body) % 4)
+    length = 12 + len(body)
+    return struct.pack('<II', block_type, length) + body + struct.pack('<I', length)
+
+SHB = block(0x0A0D0D0A, struct.pack('<IHHq', 0x1A2B3C4D, 1, 0, -1))
+IDB = block(0x00000001, struct.pack('<HHI', 127, 0, 0)) # Radiotap
+
+"""
+Tests
+"""
+@pytest.mark.parametrize('capture', CAPTURES, ids=os.path.basename)
+@pytest.mark.parametrize('use_mmap', [False, True])
+def test_native_matches_golden(capture, use_mmap):
+    if os.environ.get('UPDATE_GOLDEN') and not use_mmap:
+        write_golden(capture)
+    fields, reference = load_golden(capture)
+    native = read_infos(capture, 'native', use_mmap=use_mmap)
+    assert len(native) == len(reference)
+    for index, (frame, expected) in enumerate(zip(native, reference)):
+        assert {name: frame[name] for name in fields} == expected, f"frame {index}"
+
+@pytest.mark.skipif(shutil.which('tshark') is None, reason="tshark is not installed")
+@pytest.mark.parametrize('capture', CAPTURES, ids=os.path.basename)
+def test_native_matches_pyshark(capture):
+    native, reference = read_infos(capture, 'native'), read_infos(capture, 'pyshark')
+    assert len(native) == len(reference)
+    for index, (frame, expected) in enumerate(zip(native, reference)):
+        assert frame == expected, f"frame {index}"
+
+@pytest.mark.parametrize('blocks', [
+    [SHB, block(0x00000006, struct.pack('<IIIII', 0, 0, 0, 4, 4) + b'\0' * 4)], # EPB before any IDB
+    [SHB, IDB, block(0x00000006, struct.pack('<IIIII', 3, 0, 0, 4, 4) + b'\0' * 4)], # EPB of interface 3
+    [SHB, block(0x00000003, struct.pack('<I', 4) + b'\0' * 4)], # SPB before any IDB
+])
+@pytest.mark.parametrize('use_mmap', [False, True])
+def test_unknown_interface(tmp_path, blocks, use_mmap):
+    path = tmp_path / 'malformed.pcapng'
+    path.write_bytes(b''.join(blocks))
+    with pytest.raises(ValueError, match="unknown interface"):
+        read_infos(str(path), 'native', use_mmap=use_mmap)
@@ -0,0 +1,104 @@
+import json
+import numpy as np
+import pytest
+import FrameBatch, QuantileSketch
+
+QUANTILES = (0, 0.01, 0.1, 0.25, 0.5, 0.75, 0.9, 0.99, 1)
+
+"""
+Helpers
+"""
+def sample(seed=0, size=20000):
+    """
+    Values over several orders of magnitude, of both signs, with zeros.
+    """
+    rnd = np.random.default_rng(seed)
+    values = rnd.lognormal(3, 2, size) * rnd.choice([-1, 1], size, p=[0.2, 0.8])
+    values[rnd.random(size) < 0.05] = 0
+    return values
+
+def exact_quantile(values, q):
+    return np.sort(values)[int(q * (len(values) - 1))]
+
+def make_batch(frames):
+    """
+    Batch of frames from the (data rate, signal, MCS index) tuples (None for a missing value).
+    """
+    builder = FrameBatch.FrameBatchBuilder(QuantileSketch.COLUMNS)
+    for rate, signal, mcs_index in frames:
+        builder.append({'data_rate': rate, 'signal_dbm': signal, 'mcs_index': mcs_index})
+    return builder.build()
+
+"""
+Tests
+"""
+@pytest.mark.parametrize('alpha', [0.01, 0.05])
+def test_relative_error(alpha):
+    values = sample()
+    sketch = QuantileSketch.QuantileSketch(alpha)
+    for chunk in np.array_split(values, 7):
+        sketch.update(chunk)
+    assert len(sketch) == len(values) and sketch.mean == pytest.approx(values.mean())
+    for q in QUANTILES:
+        expected = exact_quantile(values, q)
+        assert abs(sketch.quantile(q) - expected) <= alpha * abs(expected) + 1e-12
+
+def test_merge():
+    values = sample()
+    whole = QuantileSketch.QuantileSketch()
+    whole.update(values)
+    chunks = [QuantileSketch.QuantileSketch() for _ in range(4)]
+    for sketch, chunk in zip(chunks, np.array_split(values, 4)):
+        sketch.update(chunk)
+    # Merged in any order, the bins are those of one sketch of every value
+    merged = chunks[2].merge(chunks[0]).merge(chunks[3]).merge(chunks[1])
+    state, expected = merged.to_dict(), whole.to_dict()
+    assert state.pop('sum') == pytest.approx(expected.pop('sum'))
+    assert state == expected
+    with pytest.raises(ValueError):
+        merged.merge(QuantileSketch.QuantileSketch(0.05))
+
+def test_histogram_merge():
+    edges = QuantileSketch.DISTRIBUTIONS['signal_dbm'][1]
+    whole, first, second = (QuantileSketch.Histogram(edges) for _ in range(3))
+    values = np.random.default_rng(0).integers(-100, -20, 1000)
+    whole.update(values)
+    first.update(values[:300])
+    second.update(values[300:])
+    assert first.merge(second).counts.tolist() == whole.counts.tolist()
+    assert whole.counts.sum() == len(values)
+
+@pytest.mark.parametrize('values', [sample(), []], ids=['values', 'empty'])
+def test_sketch_json_round_trip(values):
+    sketch = QuantileSketch.QuantileSketch()
+    sketch.update(values)
+    loaded = QuantileSketch.QuantileSketch.from_dict(json.loads(json.dumps(sketch.to_dict())))
+    assert loaded.to_dict() == sketch.to_dict()
+    assert [loaded.quantile(q) for q in QUANTILES] == [sketch.quantile(q) for q in QUANTILES]
+
+def test_tracker_save_load(tmp_path):
+    tracker = QuantileSketch.DistributionTracker()
+    tracker.update(make_batch([(65.0, -50, 7), (6.5, -80, 0), (1.0, -70, None), (None, -60, None)] * 50))
+    path = str(tmp_path / 'distributions.json')
+    tracker.save(path)
+    loaded = QuantileSketch.DistributionTracker.load(path)
+    assert loaded.to_dict() == tracker.to_dict()
+    assert loaded.get_text() == tracker.get_text()
+    # Loaded trackers merge like the saved ones
+    assert loaded.merge(tracker).sketches['signal_dbm'].count == 2 * tracker.sketches['signal_dbm'].count
+
+def test_tracker_frames():
+    # Two data frames and two legacy frames, the last not selected
+    batch = make_batch([(65.0, -50, 7), (6.5, -80, 0), (1.0, -70, None), (2.0, -60, None)])
+    tracker = QuantileSketch.DistributionTracker()
+    tracker.update(batch, np.array([True, True, True, False]))
+    # Data rate and signal of every selected frame, MCS index of the data frames only
+    assert tracker.sketches['data_rate'].count == tracker.sketches['signal_dbm'].count == 3
+    assert tracker.sketches['mcs_index'].count == 2
+    assert tracker.sketches['data_rate'].min == pytest.approx(1.0)
+
+    legacy = QuantileSketch.DistributionTracker()
+    legacy.update(make_batch([(1.0, -70, None), (11.0, -65, None)]))
+    text = legacy.get_text()
+    assert '|signal_dbm: No data' not in text and '|data_rate: No data' not in text
+    assert '|mcs_index: No data' in text and '|phy_gap: No data' in text
@@ -0,0 +1,101 @@
+import math
+import numpy as np
+import pytest
+import PcapReader, RateTables
+
+# Coded bits per subcarrier and coding rate of MCS 0-11 (802.11n MCS 0-7 per stream, 802.11ac 0-9, 802.11ax 0-11)
+MODULATION = [(1, 1 / 2), (2, 1 / 2), (2, 3 / 4), (4, 1 / 2), (4, 3 / 4), (6, 2 / 3),
+              (6, 3 / 4), (6, 5 / 6), (8, 3 / 4), (8, 5 / 6), (10, 3 / 4), (10, 5 / 6)]
+HT_SUBCARRIERS = {20: 52, 40: 108}
+VHT_SUBCARRIERS = {20: 52, 40: 108, 80: 234, 160: 468}
+HE_SUBCARRIERS = {20: 234, 40: 468, 80: 980, 160: 1960}
+
+"""
+Helpers
+"""
+def formula_rate(subcarriers, mcs, nss, symbol_us):
+    """
+    Data rate (Mbps) of the data bits per OFDM symbol over the symbol duration.
+    """
+    bits, coding = MODULATION[mcs]
+    return subcarriers * bits * coding * nss / symbol_us
+
+def old_get_phy_gap(rssi, bandwidth, mcs_index, spatial_streams):
+    """
+    PcapReader.get_phy_gap before the sensitivity tables moved to RateTables.
+    """
+    expected_mcs = { 0: [ -82, -79, -77, -74, -70, -66, -65, -64 ],
+                     1: [ -79, -76, -74, -71, -67, -63, -62, -61 ],
+                     2: [ -76, -73, -71, -68, -64, -60, -59, -58 ],
+                     3: [ -73, -70, -68, -65, -61, -57, -56, -55 ] }
+    if bandwidth is None or mcs_index is None:
+        return None
+    if rssi is None:
+        return 4
+    expected = 0
+    for i, m in enumerate(expected_mcs[int(bandwidth)]):
+        if int(rssi) >= m:
+            expected = i
+        else:
+            break
+    return expected + 8 * (spatial_streams - 1) - int(mcs_index)
+
+"""
+Tests
+"""
+@pytest.mark.parametrize('bandwidth', sorted(HT_SUBCARRIERS))
+@pytest.mark.parametrize('short_gi', [False, True])
+def test_ht_rates(bandwidth, short_gi):
+    for mcs_index in range(32):
+        expected = formula_rate(HT_SUBCARRIERS[bandwidth], mcs_index % 8, mcs_index // 8 + 1, 3.6 if short_gi else 4.0)
+        assert RateTables.ht_rate(mcs_index, 1 if bandwidth == 40 else 0, short_gi) == pytest.approx(expected)
+
+@pytest.mark.parametrize('bandwidth', sorted(VHT_SUBCARRIERS))
+@pytest.mark.parametrize('short_gi', [False, True])
+def test_vht_rates(bandwidth, short_gi):
+    for mcs in range(10):
+        for nss in range(1, RateTables.MAX_NSS + 1):
+            rate = RateTables.vht_rate(mcs, nss, bandwidth, short_gi)
+            if (mcs, bandwidth, nss) in RateTables.VHT_INVALID:
+                assert rate is None
+                continue
+            assert rate == pytest.approx(formula_rate(VHT_SUBCARRIERS[bandwidth], mcs, nss, 3.6 if short_gi else 4.0))
+
+@pytest.mark.parametrize('bandwidth', sorted(HE_SUBCARRIERS))
+@pytest.mark.parametrize('gi', range(len(RateTables.HE_GI)))
+def test_he_rates(bandwidth, gi):
+    for mcs in range(12):
+        for nss in range(1, RateTables.MAX_NSS + 1):
+            expected = formula_rate(HE_SUBCARRIERS[bandwidth], mcs, nss, 12.8 + RateTables.HE_GI[gi])
+            assert RateTables.he_rate(mcs, nss, bandwidth, gi) == pytest.approx(expected)
+
+def test_published_rates():
+    # Rates listed in the 802.11n, 802.11ac and 802.11ax MCS tables
+    assert RateTables.ht_rate(7, 0, False) == pytest.approx(65.0)
+    assert RateTables.ht_rate(15, 1, True) == pytest.approx(300.0)
+    assert RateTables.vht_rate(9, 1, 80, True) == pytest.approx(433.3, abs=0.05)
+    assert RateTables.vht_rate(9, 2, 160, True) == pytest.approx(1733.3, abs=0.05)
+    assert RateTables.he_rate(0, 1, 20, 0) == pytest.approx(8.6, abs=0.05)
+    assert RateTables.he_rate(11, 2, 160, 0) == pytest.approx(2401.96, abs=0.05)
+
+def test_vectorized_rates():
+    mcs = np.repeat(np.arange(12), 8 * 4 * 2)
+    nss = np.tile(np.repeat(np.arange(1, 9), 4 * 2), 12)
+    bandwidth = np.tile(np.repeat(np.array(RateTables.BANDWIDTHS), 2), 12 * 8)
+    flag = np.tile(np.array([0, 1]), 12 * 8 * 4)
+    for vector, scalar in ((RateTables.vht_rates, RateTables.vht_rate), (RateTables.he_rates, RateTables.he_rate)):
+        rates = vector(mcs, nss, bandwidth, flag)
+        for rate, args in zip(rates.tolist(), zip(mcs.tolist(), nss.tolist(), bandwidth.tolist(), flag.tolist())):
+            expected = scalar(*args)
+            assert (math.isnan(rate) and expected is None) or rate == expected
+
+def test_get_phy_gap_keeps_its_signature():
+    reader = PcapReader.PcapReader(__file__, backend='native')
+    for bandwidth in (None, 0, 1, 2, 3):
+        for mcs_index in (None, 0, 3, 7, 8, 13, 15, 23, 31):
+            streams = reader.calculate_spatial_streams(mcs_index)
+            assert streams == (mcs_index // 8 + 1 if mcs_index is not None else 0)
+            for rssi in (None, -95, -82, -80, -75, -70, -66, -62, -58, -40):
+                assert reader.get_phy_gap(rssi, bandwidth, mcs_index, streams) == old_get_phy_gap(rssi, bandwidth, mcs_index, streams)
+    # Fields of pyshark packets are strings
+    assert reader.get_phy_gap('-70', '1', '12', reader.calculate_spatial_streams('12')) == old_get_phy_gap(-70, 1, 12, 2)
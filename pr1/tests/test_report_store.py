@@ -0,0 +1,112 @@
+import numpy as np
+import pytest
+import FrameBatch, ReportStore, StationBreakdown, WindowAggregator
+
+AP1, AP2 = '02:00:00:00:00:01', '02:00:00:00:00:02'
+COLUMNS = sorted(set(WindowAggregator.COLUMNS + StationBreakdown.COLUMNS + ('bssid',)))
+
+"""
+Helpers
+"""
+def station(index):
+    return f"02:01:00:00:00:{index:02x}"
+
+def make_frames(seed, count, retry_ratio, duration=10.0):
+    """
+    Random data frames of 4 stations of two BSSIDs.
+    :return: List of (timestamp, station index, retry) tuples, in time order.
+    """
+    rnd = np.random.default_rng(seed)
+    timestamps = np.sort(rnd.uniform(0, duration, count))
+    return [(float(timestamp), int(rnd.integers(4)), bool(rnd.random() < retry_ratio)) for timestamp in timestamps]
+
+def make_batch(frames):
+    builder = FrameBatch.FrameBatchBuilder(COLUMNS)
+    for timestamp, index, retry in frames:
+        bssid = AP1 if index < 2 else AP2
+        builder.append({'timestamp': timestamp, 'ta': station(index), 'ra': bssid, 'bssid': bssid, 'length': 100,
+                        'type_subtype': 0x28, 'fc_retry': retry, 'data_rate': 65.0, 'mcs_index': 7, 'mcs': 7,
+                        'duration': 20, 'signal_dbm': -50})
+    return builder.build()
+
+def retry_rate(frames, bssid, start, end):
+    """
+    Retry rate of the frames of a BSSID between two times, computed from the frames.
+    """
+    selected = [retry for timestamp, index, retry in frames if (AP1 if index < 2 else AP2) == bssid and start <= timestamp < end]
+    return sum(selected) / len(selected)
+
+@pytest.fixture
+def store(tmp_path):
+    store = ReportStore.ReportStore(str(tmp_path / 'store.db'))
+    yield store
+    store.close()
+
+"""
+Tests
+"""
+def test_live_writes_do_not_double(store):
+    frames = make_frames(0, 2000, 0.1)
+    aggregator = WindowAggregator.WindowAggregator(1, key='bssid')
+    capture = store.capture('live', slide=1)
+    # Reports of a live capture: the pane of the split is written twice, growing in between
+    for chunk in np.array_split(np.arange(len(frames)), 4):
+        aggregator.update(make_batch([frames[position] for position in chunk]))
+        store.write(capture, int(chunk[-1]) + 1, aggregator)
+        assert store.written[capture] == aggregator.buckets[-1][0]
+    store.write(capture, len(frames), aggregator) # Nothing new
+    # Only the newest pane is written again
+    assert {row[3] for row in store._pane_rows(capture, aggregator)} == {aggregator.buckets[-1][0] * 1.0}
+
+    totals = store.totals()
+    assert totals['frames'] == totals['data_frames'] == len(frames)
+    assert totals['retry_frames'] == sum(retry for _, _, retry in frames)
+    assert totals['signal_frames'] == len(frames) and totals['signal_dbm'] == -50
+    assert store.totals(AP1)['frames'] + store.totals(AP2)['frames'] == len(frames)
+    assert sum(pane['frames'] for pane in store.panes()) == len(frames)
+
+    # A new store of the same file rewrites every pane, in place
+    again = ReportStore.ReportStore(store.path)
+    again.write(again.capture('live'), len(frames), aggregator)
+    again.close()
+    assert store.totals()['frames'] == len(frames)
+
+def test_totals_per_capture(store):
+    frames = {'first': make_frames(1, 3000, 0.1), 'second': make_frames(2, 3000, 0.3)}
+    for name, capture_frames in frames.items():
+        aggregator = WindowAggregator.WindowAggregator(1, key='bssid')
+        aggregator.update(make_batch(capture_frames))
+        store.write(store.capture(name, slide=1), len(capture_frames), aggregator)
+
+    totals = store.totals(AP2, 2, 7, per_capture=True)
+    assert set(totals) == set(frames)
+    for name, capture_frames in frames.items():
+        assert totals[name]['seconds'] == 5
+        assert totals[name]['retry_rate'] == pytest.approx(retry_rate(capture_frames, AP2, 2, 7))
+    # Over both captures
+    both = store.totals(AP2, 2, 7)
+    assert both['frames'] == sum(values['frames'] for values in totals.values())
+    assert store.totals(AP2, 2, 7, captures=['second'])['retry_rate'] == totals['second']['retry_rate']
+
+def test_stations(store):
+    first, second = store.capture('first'), store.capture('second')
+    for capture, seed in ((first, 3), (second, 4)):
+        breakdown = StationBreakdown.StationBreakdown()
+        breakdown.update(make_batch(make_frames(seed, 500, 0.2)))
+        store.write(capture, 500, breakdown=breakdown)
+
+    rows = store.stations(station(1).upper()) # Addresses are normalized
+    assert sorted(row['capture'] for row in rows) == ['first', 'second']
+    assert all(row['kind'] == 'pair' and row['address'] == station(1) and row['ra'] == AP1 for row in rows)
+    assert rows[0]['frames'] >= rows[1]['frames'] # Most frames first
+    bssids = store.stations(kind='bssid', captures=['first'])
+    assert {row['address'] for row in bssids} == {AP1, AP2} and sum(row['frames'] for row in bssids) == 500
+    assert len(store.stations(captures=['second'])) == 6 # 4 pairs and 2 BSSIDs
+
+    # Writing a capture again replaces its stations
+    breakdown = StationBreakdown.StationBreakdown()
+    breakdown.update(make_batch([(0.5, 0, False)] * 30))
+    store.write(first, 30, breakdown=breakdown)
+    rows = store.stations(captures=['first'])
+    assert {(row['kind'], row['address'], row['frames']) for row in rows} == {('pair', station(0), 30), ('bssid', AP1, 30)}
+    assert len(store.stations(captures=['second'])) == 6
@@ -0,0 +1,79 @@
+import numpy as np
+import FrameBatch, StationBreakdown
+
+AP = '02:00:00:00:00:01'
+
+"""
+Helpers
+"""
+def station(index):
+    return f"02:01:00:00:{index >> 8:02x}:{index & 0xff:02x}"
+
+def make_batch(frames):
+    """
+    Batch of data frames from stations to the AP.
+    :param frames: List of (station index, retry, data rate, duration) tuples.
+    """
+    builder = FrameBatch.FrameBatchBuilder(StationBreakdown.COLUMNS)
+    for index, retry, rate, duration in frames:
+        builder.append({'ta': station(index), 'ra': AP, 'bssid': AP, 'length': 100, 'fc_retry': retry,
+                        'data_rate': rate, 'mcs_index': 7, 'mcs': 7, 'duration': duration})
+    return builder.build()
+
+def names(table, entries):
+    return [table.format_key(key) for key, _ in entries]
+
+"""
+Tests
+"""
+def test_totals_with_small_capacity():
+    rnd = np.random.default_rng(0)
+    breakdown = StationBreakdown.StationBreakdown(capacity=8)
+    frames = retries = 0
+    for _ in range(20):
+        batch = [(int(index), bool(rnd.random() < 0.2), 65.0, 50) for index in rnd.zipf(1.5, 500) % 300]
+        breakdown.update(make_batch(batch))
+        frames += len(batch)
+        retries += sum(frame[1] for frame in batch)
+
+    table = breakdown.pairs
+    assert len(table) == 8 and table.evicted > 0
+    rows = [table.stats(row) for row in list(table.index.values()) + [table.other]]
+    assert sum(metrics['frames'] for metrics in rows) == frames
+    assert sum(metrics['data_frames'] for metrics in rows) == frames
+    assert sum(metrics['retry_frames'] for metrics in rows) == retries
+    assert sum(metrics['bytes'] for metrics in rows) == 100 * frames
+    # Every frame has the same BSSID
+    assert breakdown.bssids.stats(breakdown.bssids.index[FrameBatch.mac_to_int(AP)])['frames'] == frames
+    # CSV rows, other row included, add up to the frames too
+    assert sum(row[3] for row in breakdown.rows() if row[0] == 'pair') == frames
+
+def test_dominant_talker_in_top():
+    breakdown = StationBreakdown.StationBreakdown(capacity=8, top=3)
+    # Light stations fill the table before the dominant talker shows up
+    for start in range(0, 200, 40):
+        breakdown.update(make_batch([(index, False, 65.0, 50) for index in range(start, start + 40) for _ in range(5)]))
+    dominant = 1000
+    for start in range(0, 200, 40):
+        light = [(index, False, 65.0, 50) for index in range(start, start + 40) for _ in range(5)]
+        breakdown.update(make_batch(light + [(dominant, False, 6.5, 500)] * 50))
+
+    talkers = breakdown.top_talkers(breakdown.pairs)
+    assert names(breakdown.pairs, talkers)[0] == f"{station(dominant)} > {AP}"
+    assert talkers[0][1]['frames'] == 250
+    assert f"{station(dominant)} > {AP}" in breakdown.get_text()
+
+def test_worst_stations_order():
+    breakdown = StationBreakdown.StationBreakdown(top=4)
+    frames = []
+    # Station: (retries out of 40 data frames, data rate)
+    for index, (retries, rate) in enumerate([(4, 65.0), (20, 65.0), (20, 13.0), (0, 6.5), (10, 130.0)]):
+        frames += [(index, position < retries, rate, 100) for position in range(40)]
+    # Retries on every frame, but too few data frames to be ranked
+    frames += [(9, True, 6.5, 100)] * (StationBreakdown.MIN_DATA_FRAMES - 1)
+    breakdown.update(make_batch(frames))
+
+    worst = breakdown.worst_stations()
+    # Highest retry rate first, the lowest data rate first on equal retry rates
+    assert names(breakdown.pairs, worst) == [f"{station(index)} > {AP}" for index in (2, 1, 4, 0)]
+    assert [metrics['retry_rate'] for _, metrics in worst] == [0.5, 0.5, 0.25, 0.1]
@@ -0,0 +1,44 @@
+import FrameBatch, WindowAggregator
+
+def make_batch(timestamps):
+    """
+    Batch of 100 byte data frames captured at the timestamps (None for a frame without timestamp).
+    """
+    builder = FrameBatch.FrameBatchBuilder(WindowAggregator.COLUMNS)
+    for timestamp in timestamps:
+        builder.append({'timestamp': timestamp, 'length': 100, 'type_subtype': 0x20, 'fc_retry': False})
+    return builder.build()
+
+def pane_indexes(aggregator):
+    return [bucket[0] for bucket in aggregator.buckets]
+
+def test_history_is_in_seconds():
+    aggregator = WindowAggregator.WindowAggregator(1, history=10)
+    aggregator.update(make_batch([0.5, 1.5, 2.5]))
+    aggregator.update(make_batch([8.5]))
+    assert pane_indexes(aggregator) == [0, 1, 2, 8]
+    # A gap: the panes of more than 10 seconds before the new one are dropped, not the 10 newest panes kept
+    aggregator.update(make_batch([11.5]))
+    assert pane_indexes(aggregator) == [2, 8, 11]
+    aggregator.update(make_batch([100.5]))
+    assert pane_indexes(aggregator) == [100]
+
+def test_late_frames():
+    aggregator = WindowAggregator.WindowAggregator(1, history=10)
+    aggregator.update(make_batch([20.5, 25.5]))
+    aggregator.update(make_batch([5.5, 15.5, 16.5, 25.7]))
+    assert pane_indexes(aggregator) == [16, 20, 25]
+    assert aggregator.late_frames == 2
+    assert aggregator.current()[0].counters[0] == 2
+
+def test_frames_without_timestamp():
+    aggregator = WindowAggregator.WindowAggregator(1, history=10)
+    # No pane yet: not counted in a pane of time 0
+    aggregator.update(make_batch([None, None]))
+    assert not aggregator.buckets and aggregator.untimed_frames == 2
+    # Pane of the first timestamped frame of the batch, then of the newest pane
+    aggregator.update(make_batch([None, 1000.5, 999.5]))
+    aggregator.update(make_batch([None]))
+    assert pane_indexes(aggregator) == [999, 1000]
+    assert aggregator.buckets[-1][1].counters[0] == 3
+    assert 'Frames without timestamp: 2' in aggregator.get_text()